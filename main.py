@@ -1,5 +1,6 @@
 # main.py
 
+import multiprocessing
 from src.gui import GrammarCorrectorGUI
 
 def main():
@@ -7,4 +8,6 @@ def main():
     app.run()
 
 if __name__ == "__main__":
+    # PDF pages are extracted in worker processes, which the frozen executable must support
+    multiprocessing.freeze_support()
     main()
@@ -8,14 +8,27 @@ build_exe_options = {
     ],
     "includes": [
         "src.api_client",
+        "src.batch_client",
         "src.cache_manager",
+        "src.cli",
         "src.config",
+        "src.docx_document",
         "src.document_types",
         "src.gui",
+        "src.http_transport",
         "src.file_handlers",
+        "src.journal",
+        "src.manifest",
         "src.output_manager",
+        "src.packing",
+        "src.pipeline",
+        "src.prefilter",
         "src.prompts",
+        "src.retry",
+        "src.scheduler",
+        "src.server",
         "src.text_processing",
+        "src.usage",
         "src.utils"
     ],
     "include_files": [
@@ -35,10 +48,10 @@ setup(
     description="Grammar Correction Tool",
     options={"build_exe": build_exe_options},
     executables=[Executable("main.py", base=base, target_name="GrammarCorrector.exe")],
+    entry_points={"console_scripts": ["grammar-correct=src.cli:main", "grammar-correct-server=src.server:main"]},
     install_requires=[
         "aiohappyeyeballs==2.4.0",
         "aiohttp==3.10.6",
-        "aiolimiter==1.1.0",
         "aiosignal==1.3.1",
         "asyncio==3.4.3",
         "attrs==24.2.0",
@@ -49,6 +62,7 @@ setup(
         "cryptography==43.0.1",
         "docx==0.2.4",
         "et-xmlfile==1.1.0",
+        "fastapi==0.115.0",
         "fpdf==1.7.2",
         "frozenlist==1.4.1",
         "idna==3.10",
@@ -66,6 +80,7 @@ setup(
         "pypdfium2==4.30.0",
         "python-dateutil==2.9.0.post0",
         "python-docx==1.1.2",
+        "python-multipart==0.0.12",
         "pytz==2024.2",
         "regex==2024.9.11",
         "requests==2.32.3",
@@ -76,6 +91,7 @@ setup(
         "typing_extensions==4.12.2",
         "tzdata==2024.2",
         "urllib3==2.2.3",
+        "uvicorn==0.31.0",
         "wheel==0.44.0",
         "win32-setctime==1.1.0",
         "yarl==1.12.1",
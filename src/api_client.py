@@ -1,30 +1,367 @@
 # api_client.py
 
 import asyncio
-import aiohttp
-from src.cache_manager import get_from_cache, save_to_cache
-from src.utils import count_tokens
-from src.prompts import get_doc_prompt
-from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TEMPERATURE, DEFAULT_BACKOFF_FACTOR,
+import json
+import os
+import re
+import time
+from contextlib import nullcontext, suppress
+from src.cache_manager import (get_correction_from_cache, save_correction_to_cache, make_cache_key, get_cache_stats,
+                               flush_cache)
+from src.utils import count_tokens, count_tokens_batch
+from src.http_transport import create_http_session
+from src.retry import (RetryPolicy, CircuitBreaker, CircuitOpenError, APIError, RetryableError, RETRYABLE_STATUSES,
+                       call_with_retries, parse_retry_after, is_retryable_exception, counts_against_circuit)
+from src.usage import UsageReport, make_usage, usage_from_response, split_usage
+from src.packing import pack_paragraphs, parse_packed_response, PackMismatchError
+from src.prefilter import ParagraphFilter
+from src.prompts import get_prompt_template, SYSTEM_PROMPT
+from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TEMPERATURE, DEFAULT_REQUEST_TIMEOUT,
                     DEFAULT_MAX_RETRIES, DEFAULT_RATE_LIMIT, DEFAULT_MODEL,DEFAULT_RATE_PERIOD,
-                    DEFAULT_LANGUAGE_VARIANT)
+                    DEFAULT_LANGUAGE_VARIANT, DEFAULT_CONCURRENCY, DEFAULT_CONTEXT_MODE, CONTEXT_MODES,
+                    DEFAULT_HTTP_TRANSPORT, DEFAULT_TOKEN_RATE_LIMIT, DEFAULT_COMPLETION_TOKEN_RATIO,
+                    DEFAULT_COMPLETION_TOKEN_MARGIN, DEFAULT_API_BASE_URL, DEFAULT_PACK_TOKEN_BUDGET,
+                    DEFAULT_PROMPT_LAYOUT, PROMPT_LAYOUTS, DEFAULT_STREAM_RESPONSES, DEFAULT_PREFILTER)
 from loguru import logger
-from aiolimiter import AsyncLimiter
 
-class GrammarCorrectorAPI:
-    def __init__(self, api_key, language_variant=DEFAULT_LANGUAGE_VARIANT, model=DEFAULT_MODEL, rate_limit=DEFAULT_RATE_LIMIT, rate_period=DEFAULT_RATE_PERIOD, temperature=DEFAULT_TEMPERATURE):
+# Tokens the chat format adds around each message
+MESSAGE_TOKEN_OVERHEAD = 4
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Errors that belong to one backend's key or endpoint, so another backend may still succeed
+FAILOVER_STATUSES = {401, 403, 404}
+BACKEND_FIELDS = ("base_url", "api_key", "api_key_env", "model", "rate_limit", "token_rate_limit")
+
+
+def parse_reset_duration(value):
+    """
+    Parses an ``x-ratelimit-reset-*`` header such as "1s", "6m0s" or "20ms" into seconds.
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenRateLimiter:
+    """
+    Rate limiter that budgets both requests and tokens per period, like the OpenAI quotas.
+
+    Each bucket refills continuously. ``acquire`` waits until there is room for one request and the
+    estimated tokens, and reserves them. ``reconcile`` refunds (or charges) the difference once the
+    actual usage is known, and ``update_from_headers`` follows the ``x-ratelimit-*`` headers so the
+    local budget tracks the quota the server reports.
+    """
+    def __init__(self, request_limit=DEFAULT_RATE_LIMIT, token_limit=DEFAULT_TOKEN_RATE_LIMIT, period=DEFAULT_RATE_PERIOD):
+        self.period = period
+        self.request_limit = request_limit
+        self.token_limit = token_limit
+        self.requests_available = float(request_limit)
+        self.tokens_available = float(token_limit)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests_available = min(self.request_limit, self.requests_available + elapsed * self.request_limit / self.period)
+        self.tokens_available = min(self.token_limit, self.tokens_available + elapsed * self.token_limit / self.period)
+
+    async def acquire(self, tokens):
+        """
+        Waits for room for one request of ``tokens`` estimated tokens and reserves it.
+
+        Waiters are served in order, so large requests are not starved by small ones.
+
+        :param tokens: Estimated prompt + completion tokens of the request.
+        :return: The number of tokens reserved, to pass to ``reconcile``.
+        """
+        async with self._lock:
+            while True:
+                tokens_needed = min(tokens, self.token_limit)
+                self._refill()
+                if self.requests_available >= 1 and self.tokens_available >= tokens_needed:
+                    self.requests_available -= 1
+                    self.tokens_available -= tokens_needed
+                    return tokens_needed
+                wait_time = max((1 - self.requests_available) * self.period / self.request_limit,
+                                (tokens_needed - self.tokens_available) * self.period / self.token_limit)
+                logger.debug(f"Rate budget exhausted. Waiting {wait_time:.2f} seconds.")
+                await asyncio.sleep(wait_time)
+
+    def reconcile(self, reserved_tokens, actual_tokens):
+        """
+        Corrects a reservation once the request's real token usage is known.
+        """
+        self._refill()
+        self.tokens_available = min(self.token_limit, self.tokens_available + reserved_tokens - actual_tokens)
+
+    def update_from_headers(self, headers):
+        """
+        Adapts the budget to the ``x-ratelimit-*`` response headers.
+
+        The limits replace the configured ones, and the local budget is never allowed to exceed what
+        the server says is remaining.
+        """
+        if not headers:
+            return
+        self._refill()
+        request_limit = headers.get("x-ratelimit-limit-requests")
+        token_limit = headers.get("x-ratelimit-limit-tokens")
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        try:
+            if request_limit:
+                self.request_limit = max(1, int(request_limit))
+            if token_limit:
+                self.token_limit = max(1, int(token_limit))
+            if remaining_requests is not None:
+                self.requests_available = min(self.requests_available, float(remaining_requests))
+            if remaining_tokens is not None:
+                self.tokens_available = min(self.tokens_available, float(remaining_tokens))
+        except ValueError:
+            logger.debug("Ignoring malformed rate limit headers.")
+            return
+        reset_tokens = parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+        if reset_tokens:
+            logger.debug(f"Token budget: {self.tokens_available:.0f}/{self.token_limit}, resets in {reset_tokens:.2f}s")
+
+    def headroom(self):
+        """
+        Share of the budget that is free right now: the lower of the request and token shares, from 0 to 1.
+        """
+        self._refill()
+        return max(0.0, min(self.requests_available / self.request_limit, self.tokens_available / self.token_limit))
+
+
+class Backend:
+    """
+    One OpenAI-compatible chat completions endpoint, with its own key, model, rate limiter and circuit breaker.
+
+    Quotas and outages belong to a key and an endpoint, so each backend of a pool keeps its own
+    budget and health. An empty ``api_key`` sends no Authorization header, for local servers that
+    do not need one.
+    """
+    def __init__(self, base_url=DEFAULT_API_BASE_URL, api_key=None, model=DEFAULT_MODEL, rate_limit=DEFAULT_RATE_LIMIT,
+                 token_rate_limit=DEFAULT_TOKEN_RATE_LIMIT, rate_period=DEFAULT_RATE_PERIOD):
+        self.base_url = base_url.rstrip("/")
         self.api_key = api_key
+        self.model = model
+        self.rate_limiter = TokenRateLimiter(rate_limit, token_rate_limit, rate_period)
+        self.circuit_breaker = CircuitBreaker()
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def name(self):
+        return f"{self.base_url} ({self.model})"
+
+    def get_headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def to_dict(self):
+        return {"base_url": self.base_url, "model": self.model, "state": self.circuit_breaker.state,
+                "headroom": round(self.rate_limiter.headroom(), 3), "requests": self.requests, "failures": self.failures}
+
+
+def load_backends(path):
+    """
+    Reads a backend pool from a JSON file holding a list of objects with these fields:
+
+    ``base_url`` (required), ``api_key`` or ``api_key_env`` (the name of an environment variable
+    holding the key), ``model``, ``rate_limit`` and ``token_rate_limit``. Missing fields take the
+    client's settings.
+
+    :return: List of backend settings for GrammarCorrectorAPI's ``backends``.
+    :raises ValueError: If the file does not describe at least one backend.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        backends = json.load(f)
+    if not isinstance(backends, list) or not backends:
+        raise ValueError(f"{path} must contain a non-empty list of backends.")
+    for backend in backends:
+        if not isinstance(backend, dict) or not backend.get("base_url"):
+            raise ValueError(f"Every backend in {path} needs a base_url.")
+        unknown = set(backend) - set(BACKEND_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown backend field(s) in {path}: {', '.join(sorted(unknown))}")
+    return backends
+
+
+class StreamProgress:
+    """
+    Reports completion tokens to a progress callback while a response is streamed.
+
+    Streamed tokens are reported as ``progress_callback(tokens, None)``. ``settle`` then works out how
+    much of a paragraph's final token count is still unreported, so the callback totals come out the
+    same as without streaming. A retried stream starts again from nothing, so its tokens are only
+    reported once it gets further than the attempts before it.
+    """
+    def __init__(self, progress_callback, model):
+        self.progress_callback = progress_callback
+        self.model = model
+        self.reported = 0
+        self.streamed = 0
+        self.furthest = 0
+
+    def __call__(self, delta):
+        self.streamed += count_tokens(delta, self.model)
+        tokens = self.streamed - self.furthest
+        if tokens > 0:
+            self.furthest = self.streamed
+            self.reported += tokens
+            self.progress_callback(tokens, None)
+
+    def restart(self):
+        """
+        Starts counting a new attempt at the same response.
+        """
+        self.streamed = 0
+
+    def settle(self, tokens):
+        """
+        Returns the part of ``tokens`` that was not reported while streaming.
+        """
+        credit = min(self.reported, tokens)
+        self.reported -= credit
+        return tokens - credit
+
+
+class GrammarCorrectorAPI:
+    """
+    Client for the chat completions API.
+
+    The client owns one pooled HTTP session that is opened on first use and reused for every request,
+    so connections stay warm across paragraphs and documents. Use it as an async context manager, or
+    call ``close()``, to release the connections:
+
+        async with GrammarCorrectorAPI(api_key) as api_client:
+            corrected, unprocessed = await api_client.correct_paragraphs(...)
+
+    Requests go to a pool of ``backends``, by default a single one built from ``api_key``, ``base_url``
+    and ``model``. Each request is sent to the healthy backend with the most rate budget free and
+    fails over to the next one on errors, so the pool's quotas add up. ``model`` still keys the cache
+    and counts tokens, so the backends of a pool should serve the same model.
+    """
+    def __init__(self, api_key, language_variant=DEFAULT_LANGUAGE_VARIANT, model=DEFAULT_MODEL, rate_limit=DEFAULT_RATE_LIMIT, rate_period=DEFAULT_RATE_PERIOD, temperature=DEFAULT_TEMPERATURE,
+                 concurrency=DEFAULT_CONCURRENCY, context_mode=DEFAULT_CONTEXT_MODE, transport=DEFAULT_HTTP_TRANSPORT,
+                 token_rate_limit=DEFAULT_TOKEN_RATE_LIMIT, max_retries=DEFAULT_MAX_RETRIES, request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                 base_url=DEFAULT_API_BASE_URL, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, prompt_layout=DEFAULT_PROMPT_LAYOUT,
+                 stream=DEFAULT_STREAM_RESPONSES, backends=None, prefilter=DEFAULT_PREFILTER):
         self.language_variant = language_variant
         self.model = model
-        self.rate_limiter = AsyncLimiter(rate_limit, rate_period)
-        self.max_retries = DEFAULT_MAX_RETRIES
-        self.backoff_factor = DEFAULT_BACKOFF_FACTOR
+        self.backends = [
+            Backend(settings.get("base_url", base_url), self._get_backend_key(settings, api_key), settings.get("model") or model,
+                    settings.get("rate_limit", rate_limit), settings.get("token_rate_limit", token_rate_limit), rate_period)
+            for settings in backends or [{}]
+        ]
+        # The first backend is the one the Batch API is used through
+        self.api_key = self.backends[0].api_key
+        self.base_url = self.backends[0].base_url
+        self.retry_policy = RetryPolicy(max_retries)
+        self.request_timeout = request_timeout
         self.temperature = temperature
+        self.concurrency = max(1, concurrency)
+        if context_mode not in CONTEXT_MODES:
+            raise ValueError(f"Unsupported context mode: {context_mode}")
+        self.context_mode = context_mode
+        self.pack_token_budget = pack_token_budget
+        if prompt_layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unsupported prompt layout: {prompt_layout}")
+        self.prompt_layout = prompt_layout
+        self.stream = stream
+        self.prefilter = prefilter
+        self.transport = transport
+        self._session = None
+        self._session_loop = None
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+
+    @staticmethod
+    def _get_backend_key(settings, api_key):
+        if "api_key" in settings:
+            return settings["api_key"]
+        if "api_key_env" in settings:
+            if settings["api_key_env"] not in os.environ:
+                logger.warning(f"Environment variable {settings['api_key_env']} is not set. Sending no API key to {settings.get('base_url')}.")
+            return os.environ.get(settings["api_key_env"])
+        return api_key
+
+    async def __aenter__(self):
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_session(self):
+        """
+        Returns the client's HTTP session, opening it on first use.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is not loop:
+            # Sessions are bound to the loop they were created in
+            logger.warning("HTTP session belongs to another event loop. Opening a new one.")
+            self._session = None
+        if self._session is None or self._session.closed:
+            self._session = create_http_session(self.transport)
+            self._session_loop = loop
+        return self._session
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def pause(self):
+        """
+        Holds back new requests, including retries, until ``resume`` is called. Requests already in
+        flight are finished. Must be called from the thread running the event loop.
+        """
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
 
-    async def correct_paragraphs(self, all_paragraphs, selected_indices, total_token_limit, progress_callback, doc_type, language_variant, custom_prompt, context_window_size=DEFAULT_CONTEXT_WINDOW_SIZE):
+    async def correct_paragraphs(self, all_paragraphs, selected_indices, total_token_limit, progress_callback, doc_type, language_variant, custom_prompt, context_window_size=DEFAULT_CONTEXT_WINDOW_SIZE,
+                                 usage_report=None, session=None, result_callback=None, request_slot=None, paragraph_filter=None):
         """
         Corrects selected paragraphs using the provided document type and language variant.
 
+        Up to ``self.concurrency`` paragraphs are in flight at once, all sharing the rate limiter.
+        In "corrected" context mode a paragraph waits until the selected paragraphs in its context
+        window are corrected (a wavefront over the document), so the output matches a sequential run.
+        In "original" context mode the context is taken from the original text and nothing waits.
+
+        Runs of consecutive short paragraphs are packed into one request of up to ``self.pack_token_budget``
+        paragraph tokens (see packing.pack_paragraphs). The paragraphs in a pack see each other instead of
+        waiting for each other's corrections. Results are still cached per paragraph, and a pack whose
+        response cannot be split back falls back to one request per paragraph.
+
+        In the "prefix" prompt layout every request starts with the same system message (see
+        prompts.PromptTemplate), which the provider can serve from its prompt cache. The cached
+        prompt tokens are reported as ``cached_tokens`` in the usage.
+
+        With ``self.prefilter`` set, paragraphs that cannot need correction (see prefilter.ParagraphFilter)
+        are passed through without a request. Their usage is marked with the rule as ``skipped``, and
+        repeats of a paragraph take its correction once it is done.
+
         :param all_paragraphs: List of all paragraph texts.
         :param selected_indices: List of indices of paragraphs to correct.
         :param total_token_limit: Maximum total tokens allowed for processing.
@@ -33,37 +370,224 @@ class GrammarCorrectorAPI:
         :param language_variant: The language variant to use for correction.
         :param custom_prompt: Custom prompt to use for correction, if provided.
         :param context_window_size: Number of previous paragraphs to use as context.
+        :param usage_report: UsageReport to record usage in. A new one is created if omitted.
+        :param session: HTTP session to send requests on. Defaults to the client's own pooled session.
+        :param result_callback: Optional callback called as ``result_callback(index, corrected_text, usage)``
+                                as soon as each paragraph is done.
+        :param request_slot: Async context manager held while each request is in flight, such as a slot
+                             from scheduler.JobScheduler. Defaults to a semaphore of ``self.concurrency``.
+        :param paragraph_filter: ParagraphFilter shared by the calls of one run, so repeats are found across
+                                 them. A new one is used if omitted and ``self.prefilter`` is set.
         :return: Tuple of (corrected_paragraphs, unprocessed_paragraphs)
+
+        ``progress_callback`` is called as ``progress_callback(tokens, usage)`` after each paragraph, where
+        ``usage`` holds the prompt/completion/total tokens reported by the API. Per-paragraph usage for the
+        whole run is collected in ``usage_report``. Pass one in to read it afterwards, as a client may run
+        several calls at once.
+
+        With ``self.stream`` set, ``progress_callback(tokens, None)`` is also called as completion tokens
+        arrive. The paragraph's final call then only carries the tokens not yet reported, so the tokens
+        add up to the same total either way.
         """
         corrected = all_paragraphs.copy()
-        unprocessed = []
-        async with aiohttp.ClientSession() as session:
-            tokens_processed = 0
-            for i in selected_indices:
-                para = all_paragraphs[i]
-                tokens = count_tokens(para, self.model)
-                if tokens_processed + tokens > total_token_limit:
-                    unprocessed.append(para)
-                    logger.warning(f"Paragraph {i} exceeds token limit. Skipping.")
-                    continue
-                
-                # get context
-                logger.info(f"Processing paragraph {i}")
-                context = self.get_context(corrected, i, context_window_size)
-                
-                # Generate the prompt using get_doc_prompt function
-                prompt = get_doc_prompt(doc_type, context, para, language_variant, custom_prompt)
-
-                corrected_text, tokens_corrected = await self.correct_text(session, para, tokens_processed, prompt)
-                corrected[i] = (corrected_text)
-                tokens_processed += tokens_corrected
-
-                if progress_callback:
-                    progress_callback(tokens_corrected)
-                logger.info(f"Finished processing paragraph {i}. Tokens corrected: {tokens_corrected}")
-                
+        usage_report = usage_report if usage_report is not None else UsageReport()
+
+        admitted, admitted_tokens = self.admit_paragraphs(all_paragraphs, selected_indices, total_token_limit)
+        admitted_set = set(admitted)
+        unprocessed = [all_paragraphs[i] for i in selected_indices if i not in admitted_set]
+
+        wait_for_context = context_window_size > 0 and self.context_mode == "corrected"
+        context_source = corrected if wait_for_context else all_paragraphs
+        finished = {i: asyncio.Event() for i in admitted}
+        semaphore = request_slot or asyncio.Semaphore(self.concurrency)
+        template = get_prompt_template(doc_type, language_variant, custom_prompt, self.prompt_layout)
+        to_send, skipped, duplicates = admitted, {}, {}
+        if paragraph_filter is None and self.prefilter:
+            paragraph_filter = ParagraphFilter()
+        if paragraph_filter is not None:
+            to_send, skipped, duplicates = paragraph_filter.split(all_paragraphs, admitted)
+        token_counts = dict(zip(admitted, admitted_tokens))
+        groups = pack_paragraphs(to_send, [token_counts[i] for i in to_send], self.pack_token_budget)
+        tokens_processed = 0
+
+        def get_cache_key(i, pack_start=None):
+            """
+            Returns the context and cache key of paragraph ``i``. In a pack starting at ``pack_start``, the
+            paragraphs of the pack before ``i`` were sent as original text, so they are keyed as such.
+            """
+            if pack_start is None or pack_start >= i:
+                context = self.get_context(context_source, i, context_window_size)
+            else:
+                context = "\n\n".join(all_paragraphs[j] if j >= pack_start else context_source[j]
+                                      for j in range(max(0, i - context_window_size), i))
+            return context, make_cache_key(all_paragraphs[i], self.model, self.temperature, language_variant,
+                                           doc_type, template.version, context)
+
+        def get_stream_progress():
+            if self.stream and progress_callback:
+                return StreamProgress(progress_callback, self.model)
+            return None
+
+        def finish(i, corrected_text, tokens_corrected, usage, stream_progress=None):
+            nonlocal tokens_processed
+            corrected[i] = corrected_text
+            tokens_processed += tokens_corrected
+            usage_report.record(i, usage)
+            finished[i].set()
+            if paragraph_filter is not None and not usage.get("failed") and not usage.get("skipped"):
+                paragraph_filter.remember(all_paragraphs[i], corrected_text)
+
+            if progress_callback:
+                progress_callback(stream_progress.settle(tokens_corrected) if stream_progress else tokens_corrected, usage)
+            if result_callback:
+                result_callback(i, corrected_text, usage)
+            logger.info(f"Finished processing paragraph {i}. Tokens corrected: {tokens_corrected}")
+
+        async def process(session, i):
+            logger.info(f"Processing paragraph {i}")
+            context, cache_key = get_cache_key(i)
+
+            prompt = template.render(context, all_paragraphs[i])
+
+            stream_progress = get_stream_progress()
+            corrected_text, tokens_corrected, usage = await self.correct_text(session, all_paragraphs[i], tokens_processed, prompt,
+                                                                              cache_key=cache_key, request_slot=semaphore,
+                                                                              system_prompt=template.system_prompt,
+                                                                              on_delta=stream_progress)
+            finish(i, corrected_text, tokens_corrected, usage, stream_progress)
+
+        async def process_group(session, group):
+            try:
+                if wait_for_context:
+                    for j in range(max(0, group[0] - context_window_size), group[0]):
+                        if j in finished:
+                            await finished[j].wait()
+
+                pending = list(group)
+                # Leading paragraphs that are already cached are taken from the cache one by one,
+                # the rest of the group is sent as a single packed request
+                while pending:
+                    cached_result = await self._get_cached_result(get_cache_key(pending[0], group[0])[1])
+                    if not cached_result:
+                        break
+                    finish(pending[0], *cached_result)
+                    pending.pop(0)
+
+                if len(pending) > 1:
+                    logger.info(f"Processing paragraphs {pending[0]}-{pending[-1]} in one request")
+                    context = self.get_context(context_source, pending[0], context_window_size)
+                    texts = [all_paragraphs[i] for i in pending]
+                    prompt = template.render_packed(context, texts)
+                    stream_progress = get_stream_progress()
+                    results = await self.correct_packed(session, texts, prompt, request_slot=semaphore,
+                                                        system_prompt=template.system_prompt, on_delta=stream_progress)
+                    if results is not None:
+                        for i, (corrected_text, usage) in zip(pending, results):
+                            save_correction_to_cache(get_cache_key(i, pending[0])[1], corrected_text, usage)
+                            finish(i, corrected_text, usage["completion_tokens"], usage, stream_progress)
+                        pending = []
+
+                for i in pending:
+                    await process(session, i)
+            finally:
+                for i in group:
+                    finished[i].set()
+
+        async def process_duplicate(i, original):
+            try:
+                await finished[original].wait()
+                usage = usage_report.paragraphs.get(original)
+                if usage is None or usage.get("failed"):
+                    usage = make_usage(failed=True)
+                else:
+                    usage = dict(make_usage(), skipped="duplicate")
+                finish(i, corrected[original], token_counts[i], usage)
+            finally:
+                finished[i].set()
+
+        for i, (rule, corrected_text) in skipped.items():
+            finish(i, corrected_text, token_counts[i], dict(make_usage(), skipped=rule))
+        if skipped or duplicates:
+            logger.info(f"Passing {len(skipped) + len(duplicates)} paragraph(s) through without a request")
+
+        session = session or await self.get_session()
+        await asyncio.gather(*(process_group(session, group) for group in groups),
+                             *(process_duplicate(i, original) for i, original in duplicates.items()))
+
+        await asyncio.to_thread(flush_cache)
+        logger.info(f"Correction cache stats: {get_cache_stats()}")
+        if len(self.backends) > 1:
+            logger.info(f"Backends: {[backend.to_dict() for backend in self.backends]}")
+        usage_report.log()
         return corrected, unprocessed
 
+    def admit_paragraphs(self, all_paragraphs, selected_indices, total_token_limit):
+        """
+        Picks the selected paragraphs that fit in the token limit.
+
+        The budget is reserved up front, in selection order, so the set of processed paragraphs does
+        not depend on which requests happen to finish first.
+
+        :return: Tuple of (admitted indices, their token counts).
+        """
+        admitted = []
+        admitted_tokens = []
+        tokens_reserved = 0
+        token_counts = count_tokens_batch([all_paragraphs[i] for i in selected_indices], self.model)
+        for i, tokens in zip(selected_indices, token_counts):
+            if tokens_reserved + tokens > total_token_limit:
+                logger.warning(f"Paragraph {i} exceeds token limit. Skipping.")
+                continue
+            tokens_reserved += tokens
+            admitted.append(i)
+            admitted_tokens.append(tokens)
+        return admitted, admitted_tokens
+
+    async def iter_corrected_paragraphs(self, all_paragraphs, selected_indices, total_token_limit, progress_callback, doc_type, language_variant, custom_prompt, context_window_size=DEFAULT_CONTEXT_WINDOW_SIZE,
+                                        usage_report=None, session=None, ordered=False):
+        """
+        Corrects paragraphs like correct_paragraphs, yielding each one as soon as it is done.
+
+        Paragraphs skipped because of the token limit are not yielded. Closing the iterator cancels the
+        paragraphs still in flight; to stop early, iterate inside ``contextlib.aclosing``:
+
+            async with aclosing(api_client.iter_corrected_paragraphs(...)) as results:
+                async for index, corrected_text, usage in results:
+                    ...
+
+        :param ordered: Yield in the order of ``selected_indices``, holding back paragraphs that finish
+                        before an earlier one. Useful for writing the output as the run progresses.
+        :return: Async iterator of (index, corrected_text, usage).
+        """
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self.correct_paragraphs(
+            all_paragraphs, selected_indices, total_token_limit, progress_callback, doc_type, language_variant,
+            custom_prompt, context_window_size, usage_report=usage_report, session=session,
+            result_callback=lambda i, text, usage: queue.put_nowait((i, text, usage))))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+
+        waiting = {}
+        remaining = iter(self.admit_paragraphs(all_paragraphs, selected_indices, total_token_limit)[0] if ordered else ())
+        next_index = next(remaining, None)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if not ordered:
+                    yield item
+                    continue
+                waiting[item[0]] = item
+                while next_index in waiting:
+                    yield waiting.pop(next_index)
+                    next_index = next(remaining, None)
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
     def get_context(self, corrected_paragraphs, current_index, context_window_size):
         """
         Get the context for the current paragraph.
@@ -78,66 +602,277 @@ class GrammarCorrectorAPI:
         logger.debug(f"Getting context for paragraph {current_index}. Context size: {len(context_paragraphs)}")
         return context
     
-    async def correct_text(self, session, text, tokens_processed, prompt, retry_count=0):
+    async def correct_text(self, session, text, tokens_processed, prompt, cache_key=None, request_slot=None,
+                           system_prompt=SYSTEM_PROMPT, on_delta=None):
         """
         Corrects a single paragraph using a custom prompt.
 
-        :param session: aiohttp ClientSession.
+        Failed requests are retried by call_with_retries. While it waits between attempts the paragraph
+        holds neither rate budget nor ``request_slot``.
+
+        :param session: HTTP session from get_session().
         :param text: Paragraph text to correct.
         :param tokens_processed: Tokens processed so far.
         :param prompt: Custom prompt for the text.
-        :param retry_count: Current retry attempt.
-        :return: Tuple of (corrected_text, tokens_corrected)
+        :param cache_key: Cache key from make_cache_key. Defaults to a key over the model, temperature and full prompt.
+        :param request_slot: Optional semaphore held only while a request is in flight.
+        :param system_prompt: System message sent before the prompt.
+        :param on_delta: Optional callable receiving each piece of text as it is streamed.
+        :return: Tuple of (corrected_text, tokens_corrected, usage). ``tokens_corrected`` is the number of
+                 completion tokens and ``usage`` the token usage reported by the API.
         """
         # Check cache
-        cache_key = f"{text}_{self.language_variant}"
-        cached_result = get_from_cache(cache_key)
+        if cache_key is None:
+            cache_key = make_cache_key(text, self.model, self.temperature, self.language_variant, None, None,
+                                       system_prompt + prompt)
+        cached_result = await self._get_cached_result(cache_key)
         if cached_result:
-            logger.info(f"Cache hit for paragraph.")
-            return cached_result, count_tokens(cached_result, self.model)
+            return cached_result
 
         try:
-            async with self.rate_limiter:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                payload = {
-                    "model": self.model,  # Use selected model
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": self.temperature,
-                    "max_tokens": 4096 if "gpt-3.5" in self.model else 8192,  # Adjust as needed
-                    "top_p": 1,
-                    "frequency_penalty": 0,
-                    "presence_penalty": 0
-                }
-                async with session.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload) as response:
-                    if response.status == 429:
-                        if retry_count < self.max_retries:
-                            wait_time = self.backoff_factor ** retry_count
-                            logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds...")
-                            await asyncio.sleep(wait_time)
-                            return await self.correct_text(session, text, tokens_processed, prompt, retry_count + 1)
-                        else:
-                            logger.error("Max retries exceeded. Returning original text.")
-                            return text, count_tokens(text, self.model)
-                    elif response.status != 200:
-                        result = await response.json()
-                        error_message = result.get("error", {}).get("message", "Unknown error.")
-                        logger.error(f"API Error: {error_message}")
-                        return text, count_tokens(text, self.model)
-
-                    result = await response.json()
-                    corrected_text = result['choices'][0]['message']['content'].strip()
-
+            corrected_text, usage = await call_with_retries(
+                lambda: self._request_correction(session, text, prompt, request_slot, system_prompt, on_delta),
+                self.retry_policy)
+        except CircuitOpenError as e:
+            logger.error(f"{e} Returning original text.")
+            return self._failed_result(text)
+        except APIError as e:
+            logger.error(f"API Error: {e}")
+            return self._failed_result(text)
         except Exception as e:
-            logger.error(f"An error occurred during text correction: {e}")
-            return text, count_tokens(text, self.model)  # Return original text on error
+            logger.error(f"An error occurred during text correction: {e!r}")
+            return self._failed_result(text)  # Return original text on error
 
         # Save to cache
-        save_to_cache(cache_key, corrected_text)
+        save_correction_to_cache(cache_key, corrected_text, usage)
         logger.info("Paragraph corrected successfully.")
-        return corrected_text, count_tokens(corrected_text, self.model)
+        return corrected_text, usage["completion_tokens"], usage
+
+    async def correct_packed(self, session, texts, prompt, request_slot=None, system_prompt=SYSTEM_PROMPT, on_delta=None):
+        """
+        Corrects several paragraphs with one request made by PromptTemplate.render_packed.
+
+        The usage of the request is divided between the paragraphs by their length.
+
+        :param session: HTTP session from get_session().
+        :param texts: Paragraph texts in the pack.
+        :param prompt: Packed prompt for the texts.
+        :param request_slot: Optional semaphore held only while a request is in flight.
+        :param system_prompt: System message sent before the prompt.
+        :param on_delta: Optional callable receiving each piece of text as it is streamed.
+        :return: List of (corrected_text, usage) per paragraph, or None if the request failed or its
+                 response could not be split back into paragraphs.
+        """
+        try:
+            content, usage = await call_with_retries(
+                lambda: self._request_correction(session, "\n\n".join(texts), prompt, request_slot, system_prompt, on_delta),
+                self.retry_policy)
+            paragraphs = parse_packed_response(content, len(texts))
+        except PackMismatchError as e:
+            logger.warning(f"{e} Correcting the paragraphs one by one.")
+            return None
+        except Exception as e:
+            logger.error(f"Packed request failed ({e!r}). Correcting the paragraphs one by one.")
+            return None
+
+        weights = count_tokens_batch(texts, self.model)
+        return list(zip(paragraphs, split_usage(usage, weights)))
+
+    async def _get_cached_result(self, cache_key):
+        """
+        Looks up a correction in the cache, in a worker thread so a busy database does not stall the loop.
+
+        :return: Tuple of (corrected_text, tokens_corrected, usage) like correct_text, or None on a miss.
+        """
+        cached_result = await asyncio.to_thread(get_correction_from_cache, cache_key)
+        if not cached_result:
+            return None
+        logger.info(f"Cache hit for paragraph.")
+        cached_text, cached_usage = cached_result
+        if cached_usage:
+            usage = dict(cached_usage, cached=True, failed=False)
+        else:
+            usage = make_usage(completion_tokens=count_tokens(cached_text, self.model), cached=True)
+        return cached_text, usage["completion_tokens"], usage
+
+    async def _request_correction(self, session, text, prompt, request_slot=None, system_prompt=SYSTEM_PROMPT, on_delta=None):
+        """
+        Sends one chat completion request, streamed if ``self.stream`` is set.
+
+        The request goes to the available backend with the most headroom. If it fails with an error
+        that another backend may not have (see _send), the next backend is tried straight away; the
+        error is raised once every backend has failed.
+
+        :return: Tuple of (corrected_text, usage).
+        :raises RetryableError: For 429 and 5xx responses.
+        :raises APIError: For other error responses.
+        :raises CircuitOpenError: If every backend's circuit breaker is open.
+        """
+        prompt_tokens = count_tokens(system_prompt, self.model) + count_tokens(prompt, self.model) + 2 * MESSAGE_TOKEN_OVERHEAD
+        payload = self.build_payload(text, prompt, system_prompt)
+        if self.stream:
+            payload.update(stream=True, stream_options={"include_usage": True})
+
+        tried = []
+        error = None
+        async with request_slot or nullcontext():
+            while True:
+                backend = self._choose_backend(tried)
+                if backend is None:
+                    if error is not None:
+                        raise error
+                    raise CircuitOpenError("Every backend is unhealthy. Not sending request.")
+                try:
+                    return await self._send(session, backend, payload, prompt_tokens, on_delta)
+                except CircuitOpenError:
+                    # Another request took the backend's half-open trial in the meantime
+                    pass
+                except Exception as e:
+                    if not (is_retryable_exception(e) or getattr(e, "status", None) in FAILOVER_STATUSES):
+                        raise
+                    error = e
+                    if len(tried) + 1 < len(self.backends):
+                        logger.warning(f"Backend {backend.name} failed ({type(e).__name__}: {e}). Trying another backend.")
+                tried.append(backend)
+
+    def _choose_backend(self, exclude=()):
+        """
+        Returns the backend with the largest share of its rate budget free among those whose circuit
+        breaker lets requests through, or None if there is none.
+        """
+        candidates = [backend for backend in self.backends if backend not in exclude and backend.circuit_breaker.available]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda backend: backend.rate_limiter.headroom())
+
+    async def _send(self, session, backend, payload, prompt_tokens, on_delta=None):
+        """
+        Sends a request to one backend, charging its rate limiter and recording the outcome in its circuit
+        breaker. Authentication and not-found errors count as failures too, as they mean the backend's
+        key or model is unusable.
+
+        :return: Tuple of (corrected_text, usage).
+        """
+        payload = dict(payload, model=backend.model)
+        breaker = backend.circuit_breaker
+
+        async def post():
+            async with session.post(f"{backend.base_url}/chat/completions", headers=backend.get_headers(), json=payload) as response:
+                backend.rate_limiter.update_from_headers(response.headers)
+                if response.status == 200:
+                    if self.stream:
+                        return await self._read_stream(response, on_delta)
+                    return await response.json()
+                try:
+                    result = await response.json()
+                    error_message = result.get("error", {}).get("message", "Unknown error.")
+                except Exception:
+                    error_message = f"HTTP {response.status}"
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableError(error_message, response.status, parse_retry_after(response.headers))
+                raise APIError(error_message, response.status)
+
+        reserved_tokens = await backend.rate_limiter.acquire(prompt_tokens + payload["max_tokens"])
+        try:
+            # Checked last, so requests already queued for a slot or for rate budget also wait
+            await self._resumed.wait()
+            breaker.before_call()
+            backend.requests += 1
+            try:
+                result = await asyncio.wait_for(post(), self.request_timeout)
+                corrected_text = result['choices'][0]['message']['content'].strip()
+            except Exception as e:
+                backend.failures += 1
+                if counts_against_circuit(e) or getattr(e, "status", None) in FAILOVER_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+        except BaseException:
+            backend.rate_limiter.reconcile(reserved_tokens, 0)
+            raise
+        breaker.record_success()
+
+        usage = usage_from_response(result)
+        if usage is None:
+            # Some OpenAI-compatible servers omit the usage block
+            usage = make_usage(prompt_tokens, count_tokens(corrected_text, self.model))
+        backend.rate_limiter.reconcile(reserved_tokens, usage["total_tokens"])
+        return corrected_text, usage
+
+    async def _read_stream(self, response, on_delta=None):
+        """
+        Reads a server-sent event stream of chat completion chunks and assembles the text.
+
+        :param on_delta: Optional callable receiving each piece of text as it arrives. A StreamProgress
+                         is restarted first, as the stream may be a retry of one that was cut off.
+        :return: A response dictionary shaped like a non-streamed chat completion.
+        :raises ConnectionError: If the stream ends before the completion is finished, so it is retried.
+        """
+        if isinstance(on_delta, StreamProgress):
+            on_delta.restart()
+        parts = []
+        usage = None
+        finished = False
+        async for line in response.content:
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                finished = True
+                break
+            chunk = json.loads(data)
+            if chunk.get("error"):
+                raise APIError(chunk["error"].get("message", "Error in response stream."))
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    if on_delta:
+                        on_delta(delta)
+                if choice.get("finish_reason"):
+                    finished = True
+        if not finished:
+            raise ConnectionError("Response stream ended before the completion finished.")
+        return {"choices": [{"message": {"content": "".join(parts)}}], "usage": usage}
+
+    def build_payload(self, text, prompt, system_prompt=SYSTEM_PROMPT):
+        """
+        Builds the chat completion request body for a paragraph.
+
+        The system message comes first so that, with the "prefix" prompt layout, every request of a document
+        shares the same prefix.
+        """
+        return {
+            "model": self.model,  # Use selected model
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.get_max_tokens(text),
+            "top_p": 1,
+            "frequency_penalty": 0,
+            "presence_penalty": 0
+        }
+
+    def get_max_tokens(self, text):
+        """
+        Completion token cap for a paragraph.
+
+        A correction is about as long as its input, so the cap scales with the paragraph instead of using
+        the model maximum. The cap is what the API charges against the tokens-per-minute quota up front.
+        """
+        model_max = 4096 if "gpt-3.5" in self.model else 8192
+        return min(model_max, int(count_tokens(text, self.model) * DEFAULT_COMPLETION_TOKEN_RATIO) + DEFAULT_COMPLETION_TOKEN_MARGIN)
+
+    def _failed_result(self, text):
+        """
+        Result returned when a paragraph could not be corrected: the original text and no billed usage.
+        """
+        return text, count_tokens(text, self.model), make_usage(failed=True)
@@ -0,0 +1,242 @@
+# batch_client.py
+
+import asyncio
+import hashlib
+import json
+import os
+import aiohttp
+from loguru import logger
+from src.cache_manager import get_correction_from_cache, save_correction_to_cache, make_cache_key
+from src.prefilter import ParagraphFilter
+from src.prompts import get_prompt_template
+from src.retry import APIError, RetryableError, RETRYABLE_STATUSES, call_with_retries, parse_retry_after
+from src.usage import UsageReport, make_usage, usage_from_response
+from src.utils import count_tokens_batch
+from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_BATCH_POLL_INTERVAL, DEFAULT_BATCH_COMPLETION_WINDOW,
+                        DEFAULT_BATCH_MAX_REQUESTS)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINISHED_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchCorrector:
+    """
+    Corrects paragraphs through the OpenAI Batch API instead of one request per paragraph.
+
+    Requests are written as JSONL, uploaded and submitted as one or more batches, which are then
+    polled until they finish. Results are written to the correction cache as soon as a batch is
+    collected. Submitted batch ids are kept in a state file, so a run that is interrupted resumes
+    polling the same batches instead of submitting them again.
+
+    Every request is built up front, so context always comes from the original text. Paragraphs the
+    client's pre-filter passes through are left out of the batch.
+
+    Batches are submitted to the client's first backend only: a batch lives on the server it was
+    submitted to, so it cannot be spread over a pool or failed over.
+    """
+    def __init__(self, api_client, poll_interval=DEFAULT_BATCH_POLL_INTERVAL,
+                 completion_window=DEFAULT_BATCH_COMPLETION_WINDOW, max_requests=DEFAULT_BATCH_MAX_REQUESTS):
+        self.api_client = api_client
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_requests = max_requests
+
+    async def correct_paragraphs(self, all_paragraphs, selected_indices, total_token_limit, progress_callback, doc_type, language_variant, custom_prompt, context_window_size=DEFAULT_CONTEXT_WINDOW_SIZE,
+                                 usage_report=None, state_path=None):
+        """
+        Corrects selected paragraphs with a batch job. Takes the same arguments as
+        GrammarCorrectorAPI.correct_paragraphs, plus:
+
+        :param state_path: File that records submitted batches, used to resume after a restart.
+        :return: Tuple of (corrected_paragraphs, unprocessed_paragraphs)
+        """
+        api = self.api_client
+        corrected = all_paragraphs.copy()
+        unprocessed = []
+        usage_report = usage_report if usage_report is not None else UsageReport()
+        template = get_prompt_template(doc_type, language_variant, custom_prompt, api.prompt_layout)
+
+        requests = {}
+        lines = {}
+        tokens_reserved = 0
+        skipped, duplicates = {}, {}
+        admitted_duplicates = []
+        if api.prefilter:
+            _, skipped, duplicates = ParagraphFilter().split(all_paragraphs, selected_indices)
+        token_counts = count_tokens_batch([all_paragraphs[i] for i in selected_indices], api.model)
+        for i, tokens in zip(selected_indices, token_counts):
+            if tokens_reserved + tokens > total_token_limit:
+                unprocessed.append(all_paragraphs[i])
+                logger.warning(f"Paragraph {i} exceeds token limit. Skipping.")
+                continue
+            tokens_reserved += tokens
+            if i in skipped:
+                self._record(usage_report, progress_callback, i, dict(make_usage(), skipped=skipped[i][0]))
+                continue
+            if i in duplicates:
+                admitted_duplicates.append(i)
+                continue
+
+            text = all_paragraphs[i]
+            context = api.get_context(all_paragraphs, i, context_window_size)
+            prompt = template.render(context, text)
+            cache_key = make_cache_key(text, api.model, api.temperature, language_variant, doc_type, template.version, context)
+            custom_id = f"paragraph-{i}"
+            requests[custom_id] = {"index": i, "cache_key": cache_key}
+            cached_result = await asyncio.to_thread(get_correction_from_cache, cache_key)
+            if cached_result:
+                corrected[i] = cached_result[0]
+                self._record(usage_report, progress_callback, i, dict(cached_result[1] or make_usage(), cached=True, failed=False))
+                continue
+
+            lines[custom_id] = json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT,
+                                           "body": api.build_payload(text, prompt, template.system_prompt)}, ensure_ascii=False)
+
+        if lines:
+            # The state is keyed by every admitted request, not just the cache misses, so that results
+            # cached by an interrupted run do not stop it from being resumed
+            state = self._load_state(state_path, requests)
+            session = await api.get_session()
+            if not isinstance(session, aiohttp.ClientSession):
+                raise ValueError("The Batch API needs the aiohttp HTTP transport.")
+            await self._submit(session, state, lines, state_path)
+            await self._collect(session, state, state_path)
+
+            for custom_id in lines:
+                i = requests[custom_id]["index"]
+                cached_result = await asyncio.to_thread(get_correction_from_cache, requests[custom_id]["cache_key"])
+                if cached_result:
+                    corrected[i] = cached_result[0]
+                    self._record(usage_report, progress_callback, i, dict(cached_result[1] or make_usage(), cached=False, failed=False))
+                else:
+                    logger.error(f"No batch result for paragraph {i}. Keeping original text.")
+                    self._record(usage_report, progress_callback, i, make_usage(failed=True))
+
+        # A repeat that did not fit the token limit is left in unprocessed, even if the paragraph it repeats did
+        for i in admitted_duplicates:
+            original = duplicates[i]
+            if original in usage_report.paragraphs:
+                corrected[i] = corrected[original]
+                failed = usage_report.paragraphs[original].get("failed")
+                self._record(usage_report, progress_callback, i,
+                             make_usage(failed=True) if failed else dict(make_usage(), skipped="duplicate"))
+
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+
+        usage_report.log()
+        return corrected, unprocessed
+
+    def _record(self, usage_report, progress_callback, index, usage):
+        usage_report.record(index, usage)
+        if progress_callback:
+            progress_callback(usage["completion_tokens"], usage)
+
+    def _load_state(self, state_path, requests):
+        fingerprint = hashlib.sha256(json.dumps(requests, sort_keys=True).encode("utf-8")).hexdigest()
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                logger.info(f"Resuming {len(state['batches'])} batch(es) from {state_path}")
+                return state
+            logger.warning(f"Batch state in {state_path} belongs to different requests. Starting over.")
+        return {"fingerprint": fingerprint, "requests": requests, "batches": []}
+
+    def _save_state(self, state_path, state):
+        if not state_path:
+            return
+        temp_path = f"{state_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, state_path)
+
+    async def _request(self, session, method, path, as_text=False, upload=None, **kwargs):
+        """
+        Calls a Files/Batches endpoint with retries and returns the response body.
+
+        :param as_text: Return the body as text instead of parsed JSON.
+        :param upload: Optional (filename, bytes) sent as a multipart batch file upload.
+        """
+        url = f"{self.api_client.base_url}{path}"
+        api_key = self.api_client.api_key
+        # Local servers without a key get no Authorization header, as with chat completions
+        kwargs["headers"] = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+        async def attempt():
+            if upload is not None:
+                # Form data can only be sent once, so it is rebuilt for every attempt
+                form = aiohttp.FormData()
+                form.add_field("purpose", "batch")
+                form.add_field("file", upload[1], filename=upload[0], content_type="application/jsonl")
+                kwargs["data"] = form
+            async with session.request(method, url, **kwargs) as response:
+                if response.status == 200:
+                    if as_text:
+                        return await response.text()
+                    return await response.json()
+                message = await response.text()
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableError(message, response.status, parse_retry_after(response.headers))
+                raise APIError(message, response.status)
+
+        return await call_with_retries(attempt, self.api_client.retry_policy)
+
+    async def _submit(self, session, state, lines, state_path):
+        submitted = {custom_id for batch in state["batches"] for custom_id in batch["custom_ids"]}
+        remaining = [custom_id for custom_id in lines if custom_id not in submitted]
+        for start in range(0, len(remaining), self.max_requests):
+            custom_ids = remaining[start:start + self.max_requests]
+            content = "\n".join(lines[custom_id] for custom_id in custom_ids).encode("utf-8")
+            input_file = await self._request(session, "POST", "/files", upload=("batch.jsonl", content))
+            batch = await self._request(session, "POST", "/batches", json={
+                "input_file_id": input_file["id"],
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": self.completion_window,
+            })
+            state["batches"].append({"id": batch["id"], "input_file_id": input_file["id"], "custom_ids": custom_ids,
+                                     "status": batch.get("status"), "collected": False})
+            self._save_state(state_path, state)
+            logger.info(f"Submitted batch {batch['id']} with {len(custom_ids)} request(s)")
+
+    async def _collect(self, session, state, state_path):
+        while True:
+            waiting = [batch for batch in state["batches"] if not batch["collected"]]
+            if not waiting:
+                return
+            for batch in waiting:
+                info = await self._request(session, "GET", f"/batches/{batch['id']}")
+                batch["status"] = info.get("status")
+                if batch["status"] not in FINISHED_BATCH_STATUSES:
+                    continue
+                if batch["status"] != "completed":
+                    logger.error(f"Batch {batch['id']} ended with status {batch['status']}")
+                for file_key in ("output_file_id", "error_file_id"):
+                    if info.get(file_key):
+                        content = await self._request(session, "GET", f"/files/{info[file_key]}/content", as_text=True)
+                        self._apply_results(state, content)
+                batch["collected"] = True
+                self._save_state(state_path, state)
+            if any(not batch["collected"] for batch in state["batches"]):
+                counts = [batch["status"] for batch in state["batches"]]
+                logger.info(f"Waiting for batches: {counts}")
+                await asyncio.sleep(self.poll_interval)
+
+    def _apply_results(self, state, content):
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            request = state["requests"].get(result.get("custom_id"))
+            response = result.get("response") or {}
+            if request is None:
+                continue
+            if result.get("error") or response.get("status_code") != 200:
+                logger.error(f"Batch request {result.get('custom_id')} failed: {result.get('error') or response.get('body')}")
+                continue
+            body = response["body"]
+            corrected_text = body['choices'][0]['message']['content'].strip()
+            usage = usage_from_response(body) or make_usage()
+            save_correction_to_cache(request["cache_key"], corrected_text, usage)
@@ -1,38 +1,406 @@
 # cache_manager.py
 
+import abc
+import atexit
+import hashlib
+import itertools
 import json
-import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from loguru import logger
+from src.config import (DEFAULT_MEMORY_CACHE_MAX_ENTRIES, DEFAULT_MEMORY_CACHE_MAX_BYTES, DEFAULT_MEMORY_CACHE_TTL,
+                        DEFAULT_CACHE_WRITE_BATCH)
+
+CACHE_FILE = "correction_cache.sqlite3"
+CACHE_KEY_VERSION = 1
+
+
+def digest_text(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_cache_key(text, model, temperature, language_variant, doc_type, template_version, context=""):
+    """
+    Builds a fixed-size cache key from every input that affects the corrected output.
+
+    The inputs are canonicalised into a JSON document and hashed, so results produced with a
+    different model, temperature, prompt, document type, language variant or context never collide.
+
+    :param text: Paragraph text to correct.
+    :param model: Model name.
+    :param temperature: Sampling temperature.
+    :param language_variant: The language variant used in the prompt.
+    :param doc_type: The type of document being corrected.
+    :param template_version: Prompt template version, PromptTemplate.version.
+    :param context: Context string included in the prompt, if any.
+    :return: Hex digest string.
+    """
+    canonical = json.dumps({
+        "version": CACHE_KEY_VERSION,
+        "model": model,
+        "temperature": round(float(temperature), 6),
+        "language_variant": language_variant,
+        "doc_type": doc_type,
+        "template_version": template_version,
+        "context": digest_text(context),
+        "text": digest_text(text),
+    }, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(abc.ABC):
+    """
+    Interface for persistent cache stores. Backends map string keys to string values.
+    """
+    @abc.abstractmethod
+    def get(self, key):
+        """
+        Returns the value stored under ``key``, or None.
+        """
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    @abc.abstractmethod
+    def set_many(self, items):
+        """
+        Stores a list of (key, value) pairs.
+        """
+
+    @abc.abstractmethod
+    def clear(self):
+        """
+        Removes every entry.
+        """
+
+    def flush(self):
+        """
+        Blocks until every write made so far is stored. Backends that write synchronously have nothing to do.
+        """
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache stored in an SQLite database in WAL mode.
+
+    Reads and writes are single indexed statements, every set_many call is committed in its own
+    transaction, and WAL lets several processes share the same file. Calls block for up to ``timeout``
+    seconds while another connection holds the write lock, so they belong off the event loop.
+    """
+    def __init__(self, path=CACHE_FILE, timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        logger.debug(f"Opened cache database {path}")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_many(self, items):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", items)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryCache:
+    """
+    Bounded in-process LRU cache with an optional time-to-live.
+
+    Entries are evicted least recently used first once either the entry limit or the byte limit
+    (UTF-8 size of key and value) is exceeded.
+    """
+    def __init__(self, max_entries=DEFAULT_MEMORY_CACHE_MAX_ENTRIES, max_bytes=DEFAULT_MEMORY_CACHE_MAX_BYTES,
+                 ttl=DEFAULT_MEMORY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class TieredCacheBackend(CacheBackend):
+    """
+    Serves reads from a MemoryCache and falls back to a persistent backend, writing through to both.
+    """
+    def __init__(self, backend, memory=None):
+        self.backend = backend
+        self.memory = memory if memory is not None else MemoryCache()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.backend.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set_many(self, items):
+        self.backend.set_many(items)
+        for key, value in items:
+            self.memory.set(key, value)
+
+    def flush(self):
+        self.backend.flush()
+
+    def clear(self):
+        self.memory.clear()
+        self.backend.clear()
+
+    def close(self):
+        self.backend.close()
+
+
+class CacheWriter(CacheBackend):
+    """
+    Hands writes to a background thread, so saving a correction never waits on the database.
+
+    The thread commits everything queued since its last commit, up to ``max_batch`` entries, in one
+    transaction. Entries still waiting are served by get, so a write is visible as soon as it is made.
+    """
+    def __init__(self, backend, max_batch=DEFAULT_CACHE_WRITE_BATCH):
+        self.backend = backend
+        self.max_batch = max_batch
+        self._pending = {}
+        self._writing = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="cache-writer", daemon=True)
+        self._thread.start()
+
+    def get(self, key):
+        with self._condition:
+            value = self._pending.get(key)
+        return value if value is not None else self.backend.get(key)
+
+    def set_many(self, items):
+        with self._condition:
+            if not self._closed:
+                self._pending.update(items)
+                self._condition.notify_all()
+                return
+        self.backend.set_many(items)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                items = list(itertools.islice(self._pending.items(), self.max_batch))
+                self._writing = True
+            try:
+                self.backend.set_many(items)
+            except Exception as e:
+                # The batch is dropped rather than retried, so one bad entry cannot stop the writer
+                logger.error(f"Failed to write {len(items)} entries to cache: {e!r}")
+            finally:
+                with self._condition:
+                    for key, value in items:
+                        # A key written again in the meantime stays queued with its new value
+                        if self._pending.get(key) is value:
+                            del self._pending[key]
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def flush(self):
+        with self._condition:
+            while (self._pending or self._writing) and self._thread.is_alive():
+                self._condition.wait()
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+            while self._writing:
+                self._condition.wait()
+            self.backend.clear()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.backend.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_cache_backend(path=CACHE_FILE):
+    """
+    Creates the default cache: a MemoryCache in front of an SQLite store written by a background thread.
+    """
+    return TieredCacheBackend(CacheWriter(SQLiteCacheBackend(path)))
+
+
+def get_cache_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_cache_backend()
+        return _backend
+
+
+def set_cache_backend(backend):
+    """
+    Replaces the cache backend used by the module-level helpers.
+
+    :param backend: A CacheBackend instance, or None to fall back to the default SQLite store.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is not None and _backend is not backend:
+            _backend.close()
+        _backend = backend
 
-CACHE_FILE = "correction_cache.json"
 
 def get_from_cache(key):
     try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-        return cache.get(key)
-    except (FileNotFoundError, json.JSONDecodeError):
+        return get_cache_backend().get(key)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to read from cache: {e}")
         return None
 
+
 def save_to_cache(key, value):
     try:
-        if os.path.exists(CACHE_FILE):
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-        else:
-            cache = {}
-    except (json.JSONDecodeError):
-        cache = {}
-    
-    cache[key] = value
-    
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, indent=4)
+        get_cache_backend().set(key, value)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to write to cache: {e}")
+
+
+def get_correction_from_cache(key):
+    """
+    Returns a cached correction as (corrected_text, usage), or None on a miss.
+
+    Usage is the token usage recorded when the correction was made, or None for plain text entries.
+    """
+    value = get_from_cache(key)
+    if value is None:
+        return None
+    try:
+        entry = json.loads(value)
+    except ValueError:
+        return value, None
+    if isinstance(entry, dict) and "text" in entry:
+        return entry["text"], entry.get("usage")
+    return value, None
+
+
+def save_correction_to_cache(key, corrected_text, usage=None):
+    save_to_cache(key, json.dumps({"text": corrected_text, "usage": usage}, ensure_ascii=False))
+
+
+def flush_cache():
+    """
+    Blocks until every correction saved so far is stored, if a cache has been opened.
+    """
+    with _backend_lock:
+        backend = _backend
+    if backend is None:
+        return
+    try:
+        backend.flush()
+    except sqlite3.Error as e:
+        logger.error(f"Failed to write to cache: {e}")
+
+
+atexit.register(flush_cache)
+
+
+def get_cache_stats():
+    """
+    Returns hit/miss/eviction counters of the in-memory tier, or an empty dict if there is none.
+    """
+    memory = getattr(get_cache_backend(), "memory", None)
+    return memory.stats() if memory is not None else {}
+
 
 def clear_cache():
     try:
-        if os.path.exists(CACHE_FILE):
-            os.remove(CACHE_FILE)
-            logger.info(f"Cache file {CACHE_FILE} deleted successfully.")
+        get_cache_backend().clear()
+        logger.info("Cache cleared successfully.")
     except Exception as e:
-        logger.error(f"Failed to delete cache file {CACHE_FILE}: {e}")
+        logger.error(f"Failed to clear cache: {e}")
@@ -0,0 +1,205 @@
+# cli.py
+
+import argparse
+import glob
+import os
+import sys
+import time
+from loguru import logger
+from src.api_client import load_backends
+from src.document_types import DOCUMENT_TYPES
+from src.prefilter import PREFILTER_RULES
+from src.pipeline import (CorrectionOptions, correct_documents, correct_document, load_checkpoint, flush_checkpoint,
+                          SUPPORTED_EXTENSIONS)
+from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TEMPERATURE, DEFAULT_DOCUMENT_TYPE, DEFAULT_MODEL,
+                        DEFAULT_LANGUAGE_VARIANT, DEFAULT_CONCURRENCY, DEFAULT_CONTEXT_MODE, CONTEXT_MODES,
+                        DEFAULT_DOCUMENT_JOBS, DEFAULT_BATCH_POLL_INTERVAL, DEFAULT_PACK_TOKEN_BUDGET,
+                        DEFAULT_PROMPT_LAYOUT, PROMPT_LAYOUTS, DEFAULT_STREAM_RESPONSES, DEFAULT_API_BASE_URL,
+                        DEFAULT_PREFILTER)
+
+
+def expand_inputs(inputs):
+    """
+    Expands files, directories and glob patterns into a sorted list of supported documents.
+
+    Directories are searched recursively. Files named ``*_corrected`` are skipped so that earlier
+    output is not corrected again.
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True) or [item]
+        for path in matches:
+            name, ext = os.path.splitext(os.path.basename(path))
+            if os.path.isfile(path) and ext.lower() in SUPPORTED_EXTENSIONS and not name.endswith("_corrected"):
+                paths.add(path)
+            elif not os.path.exists(path):
+                logger.warning(f"No such file: {path}")
+    return sorted(paths)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grammar-correct", description="Correct grammar in .docx, .pdf and .txt documents.")
+    parser.add_argument("inputs", nargs="*", help="Files, directories or glob patterns to correct")
+    parser.add_argument("-o", "--output", help="Output file (single input only)")
+    parser.add_argument("--output-dir", help="Directory for corrected documents (default: next to each input)")
+    parser.add_argument("--format", choices=["docx", "pdf", "txt"], help="Output format (default: same as input)")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"), help="OpenAI API key (default: $OPENAI_API_KEY)")
+    parser.add_argument("--base-url", default=DEFAULT_API_BASE_URL,
+                        help="OpenAI-compatible API endpoint, such as a self-hosted server (default: %(default)s)")
+    parser.add_argument("--backends", metavar="FILE",
+                        help="JSON list of {base_url, api_key or api_key_env, model, rate_limit, token_rate_limit} "
+                             "backends to spread requests over, instead of --api-key and --base-url")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE_VARIANT, choices=["American English", "British English"])
+    parser.add_argument("--doc-type", default=DEFAULT_DOCUMENT_TYPE, choices=list(DOCUMENT_TYPES))
+    parser.add_argument("--prompt-file", help="File containing a custom prompt to use instead of the document type guidelines")
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--context-window", type=int, default=DEFAULT_CONTEXT_WINDOW_SIZE, help="Number of previous paragraphs used as context")
+    parser.add_argument("--context-mode", default=DEFAULT_CONTEXT_MODE, choices=CONTEXT_MODES)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Paragraphs in flight per document")
+    parser.add_argument("--pack-tokens", type=int, default=DEFAULT_PACK_TOKEN_BUDGET,
+                        help="Pack consecutive short paragraphs into one request of up to this many tokens (0 disables)")
+    parser.add_argument("--prompt-layout", default=DEFAULT_PROMPT_LAYOUT, choices=PROMPT_LAYOUTS,
+                        help="'prefix' keeps the instructions in a shared system message the provider can cache, "
+                             "which pays off once they are over 1024 tokens, such as a long --prompt-file")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=DEFAULT_STREAM_RESPONSES,
+                        help="Stream completions as they are generated")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=True,
+                        help="Reuse corrections of paragraphs unchanged since the previous run of the same output")
+    parser.add_argument("--prefilter", action=argparse.BooleanOptionalAction, default=DEFAULT_PREFILTER,
+                        help="Pass numbers, dates, short labels and repeated paragraphs through without sending them")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_DOCUMENT_JOBS, help="Documents processed at the same time")
+    parser.add_argument("--token-limit", type=int, help="Maximum tokens per document (default: no limit)")
+    parser.add_argument("--batch", action="store_true", help="Submit through the OpenAI Batch API (cheaper, slower, resumable)")
+    parser.add_argument("--batch-poll-interval", type=float, default=DEFAULT_BATCH_POLL_INTERVAL, help="Seconds between batch status checks")
+    parser.add_argument("--resume", metavar="JOURNAL",
+                        help="Resume an interrupted run from its <output>.journal.jsonl, with the settings it was started with")
+    parser.add_argument("--flush", metavar="JOURNAL",
+                        help="Write the output of an interrupted or running run from its journal and exit")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show INFO logs")
+    return parser
+
+
+def needs_api_key(options):
+    """
+    True if the run would send requests to the OpenAI API without a key. Other endpoints may not need one.
+    """
+    if options.api_key:
+        return False
+    if options.backends:
+        return any(backend.get("base_url", "").rstrip("/") == DEFAULT_API_BASE_URL
+                   and not backend.get("api_key") and not backend.get("api_key_env") for backend in options.backends)
+    return options.base_url.rstrip("/") == DEFAULT_API_BASE_URL
+
+
+def print_summary(results, elapsed):
+    paragraphs = sum(result.paragraphs for result in results)
+    prompt_tokens = sum(result.usage.prompt_tokens for result in results)
+    completion_tokens = sum(result.usage.completion_tokens for result in results)
+    cached_tokens = sum(result.usage.cached_tokens for result in results)
+    api_calls = sum(result.usage.api_calls for result in results)
+    cache_hits = sum(result.usage.cache_hits for result in results)
+    failures = sum(result.usage.failures for result in results)
+    reused = sum(result.reused for result in results)
+    skipped = {}
+    for result in results:
+        for rule, count in result.usage.skipped.items():
+            skipped[rule] = skipped.get(rule, 0) + count
+    total_tokens = prompt_tokens + completion_tokens
+
+    for result in results:
+        if result.error:
+            print(f"FAILED  {result.input_path}: {result.error}")
+        else:
+            print(f"OK      {result.input_path} -> {result.output_path} ({result.paragraphs} paragraphs, {result.elapsed:.1f}s)")
+    print(f"\n{len(results)} document(s), {paragraphs} paragraph(s) in {elapsed:.1f}s "
+          f"({paragraphs / elapsed if elapsed else 0:.1f} paragraphs/s)")
+    print(f"API calls: {api_calls}, cache hits: {cache_hits}, failed paragraphs: {failures}, "
+          f"reused from earlier runs: {reused} ({reused / paragraphs if paragraphs else 0:.0%} of paragraphs)")
+    if skipped:
+        rules = ", ".join(f"{rule} {skipped[rule]}" for rule in PREFILTER_RULES if rule in skipped)
+        print(f"Passed through without a request: {sum(skipped.values())} ({rules})")
+    print(f"Tokens: {total_tokens} (prompt {prompt_tokens}, completion {completion_tokens}), "
+          f"prompt cache: {cached_tokens} tokens ({cached_tokens / prompt_tokens if prompt_tokens else 0:.0%} of prompt), "
+          f"{total_tokens / elapsed if elapsed else 0:.0f} tokens/s")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO" if args.verbose else "WARNING")
+
+    if args.flush:
+        output_path, written, total = flush_checkpoint(args.flush, args.output)
+        print(f"Wrote {output_path} with {written} of {total} paragraph(s) corrected")
+        return 0
+    if args.resume:
+        input_path, options = load_checkpoint(args.resume, args.api_key)
+        if needs_api_key(options):
+            parser.error("an API key is required (--api-key or $OPENAI_API_KEY)")
+        start = time.perf_counter()
+        result = correct_document(input_path, options)
+        print_summary([result], time.perf_counter() - start)
+        return 0
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no supported documents found")
+    if args.output and len(paths) > 1:
+        parser.error("--output can only be used with a single input document")
+
+    if args.batch and args.backends:
+        parser.error("--batch submits every request through one endpoint and cannot be combined with --backends")
+    backends = None
+    if args.backends:
+        try:
+            backends = load_backends(args.backends)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read backends: {e}")
+
+    custom_prompt = None
+    if args.prompt_file:
+        with open(args.prompt_file, 'r', encoding='utf-8') as f:
+            custom_prompt = f.read().strip()
+
+    options = CorrectionOptions(
+        api_key=args.api_key,
+        base_url=args.base_url,
+        backends=backends,
+        language_variant=args.language,
+        model=args.model,
+        doc_type=args.doc_type,
+        custom_prompt=custom_prompt,
+        temperature=args.temperature,
+        context_window_size=args.context_window,
+        context_mode=args.context_mode,
+        concurrency=args.concurrency,
+        pack_token_budget=args.pack_tokens,
+        prompt_layout=args.prompt_layout,
+        stream=args.stream,
+        token_limit=args.token_limit,
+        output_path=args.output,
+        output_dir=args.output_dir,
+        output_format=args.format,
+        batch=args.batch,
+        batch_poll_interval=args.batch_poll_interval,
+        incremental=args.incremental,
+        prefilter=args.prefilter,
+    )
+
+    if needs_api_key(options):
+        parser.error("an API key is required (--api-key or $OPENAI_API_KEY)")
+
+    start = time.perf_counter()
+    results = correct_documents(paths, options, jobs=args.jobs)
+    print_summary(results, time.perf_counter() - start)
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
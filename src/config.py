@@ -19,13 +19,105 @@ DEFAULT_MODEL = "gpt-4o-mini"
 # Language Variant
 DEFAULT_LANGUAGE_VARIANT = "British English"
 
+# API Endpoint
+DEFAULT_API_BASE_URL = "https://api.openai.com/v1"
+
 # Rate Limiting
 DEFAULT_RATE_LIMIT=450
 DEFAULT_RATE_PERIOD=60
+DEFAULT_TOKEN_RATE_LIMIT = 200000  # Tokens per DEFAULT_RATE_PERIOD, adapted from the API's rate limit headers
+# Completion cap per paragraph: input tokens * ratio + margin
+DEFAULT_COMPLETION_TOKEN_RATIO = 2
+DEFAULT_COMPLETION_TOKEN_MARGIN = 256
+
+# Request Packing
+# Consecutive short paragraphs are corrected together in one request to save the prompt overhead
+DEFAULT_PACK_TOKEN_BUDGET = 400  # Paragraph tokens per packed request, 0 disables packing
+DEFAULT_PACK_MAX_PARAGRAPHS = 16
+DEFAULT_PACK_PARAGRAPH_TOKENS = 120  # Longer paragraphs are always sent on their own
+
+# Prompt Layout
+# "prefix" sends the instructions as a system message that is identical for every paragraph of a
+# document, so the provider can serve it from its prompt cache; "combined" sends everything in one
+# user message. The built-in guidelines are well below the shortest prefix providers cache, so
+# "prefix" only pays off with long custom prompts
+DEFAULT_PROMPT_LAYOUT = "combined"
+PROMPT_LAYOUTS = ["prefix", "combined"]
+PROMPT_CACHE_MIN_TOKENS = 1024  # Shortest prompt prefix OpenAI caches
+
+# Streaming
+# Stream completions as server-sent events, so progress moves token by token instead of per paragraph
+DEFAULT_STREAM_RESPONSES = False
+
+# Pre-Filter
+# Paragraphs that cannot need correction are passed through without a request: lines of only numbers,
+# dates and references, short labels, and repeats of a paragraph already corrected in the same run
+DEFAULT_PREFILTER = True
+DEFAULT_PREFILTER_MAX_LABEL_WORDS = 6  # Longest paragraph, in words, passed through as a label; 0 disables the rule
+
+# Concurrency
+DEFAULT_CONCURRENCY = 8
+# "original" uses the original text as context so every paragraph can run at once; "corrected" waits
+# for the corrected text of the context paragraphs (same output as a sequential run), which runs a
+# contiguous selection one paragraph after another
+DEFAULT_CONTEXT_MODE = "original"
+CONTEXT_MODES = ["corrected", "original"]
+DEFAULT_DOCUMENT_JOBS = 4  # Documents corrected at the same time by the command line tool
+
+# Job Scheduling
+# Documents running at the same time share concurrency x jobs request slots, handed out by priority
+# and then evenly between documents
+DEFAULT_JOB_PRIORITY = 0  # Higher runs first
+DEFAULT_SCHEDULER_REPORT_INTERVAL = 10  # Seconds between progress and ETA log lines
+
+# Batch API
+DEFAULT_BATCH_POLL_INTERVAL = 30  # Seconds between batch status checks
+DEFAULT_BATCH_COMPLETION_WINDOW = "24h"
+DEFAULT_BATCH_MAX_REQUESTS = 50000  # Requests per submitted batch
+
+# HTTP Connections
+DEFAULT_HTTP_TRANSPORT = "aiohttp"  # "httpx" enables HTTP/2 when the httpx and h2 packages are installed
+DEFAULT_CONNECTION_POOL_SIZE = 100
+DEFAULT_CONNECTIONS_PER_HOST = 50
+DEFAULT_KEEPALIVE_TIMEOUT = 60  # Seconds
+DEFAULT_DNS_CACHE_TTL = 300  # Seconds
+
+# HTTP Service
+DEFAULT_SERVICE_QUEUE_SIZE = 100  # Jobs waiting to run before new submissions are rejected
+DEFAULT_SERVICE_WORKERS = 4  # Jobs corrected at the same time
+DEFAULT_SERVICE_MAX_JOBS = 1000  # Jobs kept in memory, including finished ones
+DEFAULT_SERVICE_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+DEFAULT_SERVICE_MAX_PARAGRAPHS = 20000  # Paragraphs per job
+DEFAULT_SERVICE_MAX_PARAGRAPH_CHARS = 50000  # Characters per paragraph
 
 # Retry Settings
 DEFAULT_MAX_RETRIES = 5
-DEFAULT_BACKOFF_FACTOR = 2
+DEFAULT_RETRY_BASE_DELAY = 1  # Seconds
+DEFAULT_RETRY_MAX_DELAY = 60  # Seconds
+DEFAULT_REQUEST_TIMEOUT = 120  # Seconds per request attempt
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive upstream failures before requests stop
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 30  # Seconds before a trial request is let through
+
+# In-Memory Cache Tier
+DEFAULT_MEMORY_CACHE_MAX_ENTRIES = 10000
+DEFAULT_MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMORY_CACHE_TTL = None  # Seconds, or None to keep entries until evicted
+DEFAULT_CACHE_WRITE_BATCH = 500  # Entries committed to the SQLite cache per transaction
+
+# PDF Extraction
+DEFAULT_PDF_WORKERS = 4  # Processes extracting pages in parallel, 1 extracts in this process
+DEFAULT_PDF_PAGES_PER_TASK = 8  # Pages handed to a worker at a time
+DEFAULT_PDF_PARALLEL_MIN_PAGES = 16  # Smaller documents are not worth starting the workers for
+
+# GUI
+DEFAULT_GUI_POLL_INTERVAL = 100  # Milliseconds between redraws of progress sent by background work
+
+# Checkpointing
+DEFAULT_JOURNAL_SYNC_INTERVAL = 1.0  # Seconds between fsyncs of the checkpoint journal; a crash loses at most this much
+
+# Token Counting
+DEFAULT_TOKEN_COUNT_CACHE_SIZE = 100000
+DEFAULT_TOKENIZER_THREADS = 8
 
 # Token Limits
 DEFAULT_TOKEN_LIMIT = 10000
@@ -0,0 +1,160 @@
+# docx_document.py
+
+import difflib
+from docx import Document
+from docx.table import Table
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from loguru import logger
+from src.text_processing import PARAGRAPH_BREAK
+
+
+def _extraction_spans(text):
+    """
+    Splits stripped paragraph text into the pieces that make up its extracted text, one per character.
+    A run of line breaks, which would read as a paragraph break, is one piece extracted as a single "\n".
+    """
+    spans = []
+    position = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        spans.extend(text[position:match.start()])
+        spans.append(match.group())
+        position = match.end()
+    spans.extend(text[position:])
+    return spans
+
+
+def _extract(text):
+    return "".join(span[0] for span in _extraction_spans(text.strip()))
+
+
+class DocxDocument:
+    """
+    A .docx file whose paragraphs can be corrected in place.
+
+    Every non-empty paragraph of the body, of tables (including nested ones) and of the headers
+    and footers is listed in ``paragraphs``, in that order, and the position in the list is its id.
+    Blank lines within a paragraph, from consecutive line breaks, are listed as a single line break,
+    so ``get_text`` splits back into the same paragraphs; ``apply`` puts them back.
+    ``apply`` patches corrected text back into the original XML, rewriting only the runs whose text
+    changed, so styles, numbering, tables and headers survive the round trip.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.document = Document(file_path)
+        self._targets = []
+        self._seen_cells = set()
+        self._collect(self.document)
+        for section in self.document.sections:
+            for part in (section.header, section.first_page_header, section.even_page_header,
+                         section.footer, section.first_page_footer, section.even_page_footer):
+                # A linked header or footer is the previous section's, which is already collected
+                if not part.is_linked_to_previous:
+                    self._collect(part)
+        self.paragraphs = [_extract(paragraph.text) for paragraph in self._targets]
+
+    def _collect(self, container):
+        for block in container.iter_inner_content():
+            if isinstance(block, Paragraph):
+                if block.text.strip():
+                    self._targets.append(block)
+            elif isinstance(block, Table):
+                for row in block.rows:
+                    for cell in row.cells:
+                        # Merged cells appear once for every grid column they span
+                        if cell._tc in self._seen_cells:
+                            continue
+                        self._seen_cells.add(cell._tc)
+                        self._collect(cell)
+
+    def get_text(self):
+        """
+        Returns the paragraphs separated by blank lines, so split_into_paragraphs gives ``paragraphs`` back.
+        """
+        return '\n\n'.join(self.paragraphs)
+
+    def apply(self, corrected_paragraphs):
+        """
+        Writes corrected paragraphs back into the document. Paragraphs whose text did not change are skipped.
+
+        :param corrected_paragraphs: Corrected text for every entry of ``paragraphs``, in the same order.
+        :return: Number of paragraphs changed.
+        """
+        if len(corrected_paragraphs) != len(self.paragraphs):
+            raise ValueError(f"Expected {len(self.paragraphs)} paragraphs, got {len(corrected_paragraphs)}.")
+        changed = 0
+        for paragraph, original, corrected in zip(self._targets, self.paragraphs, corrected_paragraphs):
+            if corrected == original:
+                continue
+            if self._patch(paragraph, corrected):
+                changed += 1
+        logger.info(f"Patched {changed} of {len(self.paragraphs)} DOCX paragraphs")
+        return changed
+
+    def save(self, output_path):
+        self.document.save(output_path)
+
+    @staticmethod
+    def _runs(paragraph):
+        runs = []
+        for item in paragraph.iter_inner_content():
+            if isinstance(item, Run):
+                runs.append(item)
+            elif isinstance(item, Hyperlink):
+                runs.extend(item.runs)
+        return runs
+
+    def _patch(self, paragraph, corrected):
+        """
+        Rewrites the runs of ``paragraph`` so that its text becomes ``corrected``.
+
+        The old and new text are aligned character by character. Each edit goes to the run holding
+        the text it replaces (an insertion at a run boundary goes to the run before it, and one at the
+        start to the first run with text), so formatting stays with the words it belonged to and
+        untouched runs are left as they are.
+        """
+        runs = self._runs(paragraph)
+        run_texts = [run.text for run in runs]
+        original = "".join(run_texts)
+        if not runs or original != paragraph.text:
+            logger.warning(f"Paragraph has text outside its runs. Leaving it unchanged: {paragraph.text[:40]!r}")
+            return False
+
+        # Keep the whitespace around the paragraph, which was stripped on extraction, and the blank
+        # lines within it, which were collapsed
+        stripped = original.strip()
+        start = original.index(stripped) if stripped else 0
+        spans = _extraction_spans(stripped)
+        if len(spans) != len(stripped):
+            extracted = "".join(span[0] for span in spans)
+            restored = []
+            matcher = difflib.SequenceMatcher(None, extracted, corrected, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                restored.append("".join(spans[i1:i2]) if tag == "equal" else corrected[j1:j2])
+            corrected = "".join(restored)
+        corrected = original[:start] + corrected + original[start + len(stripped):]
+
+        # Run index of each character of the original text
+        owner = [i for i, text in enumerate(run_texts) for _ in text]
+        new_texts = [[] for _ in runs]
+        matcher = difflib.SequenceMatcher(None, original, corrected, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for k in range(i1, i2):
+                    new_texts[owner[k]].append(original[k])
+                continue
+            if i1 < i2:
+                run_index = owner[i1]
+            elif i1 > 0:
+                run_index = owner[i1 - 1]
+            else:
+                # Not run 0, which may hold only a picture or a field that setting its text would remove
+                run_index = owner[0] if owner else 0
+            new_texts[run_index].append(corrected[j1:j2])
+
+        for run, old_text, new_text in zip(runs, run_texts, new_texts):
+            new_text = "".join(new_text)
+            if new_text != old_text:
+                run.text = new_text
+        return True
@@ -1,7 +1,10 @@
 # file_handlers.py
 
-from docx import Document
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
+from src.docx_document import DocxDocument
+from src.config import DEFAULT_PDF_WORKERS, DEFAULT_PDF_PAGES_PER_TASK, DEFAULT_PDF_PARALLEL_MIN_PAGES
 
 def extract_text(file_path):
     extension = file_path.split('.')[-1].lower()
@@ -14,21 +17,83 @@ def extract_text(file_path):
     else:
         raise ValueError("Unsupported file format.")
 
+def iter_text(file_path, pdf_workers=DEFAULT_PDF_WORKERS):
+    """
+    Yields the text of a document in pieces as it is read: one page at a time for PDFs.
+
+    Joining the pieces with newlines gives the same text as extract_text.
+
+    :param file_path: Path of a .docx, .pdf or .txt file.
+    :param pdf_workers: Processes used to extract PDF pages.
+    :return: Iterator of text pieces.
+    """
+    extension = file_path.split('.')[-1].lower()
+    if extension == 'pdf':
+        return iter_pdf_pages(file_path, pdf_workers)
+    return iter([extract_text(file_path)])
+
 def extract_text_from_docx(file_path):
-    doc = Document(file_path)
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return '\n'.join(full_text)
+    # One paragraph per DOCX paragraph, including tables, headers and footers, in the order
+    # save_corrected_document expects them back
+    return DocxDocument(file_path).get_text()
 
 def extract_text_from_pdf(file_path):
-    full_text = []
+    return '\n'.join(iter_pdf_pages(file_path))
+
+def _extract_pdf_pages(file_path, start, stop):
+    """
+    Extracts the text of pages ``start`` to ``stop`` (exclusive). Runs in a worker process.
+    """
+    texts = []
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                full_text.append(text)
-    return '\n'.join(full_text)
+        for page in pdf.pages[start:stop]:
+            texts.append(page.extract_text())
+            page.close()
+    return texts
+
+def iter_pdf_pages(file_path, workers=DEFAULT_PDF_WORKERS, pages_per_task=DEFAULT_PDF_PAGES_PER_TASK):
+    """
+    Yields the text of each PDF page, in order, as soon as it is extracted. Pages without text are skipped.
+
+    Text extraction is CPU bound, so large documents are split into runs of ``pages_per_task`` pages
+    that are extracted in a pool of ``workers`` processes. Only a few runs are in flight at a time,
+    which keeps memory bounded however long the document is.
+
+    :param file_path: Path of the PDF file.
+    :param workers: Number of worker processes. 1 extracts every page in this process.
+    :param pages_per_task: Pages extracted by one worker task.
+    :return: Iterator of page texts.
+    """
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        if workers <= 1 or page_count < DEFAULT_PDF_PARALLEL_MIN_PAGES:
+            for page in pdf.pages:
+                text = page.extract_text()
+                page.close()
+                if text:
+                    yield text
+            return
+
+    page_ranges = iter([(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for start, stop in page_ranges:
+                pending.append(executor.submit(_extract_pdf_pages, file_path, start, stop))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                texts = pending.popleft().result()
+                next_range = next(page_ranges, None)
+                if next_range:
+                    pending.append(executor.submit(_extract_pdf_pages, file_path, *next_range))
+                for text in texts:
+                    if text:
+                        yield text
+        finally:
+            # Stop early if the caller stops reading
+            for future in pending:
+                future.cancel()
 
 def extract_text_from_txt(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
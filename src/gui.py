@@ -4,20 +4,26 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
+import queue
 import asyncio
+import concurrent.futures
 from src.api_client import GrammarCorrectorAPI
 from src.text_processing import split_into_paragraphs
 from src.file_handlers import extract_text
 from src.output_manager import save_corrected_document
+from src.manifest import RunManifest, get_manifest_path
+from src.journal import CorrectionJournal, get_journal_path
+from src.pipeline import CorrectionOptions, get_journal_settings, flush_checkpoint
 from src.cache_manager import clear_cache
+from src.usage import UsageReport
 from src.document_types import DOCUMENT_TYPES
 from src.prompts import DOCUMENT_PROMPTS, get_doc_prompt
-from src.utils import count_tokens
+from src.utils import count_tokens, count_tokens_batch
 from src.config import (
     DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TOKEN_LIMIT, MIN_CONTEXT_WINDOW_SIZE, MAX_CONTEXT_WINDOW_SIZE,
     DEFAULT_TEMPERATURE, MIN_TEMPERATURE, MAX_TEMPERATURE, DEFAULT_DOCUMENT_TYPE,
     DEFAULT_LANGUAGE_VARIANT, DEFAULT_MODEL, DEFAULT_GPT35_TOKEN_LIMIT,
-    DEFAULT_GPT4_TOKEN_LIMIT
+    DEFAULT_GPT4_TOKEN_LIMIT, DEFAULT_CONTEXT_MODE, DEFAULT_GUI_POLL_INTERVAL
 )
 from loguru import logger
 
@@ -72,6 +78,172 @@ class Tooltip:
             self.tooltip.destroy()
             self.tooltip = None
 
+class ParagraphBrowser(ttk.Frame):
+    """
+    A paragraph list with multiple selection that only renders the rows in view.
+
+    The listbox holds just one screenful of rows, which are rewritten as the list scrolls, so loading
+    a document with thousands of paragraphs costs the same as loading a short one. The selection is
+    kept as a set of paragraph indices, and the token total of the selection is updated as rows are
+    selected and deselected instead of being recounted.
+    """
+    def __init__(self, container, width=50, height=15, on_change=None):
+        super().__init__(container)
+        self.on_change = on_change
+        self.paragraphs = []
+        self.token_counts = []
+        self.selected = set()
+        self.selected_tokens = 0
+        self.total_tokens = 0
+        self.first = 0  # Index of the paragraph in the top row
+        self.rows = height
+        
+        self.listbox = tk.Listbox(self, selectmode=tk.MULTIPLE, width=width, height=height, activestyle='none')
+        self.listbox.grid(row=0, column=0, sticky='NSEW')
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.scroll)
+        self.scrollbar.grid(row=0, column=1, sticky='NS')
+        self.listbox.bind('<<ListboxSelect>>', self.on_select)
+        self.listbox.bind('<MouseWheel>', self.on_wheel)
+        self.listbox.bind('<Button-4>', self.on_wheel)
+        self.listbox.bind('<Button-5>', self.on_wheel)
+        self.render()
+    
+    def set_paragraphs(self, paragraphs, token_counts):
+        self.paragraphs = paragraphs
+        self.token_counts = token_counts
+        self.total_tokens = sum(token_counts)
+        self.selected = set()
+        self.selected_tokens = 0
+        self.first = 0
+        self.render()
+        self.changed()
+    
+    def set_message(self, message):
+        """
+        Empties the list and shows ``message`` in its place, for example while a document loads.
+        """
+        self.set_paragraphs([], [])
+        self.listbox.insert(tk.END, message)
+    
+    def set_token_counts(self, token_counts):
+        """
+        Replaces the token counts, for example after the model changed, and recounts the selection once.
+        """
+        self.token_counts = token_counts
+        self.total_tokens = sum(token_counts)
+        self.selected_tokens = sum(token_counts[i] for i in self.selected)
+        self.changed()
+    
+    def select_all(self):
+        self.selected = set(range(len(self.paragraphs)))
+        self.selected_tokens = self.total_tokens
+        self.render()
+        self.changed()
+    
+    def clear_selection(self):
+        self.selected = set()
+        self.selected_tokens = 0
+        self.render()
+        self.changed()
+    
+    def selected_indices(self):
+        return sorted(self.selected)
+    
+    def changed(self):
+        if self.on_change:
+            self.on_change()
+    
+    def render(self):
+        self.first = max(0, min(self.first, len(self.paragraphs) - self.rows))
+        last = min(self.first + self.rows, len(self.paragraphs))
+        self.listbox.delete(0, tk.END)
+        for idx in range(self.first, last):
+            para = self.paragraphs[idx]
+            display_text = para[:35] + '...' if len(para) > 35 else para
+            self.listbox.insert(tk.END, f"Paragraph {idx}: {display_text}")
+            if idx in self.selected:
+                self.listbox.select_set(idx - self.first)
+        if self.paragraphs:
+            self.scrollbar.set(self.first / len(self.paragraphs), last / len(self.paragraphs))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def on_select(self, event=None):
+        # Only the rows in view can have been clicked, so only they are compared with the selection
+        visible = set(self.listbox.curselection())
+        for row in range(min(self.rows, len(self.paragraphs) - self.first)):
+            idx = self.first + row
+            if (row in visible) != (idx in self.selected):
+                if row in visible:
+                    self.selected.add(idx)
+                    self.selected_tokens += self.token_counts[idx]
+                else:
+                    self.selected.discard(idx)
+                    self.selected_tokens -= self.token_counts[idx]
+        self.changed()
+    
+    def scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.paragraphs))
+        elif unit == "pages":
+            self.first += int(amount) * self.rows
+        else:
+            self.first += int(amount)
+        self.render()
+    
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll("scroll", -3, "units")
+        else:
+            self.scroll("scroll", 3, "units")
+        return "break"
+
+class AsyncWorker:
+    """
+    A daemon thread running one event loop for the lifetime of the GUI.
+
+    Corrections run here instead of in a new loop per run, so the API client and its warm connections
+    can be kept between runs. The worker never touches Tk; results go back through the GUI's event
+    channel (see GrammarCorrectorGUI.post).
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="correction-worker", daemon=True)
+        self.thread.start()
+    
+    def call(self, callback, *args):
+        """
+        Calls ``callback(*args)`` on the worker thread, for example to pause a client or cancel a task.
+        """
+        self.loop.call_soon_threadsafe(callback, *args)
+    
+    def submit(self, coro, on_done):
+        """
+        Starts ``coro`` as a task on the worker loop.
+
+        :param on_done: Called with the task, on the worker thread, once it has finished, failed or been cancelled.
+        :return: The asyncio.Task, which can be cancelled with ``call(task.cancel)``.
+        """
+        started = concurrent.futures.Future()
+        
+        def start():
+            task = self.loop.create_task(coro)
+            task.add_done_callback(on_done)
+            started.set_result(task)
+        
+        self.call(start)
+        return started.result()
+    
+    def run(self, coro, timeout=None):
+        """
+        Runs ``coro`` on the worker loop and waits for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+    
+    def stop(self):
+        self.call(self.loop.stop)
+        self.thread.join(timeout=5)
+
 class GrammarCorrectorGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -94,12 +266,27 @@ class GrammarCorrectorGUI:
         self.selected_tokens = tk.IntVar(value=0)
         self.context_window_size = tk.IntVar(value=DEFAULT_CONTEXT_WINDOW_SIZE)
         self.temperature = tk.DoubleVar(value=DEFAULT_TEMPERATURE)
+        self.original_context = tk.BooleanVar(value=DEFAULT_CONTEXT_MODE == "original")
+        self.reuse_previous = tk.BooleanVar(value=True)
+        
+        # Channel from background threads to the Tk thread, drained by poll_events
+        self.events = queue.Queue()
+        self.background_jobs = 0
+        self.polling = False
+        self.load_generation = 0
+        
+        # Corrections run on one long-lived event loop; the client is kept while its settings stay the same
+        self.worker = AsyncWorker()
+        self.api_client = None
+        self.api_client_settings = None
+        self.correction = None  # Task of the running correction
         
         # Dictionary to hold current prompts (can be modified by the user)
         self.current_prompts = DOCUMENT_PROMPTS.copy()
         
         # Set up the GUI components
         self.setup_gui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         # Initialize max_total_tokens based on the default model
         self.update_max_tokens_limit()
         # Set default document type and load its prompt
@@ -157,9 +344,8 @@ class GrammarCorrectorGUI:
         
         # Paragraph Selection
         ttk.Label(content_frame, text="Select Paragraphs:").grid(row=0, column=1, sticky='NW', **padding_options)
-        self.paragraph_listbox = tk.Listbox(content_frame, selectmode=tk.MULTIPLE, width=50, height=15)
-        self.paragraph_listbox.grid(row=1, column=1, sticky='NSEW', **padding_options)
-        self.paragraph_listbox.bind('<<ListboxSelect>>', self.update_selected_tokens)
+        self.paragraph_browser = ParagraphBrowser(content_frame, width=50, height=15, on_change=self.update_selected_tokens)
+        self.paragraph_browser.grid(row=1, column=1, sticky='NSEW', **padding_options)
         
         # Select All Checkbox
         select_all_frame = ttk.Frame(content_frame)
@@ -195,9 +381,19 @@ class GrammarCorrectorGUI:
         self.temp_label = ttk.Label(advanced_frame, text=f"{DEFAULT_TEMPERATURE:.1f}")
         self.temp_label.grid(row=1, column=2, padx=5, pady=5, sticky='w')
         
+        # Context Mode Control
+        original_context_checkbox = ttk.Checkbutton(advanced_frame, text="Use original text as context",
+                                                    variable=self.original_context)
+        original_context_checkbox.grid(row=2, column=0, columnspan=3, padx=5, pady=5, sticky='w')
+        reuse_previous_checkbox = ttk.Checkbutton(advanced_frame, text="Reuse corrections from the previous run",
+                                                  variable=self.reuse_previous)
+        reuse_previous_checkbox.grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky='w')
+        
         # Tooltips
         Tooltip(context_slider, "Number of previous paragraphs to consider for context")
         Tooltip(temp_slider, "Controls randomness: Lower values for more focused output, higher for more variety")
+        Tooltip(original_context_checkbox, "Faster: paragraphs no longer wait for the corrected text of the paragraphs before them")
+        Tooltip(reuse_previous_checkbox, "Only send paragraphs that changed since the output file was last written")
         
         # Token Information
         token_frame = ttk.Frame(main_frame.scrollable_frame)
@@ -220,12 +416,19 @@ class GrammarCorrectorGUI:
         button_frame.grid(row=8, column=0, columnspan=4, pady=10)
         
         ttk.Button(button_frame, text="Reset to Default", command=self.reset_to_default).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="Run Grammar Correction", command=self.run_correction_thread).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Clear Cache", command=self.clear_correction_cache).pack(side=tk.LEFT, padx=5)
+        self.run_button = ttk.Button(button_frame, text="Run Grammar Correction", command=self.run_correction)
+        self.run_button.pack(side=tk.LEFT, padx=5)
+        self.pause_button = ttk.Button(button_frame, text="Pause", command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_correction, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
 
     def reset_to_default(self):
         self.input_file_path.set('')
         self.output_file_path.set('')
-        self.paragraph_listbox.delete(0, tk.END)
+        self.load_generation += 1
+        self.paragraph_browser.set_paragraphs([], [])
         self.total_tokens.set(0)
         self.selected_tokens.set(0)
         self.paragraphs = []
@@ -241,6 +444,8 @@ class GrammarCorrectorGUI:
         # Reset sliders
         self.context_window_size.set(DEFAULT_CONTEXT_WINDOW_SIZE)
         self.temperature.set(DEFAULT_TEMPERATURE)
+        self.original_context.set(DEFAULT_CONTEXT_MODE == "original")
+        self.reuse_previous.set(True)
         self.update_context_window_label(DEFAULT_CONTEXT_WINDOW_SIZE)
         self.update_temp_label(DEFAULT_TEMPERATURE)
         
@@ -251,6 +456,10 @@ class GrammarCorrectorGUI:
         # Reset progress bar
         self.progress['value'] = 0
     
+    def clear_correction_cache(self):
+        clear_cache()
+        messagebox.showinfo("Cache Cleared", "Cached corrections have been removed.")
+    
     def update_context_window_label(self, value):
         size = int(float(value))
         self.context_window_label.config(text=f"{size} paragraph{'s' if size > 1 else ''}")
@@ -307,48 +516,113 @@ class GrammarCorrectorGUI:
         if file_path:
             self.output_file_path.set(file_path)
         
+    def post(self, handler, *args):
+        """
+        Queues ``handler(*args)`` to run on the Tk thread. Safe to call from any thread.
+        """
+        self.events.put((handler, args))
+    
+    def track_job(self):
+        """
+        Keeps the event channel drained until the matching ``finish_job``.
+        """
+        self.background_jobs += 1
+        if not self.polling:
+            self.polling = True
+            self.root.after(DEFAULT_GUI_POLL_INTERVAL, self.poll_events)
+    
+    def finish_job(self):
+        self.background_jobs -= 1
+    
+    def poll_events(self):
+        # Everything posted since the last poll is handled at once, so Tk redraws at most once per interval
+        while True:
+            try:
+                handler, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            handler(*args)
+        if self.background_jobs:
+            self.root.after(DEFAULT_GUI_POLL_INTERVAL, self.poll_events)
+        else:
+            self.polling = False
+    
+    def run_in_background(self, work, on_done):
+        """
+        Runs ``work`` in a worker thread and calls ``on_done(result)`` on the Tk thread when it returns.
+        If ``work`` raises, ``on_done`` gets the exception as its result.
+        """
+        def finished(result):
+            self.finish_job()
+            on_done(result)
+        
+        def target():
+            try:
+                result = work()
+            except Exception as e:
+                result = e
+            self.post(finished, result)
+        
+        self.track_job()
+        threading.Thread(target=target, daemon=True).start()
+    
     def load_paragraphs(self, file_path):
-        try:
-            text = extract_text(file_path)
-            self.paragraphs = split_into_paragraphs(text)
-            self.paragraph_listbox.delete(0, tk.END)
-            total_tokens = 0
-            for idx, para in enumerate(self.paragraphs):
-                tokens = count_tokens(para, self.model_choice.get())  # Pass selected model
-                total_tokens += tokens
-                display_text = para[:35] + '...' if len(para) > 35 else para
-                self.paragraph_listbox.insert(tk.END, f"Paragraph {idx}: {display_text}")
-            self.total_tokens.set(total_tokens)
-            self.update_token_display()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to extract text: {e}")
-            logger.error(f"Failed to extract text from {file_path}: {e}")
+        # Extraction and token counting run in a worker thread, so large documents do not freeze the window
+        self.load_generation += 1
+        generation = self.load_generation
+        model = self.model_choice.get()
+        self.paragraphs = []
+        self.select_all_var.set(False)
+        self.total_tokens.set(0)
+        self.paragraph_browser.set_message("Loading...")
+        
+        def load():
+            paragraphs = split_into_paragraphs(extract_text(file_path))
+            return paragraphs, count_tokens_batch(paragraphs, model)
+        
+        def loaded(result):
+            if generation != self.load_generation:
+                return  # Another document was loaded in the meantime
+            if isinstance(result, Exception):
+                self.paragraph_browser.set_paragraphs([], [])
+                messagebox.showerror("Error", f"Failed to extract text: {result}")
+                logger.error(f"Failed to extract text from {file_path}: {result}")
+                return
+            self.paragraphs, token_counts = result
+            self.paragraph_browser.set_paragraphs(self.paragraphs, token_counts)
+            self.total_tokens.set(self.paragraph_browser.total_tokens)
+            if model != self.model_choice.get():
+                self.recalculate_all_tokens()
+        
+        self.run_in_background(load, loaded)
     
     def toggle_select_all(self):
         if self.select_all_var.get():
-            self.paragraph_listbox.select_set(0, tk.END)
-            self.update_selected_tokens()
+            self.paragraph_browser.select_all()
         else:
-            self.paragraph_listbox.select_clear(0, tk.END)
-            self.selected_tokens.set(0)
-            self.update_token_display()
+            self.paragraph_browser.clear_selection()
     
     def update_selected_tokens(self, event=None):
-        selected_indices = self.paragraph_listbox.curselection()
-        selected_paragraphs = [self.paragraphs[i] for i in selected_indices]
-        total_selected_tokens = sum([count_tokens(para, self.model_choice.get()) for para in selected_paragraphs])
-        self.selected_tokens.set(total_selected_tokens)
+        self.selected_tokens.set(self.paragraph_browser.selected_tokens)
         self.update_token_display()
     
     def recalculate_all_tokens(self, event=None):
-        # Recalculate total tokens in file
-        if self.paragraphs:
-            text = '\n\n'.join(self.paragraphs)
-            total_tokens = count_tokens(text, self.model_choice.get())
-            self.total_tokens.set(total_tokens)
+        # Token counts depend on the model, so they are redone in the background when it changes
+        paragraphs = self.paragraphs
+        model = self.model_choice.get()
+        if not paragraphs:
+            return
         
-        # Recalculate selected tokens
-        self.update_selected_tokens()
+        def counted(result):
+            if paragraphs is not self.paragraphs or model != self.model_choice.get():
+                return  # Outdated by another document or model
+            if isinstance(result, Exception):
+                logger.error(f"Failed to count tokens: {result}")
+                return
+            self.paragraph_browser.set_token_counts(result)
+            self.total_tokens.set(self.paragraph_browser.total_tokens)
+        
+        self.run_in_background(lambda: count_tokens_batch(paragraphs, model), counted)
     
     def update_max_tokens_limit(self, event=None):
         model = self.model_choice.get()
@@ -420,21 +694,61 @@ class GrammarCorrectorGUI:
                 break
         return allowed_paragraphs, allowed_indices, cumulative_tokens
     
-    def run_correction_thread(self):
-        # Start the correction process in a separate thread to keep GUI responsive
-        thread = threading.Thread(target=self.run_correction)
-        thread.start()
+    def get_api_client(self, api_key, language, model, temperature, context_mode):
+        """
+        Returns the client for these settings, reusing the previous run's client and its connections
+        if they are the same.
+        """
+        settings = (api_key, language, model, temperature, context_mode)
+        if self.api_client is None or settings != self.api_client_settings:
+            if self.api_client is not None:
+                self.worker.run(self.api_client.close())
+            # Streamed so the progress bar moves as tokens arrive
+            self.api_client = GrammarCorrectorAPI(api_key, language, model=model, temperature=temperature,
+                                                  context_mode=context_mode, stream=True)
+            self.api_client_settings = settings
+        return self.api_client
+    
+    def set_running(self, running):
+        self.run_button.config(state=tk.DISABLED if running else tk.NORMAL)
+        self.pause_button.config(state=tk.NORMAL if running else tk.DISABLED, text="Pause")
+        self.cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+    
+    def toggle_pause(self):
+        if self.correction is None:
+            return
+        api_client = self.api_client
+        if api_client.paused:
+            self.worker.call(api_client.resume)
+            self.pause_button.config(text="Pause")
+            logger.info("Correction resumed")
+        else:
+            self.worker.call(api_client.pause)
+            self.pause_button.config(text="Resume")
+            logger.info("Correction paused. Requests in flight will finish.")
+    
+    def cancel_correction(self):
+        if self.correction is not None:
+            # Resumed first, so requests held by the pause are cancelled rather than left waiting
+            self.worker.call(self.api_client.resume)
+            self.worker.call(self.correction.cancel)
+            self.cancel_button.config(state=tk.DISABLED)
+            logger.info("Cancelling correction")
     
     def run_correction(self):
         input_path = self.input_file_path.get()
         output_path = self.output_file_path.get()
         language = self.language_variant.get()
         api_key = self.api_key.get()
-        selected_indices = self.paragraph_listbox.curselection()
+        selected_indices = self.paragraph_browser.selected_indices()
         max_token_limit = self.max_total_tokens.get()
         temperature = self.temperature.get()
+        model = self.model_choice.get()
         
         # Validate inputs
+        if self.correction is not None:
+            return
+        
         if not input_path:
             messagebox.showerror("Error", "Please select an input file.")
             return
@@ -451,9 +765,9 @@ class GrammarCorrectorGUI:
             messagebox.showerror("Error", "Please select at least one paragraph to process.")
             return
         
-        # Calculate total tokens for selected paragraphs
+        # Total tokens of the selected paragraphs, kept up to date by the paragraph browser
         selected_paragraphs = [self.paragraphs[i] for i in selected_indices]
-        selected_tokens = sum([count_tokens(para, self.model_choice.get()) for para in selected_paragraphs])
+        selected_tokens = self.paragraph_browser.selected_tokens
         
         # Check if total tokens exceed the limit
         if selected_tokens > max_token_limit:
@@ -487,11 +801,13 @@ class GrammarCorrectorGUI:
         self.progress['maximum'] = total_tokens_to_process
         
         # Initialize API client
-        api_client = GrammarCorrectorAPI(api_key, language, model=self.model_choice.get(), temperature=temperature)
+        context_mode = "original" if self.original_context.get() else "corrected"
+        api_client = self.get_api_client(api_key, language, model, temperature, context_mode)
         
         # Get the selected document type
         selected_display = self.document_type.get()
         doc_type = selected_display.split(" (")[0]
+        custom_prompt = self.get_custom_prompt()
         
         # Get the context window size
         context_window_size = self.context_window_size.get()
@@ -499,53 +815,150 @@ class GrammarCorrectorGUI:
         logger.info(f"Selected paragraphs: {selected_indices}")
         logger.info(f"Context window size: {context_window_size}")
         
-        # Process paragraphs asynchronously
+        # Corrections of paragraphs unchanged since the last run of this output are reused, and so are
+        # the paragraphs checkpointed by an interrupted run
+        manifest_path = get_manifest_path(output_path)
+        manifest = RunManifest.load(manifest_path) if self.reuse_previous.get() else RunManifest(manifest_path)
+        options = CorrectionOptions(language_variant=language, model=model, doc_type=doc_type,
+                                    custom_prompt=custom_prompt, temperature=temperature,
+                                    context_window_size=context_window_size, context_mode=context_mode, stream=True,
+                                    output_path=output_path)
+        journal_path = get_journal_path(output_path)
         try:
-            corrected_paragraphs, unprocessed = asyncio.run(
-                api_client.correct_paragraphs(
-                    self.paragraphs,
-                    list(selected_indices),
-                    max_token_limit,
-                    self.update_progress,
-                    doc_type,  # Pass doc_type instead of prompt_template
-                    self.language_variant.get(),  # Pass language_variant
-                    self.get_custom_prompt(), # Pass the custom prompt
-                    context_window_size
-                )
+            journal = CorrectionJournal.open(journal_path, get_journal_settings(input_path, output_path, options))
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to create checkpoint journal {journal_path}: {e}")
+            return
+        manifest.entries.update(journal.entries)
+        all_paragraphs = self.paragraphs
+        
+        # Runs on the worker loop, so it must not touch Tk; progress is posted to the event channel
+        async def correct():
+            fingerprints = manifest.fingerprints(api_client, all_paragraphs, range(len(all_paragraphs)), doc_type,
+                                                 language, custom_prompt, context_window_size)
+            paragraphs, indices, reused = manifest.reuse(all_paragraphs, list(selected_indices), fingerprints, context_mode)
+            if reused:
+                logger.info(f"Reusing {len(reused)} correction(s) from earlier runs")
+                self.update_progress(sum(count_tokens_batch([all_paragraphs[i] for i in reused], model)))
+            
+            def checkpoint(i, corrected_text, usage):
+                if not usage.get("failed"):
+                    journal.append(fingerprints[i], corrected_text)
+            
+            usage_report = UsageReport()
+            corrected_paragraphs, unprocessed = await api_client.correct_paragraphs(
+                paragraphs,
+                indices,
+                max_token_limit,
+                self.update_progress,
+                doc_type,  # Pass doc_type instead of prompt_template
+                language,  # Pass language_variant
+                custom_prompt, # Pass the custom prompt
+                context_window_size,
+                usage_report=usage_report,
+                result_callback=checkpoint
+            )
+            for i, corrected_text in reused.items():
+                corrected_paragraphs[i] = corrected_text
+            manifest.record(fingerprints, corrected_paragraphs, indices, usage_report)
+            return corrected_paragraphs, unprocessed, usage_report
+        
+        def finished(task):
+            self.post(self.correction_finished, task, input_path, output_path, manifest, journal,
+                      selected_tokens > max_token_limit)
+        
+        self.set_running(True)
+        self.track_job()
+        self.correction = self.worker.submit(correct(), finished)
+    
+    def correction_finished(self, task, input_path, output_path, manifest, journal, over_limit):
+        self.correction = None
+        self.finish_job()
+        self.set_running(False)
+        # A run can end while paused, for example when the rest came from the cache
+        self.worker.call(self.api_client.resume)
+        # The task is done, so nothing writes to the journal any more
+        journal.close()
+        
+        if task.cancelled() or task.exception() is not None:
+            if task.cancelled():
+                message = "The correction was cancelled."
+                logger.info("Correction cancelled")
+            else:
+                message = f"An error occurred during correction: {task.exception()}"
+                logger.error(f"Error during correction: {task.exception()}")
+            if not journal.entries:
+                messagebox.showerror("Error", message)
+                return
+            # The checkpointed paragraphs are reused by the next run; they can also be saved right away
+            save_partial = messagebox.askyesno(
+                "Error",
+                f"{message}\n\n"
+                f"{len(journal.entries)} corrected paragraph(s) were checkpointed and will be reused when you run "
+                f"the correction again. Save them to {output_path} now?",
+                icon=messagebox.ERROR
             )
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred during correction: {e}")
-            logger.error(f"Error during correction: {e}")
+            if save_partial:
+                self.run_in_background(lambda: flush_checkpoint(journal.path), self.partial_output_saved)
             return
         
+        corrected_paragraphs, unprocessed, usage_report = task.result()
+        
         # Update paragraphs with corrected versions
         self.paragraphs = corrected_paragraphs
         
         # Save corrected document
-        try:
-            corrected_text = '\n\n'.join(self.paragraphs)  # Ensures paragraphs are separated by two newlines
-            save_corrected_document(input_path, output_path, corrected_text)
-            messagebox.showinfo("Success", f"Corrected file saved to {output_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save corrected document: {e}")
-            logger.error(f"Failed to save corrected document: {e}")
-        
-        # Notify about unprocessed paragraphs
-        if selected_tokens > max_token_limit and unprocessed:
-            unprocessed_count = len(selected_paragraphs) - len(corrected_paragraphs)
-            messagebox.showwarning(
-                "Unprocessed Paragraphs",
-                f"{unprocessed_count} paragraph(s) were not processed due to token limits."
-            )
+        def save():
+            corrected_text = '\n\n'.join(corrected_paragraphs)  # Ensures paragraphs are separated by two newlines
+            save_corrected_document(input_path, output_path, corrected_text, corrected_paragraphs)
+            manifest.save()
+            journal.remove()
+        
+        def saved(error):
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to save corrected document: {error}")
+                logger.error(f"Failed to save corrected document: {error}")
+            else:
+                messagebox.showinfo("Success", f"Corrected file saved to {output_path}\n\n{usage_report}")
+            
+            # Notify about unprocessed paragraphs
+            if over_limit and unprocessed:
+                messagebox.showwarning(
+                    "Unprocessed Paragraphs",
+                    f"{len(unprocessed)} paragraph(s) were not processed due to token limits."
+                )
+            
+            logger.info("Grammar correction process completed")
         
-        # Clear cache after processing
-        clear_cache()
-        logger.info("Grammar correction process completed")
+        self.run_in_background(save, saved)
+    
+    def partial_output_saved(self, result):
+        if isinstance(result, Exception):
+            messagebox.showerror("Error", f"Failed to save corrected document: {result}")
+            logger.error(f"Failed to save corrected document: {result}")
+        else:
+            output_path, written, total = result
+            messagebox.showinfo("Saved", f"Saved {written} of {total} corrected paragraph(s) to {output_path}")
+    
+    def update_progress(self, tokens_processed, usage=None):
+        # Called on the worker thread; the progress bar is advanced on the Tk thread
+        self.post(self.advance_progress, tokens_processed)
+        if usage is not None:
+            logger.info(f"Processed {tokens_processed} tokens")
     
-    def update_progress(self, tokens_processed):
+    def advance_progress(self, tokens_processed):
         self.progress['value'] += tokens_processed
-        self.progress.update()
-        logger.info(f"Processed {tokens_processed} tokens")
+    
+    def close(self):
+        if self.correction is not None:
+            self.cancel_correction()
+        if self.api_client is not None:
+            try:
+                self.worker.run(self.api_client.close(), timeout=5)
+            except Exception as e:
+                logger.warning(f"Failed to close the API client: {e}")
+        self.worker.stop()
+        self.root.destroy()
 
     def run(self):
         self.root.mainloop()
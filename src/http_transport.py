@@ -0,0 +1,106 @@
+# http_transport.py
+
+from contextlib import asynccontextmanager
+import aiohttp
+from loguru import logger
+from src.config import (DEFAULT_HTTP_TRANSPORT, DEFAULT_CONNECTION_POOL_SIZE, DEFAULT_CONNECTIONS_PER_HOST,
+                        DEFAULT_KEEPALIVE_TIMEOUT, DEFAULT_DNS_CACHE_TTL)
+
+HTTP_TRANSPORTS = ["aiohttp", "httpx"]
+
+
+class _HTTPXResponse:
+    """
+    Gives an httpx response the parts of the aiohttp response interface the client uses.
+    """
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        self.headers = response.headers
+
+    async def json(self):
+        await self._response.aread()
+        return self._response.json()
+
+    @property
+    def content(self):
+        """
+        Iterates over the body line by line, as bytes, like aiohttp's ``response.content``.
+        """
+        return self._iter_lines()
+
+    async def _iter_lines(self):
+        async for line in self._response.aiter_lines():
+            yield (line + "\n").encode("utf-8")
+
+
+class HTTPXSession:
+    """
+    Session backed by an httpx.AsyncClient, which can speak HTTP/2 when the ``h2`` package is installed.
+
+    httpx has no per-host connection limit, so up to ``pool_size`` connections are opened and kept alive.
+    """
+    def __init__(self, pool_size, keepalive_timeout, http2=True):
+        import httpx
+
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("The h2 package is not installed. Falling back to HTTP/1.1.")
+                http2 = False
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                              keepalive_expiry=keepalive_timeout)
+        self._client = httpx.AsyncClient(http2=http2, limits=limits, timeout=None)
+
+    @asynccontextmanager
+    async def post(self, url, headers=None, json=None):
+        import httpx
+
+        request = self._client.build_request("POST", url, headers=headers, json=json)
+        try:
+            # Streamed, so server-sent events can be read as they arrive
+            response = await self._client.send(request, stream=True)
+        except httpx.TransportError as e:
+            # Surface network failures as ConnectionError so they are retried like aiohttp's
+            raise ConnectionError(str(e)) from e
+        try:
+            yield _HTTPXResponse(response)
+        except httpx.TransportError as e:
+            raise ConnectionError(str(e)) from e
+        finally:
+            await response.aclose()
+
+    @property
+    def closed(self):
+        return self._client.is_closed
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_http_session(transport=DEFAULT_HTTP_TRANSPORT, pool_size=DEFAULT_CONNECTION_POOL_SIZE,
+                        per_host=DEFAULT_CONNECTIONS_PER_HOST, keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+                        dns_cache_ttl=DEFAULT_DNS_CACHE_TTL):
+    """
+    Creates a pooled HTTP session for the chat completions API. Must be called inside a running event loop.
+
+    :param transport: "aiohttp" (default) or "httpx" for HTTP/2.
+    :param pool_size: Maximum number of open connections.
+    :param per_host: Maximum number of open connections to one host (aiohttp only).
+    :param keepalive_timeout: Seconds an idle connection is kept open for reuse.
+    :param dns_cache_ttl: Seconds resolved addresses are cached (aiohttp only).
+    :return: An object with ``post(url, headers=..., json=...)`` returning an async context manager,
+             a ``closed`` attribute and an async ``close()``.
+    """
+    if transport == "aiohttp":
+        connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=per_host, keepalive_timeout=keepalive_timeout,
+                                         use_dns_cache=True, ttl_dns_cache=dns_cache_ttl)
+        session = aiohttp.ClientSession(connector=connector)
+        logger.debug(f"Opened aiohttp session (pool size {pool_size}, {per_host} per host)")
+    elif transport == "httpx":
+        session = HTTPXSession(pool_size, keepalive_timeout)
+        logger.debug(f"Opened httpx session (pool size {pool_size})")
+    else:
+        raise ValueError(f"Unsupported HTTP transport: {transport}")
+    return session
@@ -0,0 +1,153 @@
+# journal.py
+
+import json
+import os
+import threading
+import time
+from loguru import logger
+from src.config import DEFAULT_JOURNAL_SYNC_INTERVAL
+
+JOURNAL_VERSION = 1
+
+
+def get_journal_path(output_path):
+    return f"{output_path}.journal.jsonl"
+
+
+class CorrectionJournal:
+    """
+    Append-only checkpoint of the paragraphs corrected by a run that is still in progress.
+
+    The first line holds the settings of the run, so it can be resumed with the same ones. Every
+    other line is one corrected paragraph, keyed by its manifest fingerprint (see manifest.RunManifest),
+    so a resumed run picks up each paragraph whose text, context and settings are still the same.
+
+    Lines are written by a background thread as paragraphs finish, so appending never waits on the
+    disk, and synced every ``sync_interval`` seconds, so a crash loses at most that much work. A line
+    cut short by the crash is ignored on load.
+    """
+    def __init__(self, path, settings, entries=None, sync_interval=DEFAULT_JOURNAL_SYNC_INTERVAL):
+        self.path = path
+        self.settings = settings
+        self.entries = entries or {}
+        self.sync_interval = sync_interval
+        self._file = None
+        self._last_sync = 0.0
+        self._pending = []
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @staticmethod
+    def read(path):
+        """
+        Reads a journal.
+
+        :return: Tuple of (settings, {fingerprint: corrected_text}).
+        :raises ValueError: If the file is not a journal of this version.
+        """
+        entries = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != JOURNAL_VERSION:
+                raise ValueError(f"{path} is not a version {JOURNAL_VERSION} checkpoint journal.")
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring incomplete line in {path}")
+                    continue
+                entries[entry["fingerprint"]] = entry["text"]
+        return header["settings"], entries
+
+    @classmethod
+    def open(cls, path, settings, sync_interval=DEFAULT_JOURNAL_SYNC_INTERVAL):
+        """
+        Opens the journal of a run for appending. Paragraphs checkpointed by an earlier run of the
+        same input are kept; a journal of another input is started over.
+        """
+        entries = {}
+        if os.path.exists(path):
+            try:
+                previous_settings, entries = cls.read(path)
+                if previous_settings.get("input_path") != settings.get("input_path"):
+                    logger.warning(f"Checkpoint journal {path} belongs to {previous_settings.get('input_path')}. Starting over.")
+                    entries = {}
+                elif entries:
+                    logger.info(f"Resuming {len(entries)} checkpointed paragraph(s) from {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint journal {path}: {e}")
+                entries = {}
+
+        journal = cls(path, settings, entries, sync_interval)
+        # Rewritten with the new settings, which also drops a torn last line
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"version": JOURNAL_VERSION, "settings": settings}, ensure_ascii=False) + "\n")
+            for fingerprint, text in entries.items():
+                f.write(json.dumps({"fingerprint": fingerprint, "text": text}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        journal._file = open(path, 'a', encoding='utf-8')
+        journal._last_sync = time.monotonic()
+        journal._thread = threading.Thread(target=journal._run, name="journal-writer", daemon=True)
+        journal._thread.start()
+        return journal
+
+    def append(self, fingerprint, corrected_text):
+        line = json.dumps({"fingerprint": fingerprint, "text": corrected_text}, ensure_ascii=False) + "\n"
+        with self._condition:
+            self.entries[fingerprint] = corrected_text
+            self._pending.append(line)
+            self._condition.notify()
+
+    def _run(self):
+        unsynced = False
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    timeout = self._last_sync + self.sync_interval - time.monotonic() if unsynced else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                lines, self._pending = self._pending, []
+                closed = self._closed
+            try:
+                if lines:
+                    self._file.write("".join(lines))
+                    unsynced = True
+                if unsynced and (closed or time.monotonic() - self._last_sync >= self.sync_interval):
+                    self._sync()
+                    unsynced = False
+            except OSError as e:
+                logger.error(f"Failed to write checkpoint journal {self.path}: {e}")
+                unsynced = False
+            if closed:
+                return
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """
+        Writes and syncs every paragraph appended so far, then closes the file. Blocks until the disk is done.
+        """
+        if self._file is None:
+            return
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._file.close()
+        self._file = None
+
+    def remove(self):
+        """
+        Closes and deletes the journal once the output it checkpoints has been saved.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
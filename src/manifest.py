@@ -0,0 +1,123 @@
+# manifest.py
+
+import json
+import os
+from loguru import logger
+from src.cache_manager import make_cache_key
+from src.prompts import get_prompt_template
+
+MANIFEST_VERSION = 1
+
+
+def get_manifest_path(output_path):
+    return f"{output_path}.manifest.json"
+
+
+def fingerprint_paragraphs(api_client, paragraphs, indices, doc_type, language_variant, custom_prompt, context_window_size):
+    """
+    Fingerprints paragraphs together with the original text of their context window.
+
+    :param paragraphs: Original text of the document's paragraphs.
+    :return: Dictionary of index to fingerprint.
+    """
+    template = get_prompt_template(doc_type, language_variant, custom_prompt, api_client.prompt_layout)
+    return {
+        i: make_cache_key(paragraphs[i], api_client.model, api_client.temperature, language_variant, doc_type,
+                          template.version, api_client.get_context(paragraphs, i, context_window_size))
+        for i in indices
+    }
+
+
+class RunManifest:
+    """
+    Corrections from the previous run of a document, stored next to its output.
+
+    Each corrected paragraph is stored under a fingerprint of its text, the original text of its
+    context window and every setting that affects the prompt. On the next run, paragraphs whose
+    fingerprint is unchanged reuse the stored correction instead of being sent again; an edited
+    paragraph also changes the fingerprints of the paragraphs that have it as context.
+
+    Unlike the correction cache, the manifest belongs to one output file and is never evicted or
+    cleared by other runs.
+    """
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries or {}
+        self.updated = {}
+        self.seen = set()
+        self.reused = 0
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a manifest, or returns an empty one if the file is missing or unreadable.
+        """
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    logger.info(f"Loaded {len(data['entries'])} previous correction(s) from {path}")
+                    return cls(path, data["entries"])
+                logger.warning(f"Ignoring manifest {path} from another version.")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return cls(path)
+
+    def fingerprints(self, api_client, paragraphs, indices, doc_type, language_variant, custom_prompt, context_window_size):
+        """
+        Fingerprints paragraphs with fingerprint_paragraphs and marks them as part of this run.
+        """
+        fingerprints = fingerprint_paragraphs(api_client, paragraphs, indices, doc_type, language_variant,
+                                              custom_prompt, context_window_size)
+        self.seen.update(fingerprints.values())
+        return fingerprints
+
+    def reuse(self, paragraphs, indices, fingerprints, context_mode):
+        """
+        Splits paragraphs into those corrected in the previous run and those that must be sent.
+
+        :param paragraphs: Paragraphs as they would be passed to correct_paragraphs.
+        :param indices: Indices to correct.
+        :param fingerprints: Fingerprints from ``fingerprints``.
+        :param context_mode: The client's context mode. In "corrected" mode the reused corrections are
+                             put into the returned paragraph list, so they serve as context.
+        :return: Tuple of (paragraphs to pass to correct_paragraphs, indices to send, {index: reused correction}).
+        """
+        reused = {}
+        for i in indices:
+            corrected_text = self.entries.get(fingerprints[i])
+            if corrected_text is not None:
+                reused[i] = corrected_text
+                self.updated[fingerprints[i]] = corrected_text
+        self.reused += len(reused)
+
+        source = list(paragraphs)
+        if context_mode == "corrected":
+            for i, corrected_text in reused.items():
+                source[i] = corrected_text
+        return source, [i for i in indices if i not in reused], reused
+
+    def record(self, fingerprints, corrected_paragraphs, indices, usage_report):
+        """
+        Stores the corrections of this run. Paragraphs that could not be corrected are left out.
+        """
+        for i in indices:
+            usage = usage_report.paragraphs.get(i)
+            if usage is not None and not usage.get("failed"):
+                self.updated[fingerprints[i]] = corrected_paragraphs[i]
+
+    def save(self):
+        """
+        Writes the corrections of this run. Previous corrections are kept only for paragraphs that were
+        fingerprinted in this run, so paragraphs deleted from the document drop out.
+        """
+        if not self.path:
+            return
+        entries = {fingerprint: text for fingerprint, text in self.entries.items() if fingerprint in self.seen}
+        entries.update(self.updated)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        logger.info(f"Saved {len(entries)} correction(s) to {self.path}")
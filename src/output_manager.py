@@ -4,11 +4,23 @@ import os
 from docx import Document
 from fpdf import FPDF
 from loguru import logger
+from src.docx_document import DocxDocument
 
-def save_corrected_document(input_path, output_path, corrected_text):
+def save_corrected_document(input_path, output_path, corrected_text, paragraphs=None):
+    """
+    Saves corrected text in the format given by the extension of ``output_path``.
+
+    :param input_path: The document the text was extracted from, or None.
+    :param output_path: Where to save the corrected document.
+    :param corrected_text: Corrected paragraphs separated by blank lines.
+    :param paragraphs: The corrected paragraphs as a list. When given for a .docx input saved as .docx,
+                       the original document is patched in place so its formatting is kept.
+    """
     try:
         extension = output_path.split('.')[-1].lower()
-        if extension == 'docx':
+        if extension == 'docx' and paragraphs is not None and input_path and input_path.lower().endswith('.docx'):
+            save_docx_in_place(input_path, output_path, paragraphs, corrected_text)
+        elif extension == 'docx':
             save_as_docx(output_path, corrected_text)
         elif extension == 'pdf':
             save_as_pdf(output_path, corrected_text)
@@ -34,6 +46,26 @@ def save_as_docx(output_path, corrected_text):
         logger.error(f"Error saving DOCX: {str(e)}")
         raise
 
+def save_docx_in_place(input_path, output_path, paragraphs, corrected_text):
+    """
+    Writes corrected paragraphs into a copy of the original .docx, keeping styles, tables, headers and
+    numbering. Falls back to save_as_docx if the paragraphs no longer line up with the document.
+    """
+    try:
+        document = DocxDocument(input_path)
+        if len(paragraphs) != len(document.paragraphs):
+            logger.warning(f"Got {len(paragraphs)} paragraphs for {len(document.paragraphs)} in {input_path}. "
+                           "Saving without the original formatting.")
+            save_as_docx(output_path, corrected_text)
+            return
+        document.apply(paragraphs)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        document.save(output_path)
+        logger.info(f"Saved corrected document as DOCX, keeping the original formatting: {output_path}")
+    except Exception as e:
+        logger.error(f"Error saving DOCX: {str(e)}")
+        raise
+
 def save_as_pdf(output_path, corrected_text):
     try:
         pdf = FPDF()
@@ -0,0 +1,69 @@
+# packing.py
+
+import json
+import re
+from src.config import DEFAULT_PACK_TOKEN_BUDGET, DEFAULT_PACK_MAX_PARAGRAPHS, DEFAULT_PACK_PARAGRAPH_TOKENS
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+
+class PackMismatchError(ValueError):
+    """
+    Raised when a packed response cannot be split back into one correction per paragraph.
+    """
+
+
+def pack_paragraphs(indices, token_counts, token_budget=DEFAULT_PACK_TOKEN_BUDGET,
+                    max_paragraphs=DEFAULT_PACK_MAX_PARAGRAPHS, max_paragraph_tokens=DEFAULT_PACK_PARAGRAPH_TOKENS):
+    """
+    Groups consecutive short paragraphs so they can be corrected in one request.
+
+    Only paragraphs that are adjacent in the document are packed together, so a group never hides
+    an unselected paragraph from the context. Paragraphs longer than ``max_paragraph_tokens`` always
+    get a group of their own.
+
+    :param indices: Paragraph indices to correct, in document order.
+    :param token_counts: Token count of each paragraph in ``indices``.
+    :param token_budget: Maximum paragraph tokens in one group. 0 disables packing.
+    :param max_paragraphs: Maximum paragraphs in one group.
+    :param max_paragraph_tokens: Longest paragraph that may be packed.
+    :return: List of groups, each a list of indices.
+    """
+    groups = []
+    group_tokens = 0
+    for i, tokens in zip(indices, token_counts):
+        packable = token_budget > 0 and tokens <= max_paragraph_tokens
+        if (groups and packable and groups[-1][-1] == i - 1 and group_tokens is not None
+                and group_tokens + tokens <= token_budget and len(groups[-1]) < max_paragraphs):
+            groups[-1].append(i)
+            group_tokens += tokens
+        else:
+            groups.append([i])
+            group_tokens = tokens if packable else None
+    return groups
+
+
+def parse_packed_response(content, count):
+    """
+    Splits a packed response, a JSON array of corrected paragraphs, back into paragraphs.
+
+    :param content: Response text from the API.
+    :param count: Number of paragraphs that were sent.
+    :return: List of ``count`` corrected paragraphs.
+    :raises PackMismatchError: If the response is not an array of exactly ``count`` non-empty strings.
+    """
+    match = _CODE_FENCE.match(content.strip())
+    if match:
+        content = match.group(1)
+    try:
+        paragraphs = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise PackMismatchError(f"Packed response is not valid JSON: {e}")
+    if not isinstance(paragraphs, list) or not all(isinstance(paragraph, str) for paragraph in paragraphs):
+        raise PackMismatchError("Packed response is not a list of strings.")
+    if len(paragraphs) != count:
+        raise PackMismatchError(f"Packed response has {len(paragraphs)} paragraph(s), expected {count}.")
+    paragraphs = [paragraph.strip() for paragraph in paragraphs]
+    if not all(paragraphs):
+        raise PackMismatchError("Packed response contains an empty paragraph.")
+    return paragraphs
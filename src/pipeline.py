@@ -0,0 +1,392 @@
+# pipeline.py
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from loguru import logger
+from src.api_client import GrammarCorrectorAPI
+from src.batch_client import BatchCorrector
+from src.file_handlers import extract_text, iter_text
+from src.journal import CorrectionJournal, get_journal_path
+from src.manifest import RunManifest, get_manifest_path, fingerprint_paragraphs
+from src.prefilter import ParagraphFilter
+from src.text_processing import split_into_paragraphs, iter_paragraphs
+from src.output_manager import save_corrected_document
+from src.scheduler import JobScheduler
+from src.usage import UsageReport
+from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TEMPERATURE, DEFAULT_DOCUMENT_TYPE, DEFAULT_MODEL,
+                        DEFAULT_LANGUAGE_VARIANT, DEFAULT_CONCURRENCY, DEFAULT_CONTEXT_MODE, DEFAULT_DOCUMENT_JOBS,
+                        DEFAULT_BATCH_POLL_INTERVAL, DEFAULT_PACK_TOKEN_BUDGET, DEFAULT_PROMPT_LAYOUT,
+                        DEFAULT_STREAM_RESPONSES, DEFAULT_JOB_PRIORITY, DEFAULT_SCHEDULER_REPORT_INTERVAL,
+                        DEFAULT_API_BASE_URL, DEFAULT_PREFILTER)
+
+SUPPORTED_EXTENSIONS = (".docx", ".pdf", ".txt")
+
+
+@dataclass
+class CorrectionOptions:
+    """
+    Settings for a headless correction run. Mirrors the controls of the GUI.
+    """
+    api_key: str = None
+    base_url: str = DEFAULT_API_BASE_URL  # Any OpenAI-compatible endpoint
+    backends: list = None  # Backend settings from api_client.load_backends; overrides api_key and base_url
+    language_variant: str = DEFAULT_LANGUAGE_VARIANT
+    model: str = DEFAULT_MODEL
+    doc_type: str = DEFAULT_DOCUMENT_TYPE
+    custom_prompt: str = None
+    temperature: float = DEFAULT_TEMPERATURE
+    context_window_size: int = DEFAULT_CONTEXT_WINDOW_SIZE
+    context_mode: str = DEFAULT_CONTEXT_MODE
+    concurrency: int = DEFAULT_CONCURRENCY
+    pack_token_budget: int = DEFAULT_PACK_TOKEN_BUDGET  # 0 sends every paragraph on its own
+    prompt_layout: str = DEFAULT_PROMPT_LAYOUT
+    stream: bool = DEFAULT_STREAM_RESPONSES
+    token_limit: int = None  # None processes every paragraph
+    output_path: str = None  # Only used for single documents
+    output_dir: str = None
+    output_format: str = None  # "docx", "pdf" or "txt"; defaults to the input format
+    batch: bool = False  # Use the Batch API of the first backend: half the price, results within the completion window
+    batch_poll_interval: float = DEFAULT_BATCH_POLL_INTERVAL
+    incremental: bool = True  # Reuse corrections of unchanged paragraphs from the previous run's manifest
+    priority: int = DEFAULT_JOB_PRIORITY  # Higher gets request slots first when documents share a scheduler
+    prefilter: bool = DEFAULT_PREFILTER  # Pass through numbers, short labels and repeated paragraphs without a request
+
+
+@dataclass
+class DocumentResult:
+    input_path: str
+    output_path: str
+    paragraphs: int = 0
+    unprocessed: int = 0
+    reused: int = 0
+    elapsed: float = 0.0
+    usage: UsageReport = field(default_factory=UsageReport)
+    error: str = None
+
+
+def get_output_path(input_path, options):
+    """
+    Works out where the corrected version of a document is written: ``<name>_corrected<ext>``
+    next to the input, or in ``options.output_dir``.
+    """
+    if options.output_path:
+        return os.path.abspath(options.output_path)
+    directory, filename = os.path.split(os.path.abspath(input_path))
+    name, ext = os.path.splitext(filename)
+    if options.output_format:
+        ext = "." + options.output_format.lower().lstrip(".")
+    return os.path.join(os.path.abspath(options.output_dir or directory), f"{name}_corrected{ext}")
+
+
+def create_api_client(options):
+    return GrammarCorrectorAPI(options.api_key, options.language_variant, model=options.model,
+                               temperature=options.temperature, concurrency=options.concurrency,
+                               context_mode=options.context_mode, pack_token_budget=options.pack_token_budget,
+                               prompt_layout=options.prompt_layout, stream=options.stream, base_url=options.base_url,
+                               backends=options.backends, prefilter=options.prefilter)
+
+
+def get_journal_settings(path, output_path, options):
+    settings = asdict(options)
+    # Keys are given again on resume rather than written to disk. Backends naming an api_key_env keep it
+    settings.pop("api_key")
+    if settings["backends"]:
+        settings["backends"] = [{name: value for name, value in backend.items() if name != "api_key"}
+                                for backend in settings["backends"]]
+    settings["output_path"] = output_path
+    return {"input_path": os.path.abspath(path), "options": settings}
+
+
+def _checkpoint(journal, fingerprints, i, corrected_text, usage):
+    if not usage.get("failed"):
+        journal.append(fingerprints[i], corrected_text)
+
+
+async def _correct_while_extracting(path, options, api_client, token_limit, progress_callback, usage_report, manifest=None,
+                                    journal=None, scheduler=None):
+    """
+    Extracts a document in a background thread and corrects its paragraphs as they arrive.
+
+    The paragraphs that have arrived are corrected as one segment while extraction continues, and the
+    next segment takes everything that arrived in the meantime. Segments run one after another, so
+    the context of a segment's first paragraphs is the corrected end of the previous one, and the
+    token limit is applied in document order as in a single correct_paragraphs call.
+
+    With a ``manifest``, paragraphs whose fingerprint matches the previous run reuse its correction
+    and are neither sent nor counted against the token limit. With a ``journal``, every paragraph is
+    checkpointed under its manifest fingerprint as soon as it is corrected. With a
+    ``scheduler``, the document's requests share its slots with the other documents.
+
+    :return: Tuple of (paragraphs, corrected_paragraphs, unprocessed_paragraphs)
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def extract():
+        try:
+            for paragraph in iter_paragraphs(iter_text(path)):
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, paragraph)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    paragraphs = []
+    corrected = []
+    unprocessed = []
+    # Shared by the segments, so a repeat of a paragraph from an earlier segment is found
+    paragraph_filter = ParagraphFilter() if api_client.prefilter else None
+    if scheduler is not None:
+        job = scheduler.add_job(os.path.basename(path), options.priority)
+        correct_paragraphs = functools.partial(scheduler.correct_paragraphs, job)
+    else:
+        correct_paragraphs = api_client.correct_paragraphs
+    extraction = asyncio.ensure_future(asyncio.to_thread(extract))
+    try:
+        finished = False
+        while not finished:
+            segment_start = len(paragraphs)
+            item = await queue.get()
+            while True:
+                if item is done:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                paragraphs.append(item)
+                if queue.empty():
+                    break
+                item = queue.get_nowait()
+            if len(paragraphs) == segment_start:
+                continue
+
+            indices = list(range(segment_start, len(paragraphs)))
+            if api_client.context_mode == "corrected":
+                source = corrected + paragraphs[segment_start:]
+            else:
+                source = list(paragraphs)
+            reused = {}
+            to_send = indices
+            fingerprints = None
+            if manifest is not None:
+                fingerprints = manifest.fingerprints(api_client, paragraphs, indices, options.doc_type,
+                                                     options.language_variant, options.custom_prompt,
+                                                     options.context_window_size)
+                source, to_send, reused = manifest.reuse(source, indices, fingerprints, api_client.context_mode)
+            elif journal is not None:
+                fingerprints = fingerprint_paragraphs(api_client, paragraphs, indices, options.doc_type,
+                                                      options.language_variant, options.custom_prompt,
+                                                      options.context_window_size)
+            checkpoint = functools.partial(_checkpoint, journal, fingerprints) if journal is not None else None
+            admitted, admitted_tokens = api_client.admit_paragraphs(source, to_send, token_limit)
+            token_limit -= sum(admitted_tokens)
+            logger.info(f"Correcting paragraphs {segment_start}-{len(paragraphs) - 1} of {path}")
+            segment, _ = await correct_paragraphs(
+                source,
+                admitted,
+                float("inf"),
+                progress_callback,
+                options.doc_type,
+                options.language_variant,
+                options.custom_prompt,
+                options.context_window_size,
+                usage_report=usage_report,
+                result_callback=checkpoint,
+                paragraph_filter=paragraph_filter,
+            )
+            for i, corrected_text in reused.items():
+                segment[i] = corrected_text
+            if manifest is not None:
+                manifest.record(fingerprints, segment, admitted, usage_report)
+            corrected.extend(segment[segment_start:])
+            admitted_set = set(admitted)
+            unprocessed.extend(paragraphs[i] for i in to_send if i not in admitted_set)
+    finally:
+        stop.set()
+        if scheduler is not None:
+            scheduler.remove_job(job)
+        await asyncio.gather(extraction, return_exceptions=True)
+    return paragraphs, corrected, unprocessed
+
+
+async def correct_document_async(path, options, api_client=None, progress_callback=None, scheduler=None):
+    """
+    Extracts, corrects and saves one document.
+
+    :param path: Path of the input document (.docx, .pdf or .txt).
+    :param options: CorrectionOptions for the run.
+    :param api_client: Shared GrammarCorrectorAPI. A new client is created, and closed afterwards, if omitted.
+    :param progress_callback: Optional callback passed through to correct_paragraphs.
+    :param scheduler: Optional JobScheduler over ``api_client`` shared with other documents.
+    :return: DocumentResult
+    """
+    if api_client is None:
+        async with create_api_client(options) as api_client:
+            return await correct_document_async(path, options, api_client, progress_callback, scheduler)
+
+    result = DocumentResult(input_path=path, output_path=get_output_path(path, options))
+    start = time.perf_counter()
+
+    token_limit = options.token_limit if options.token_limit is not None else float("inf")
+    manifest = None
+    journal = None
+
+    if options.batch:
+        text = await asyncio.to_thread(extract_text, path)
+        paragraphs = split_into_paragraphs(text)
+        # The state file sits next to the output, so rerunning the same command resumes the batch
+        corrector = BatchCorrector(api_client, poll_interval=options.batch_poll_interval)
+        corrected, unprocessed = await corrector.correct_paragraphs(
+            paragraphs,
+            list(range(len(paragraphs))),
+            token_limit,
+            progress_callback,
+            options.doc_type,
+            options.language_variant,
+            options.custom_prompt,
+            options.context_window_size,
+            usage_report=result.usage,
+            state_path=f"{result.output_path}.batch.json",
+        )
+    else:
+        manifest_path = get_manifest_path(result.output_path)
+        manifest = RunManifest.load(manifest_path) if options.incremental else RunManifest(manifest_path)
+        # Paragraphs checkpointed by an interrupted run of the same output are picked up like the manifest's
+        journal = await asyncio.to_thread(CorrectionJournal.open, get_journal_path(result.output_path),
+                                          get_journal_settings(path, result.output_path, options))
+        manifest.entries.update(journal.entries)
+        try:
+            paragraphs, corrected, unprocessed = await _correct_while_extracting(path, options, api_client, token_limit,
+                                                                                progress_callback, result.usage,
+                                                                                manifest, journal, scheduler)
+        finally:
+            await asyncio.to_thread(journal.close)
+    result.paragraphs = len(paragraphs)
+    result.unprocessed = len(unprocessed)
+
+    await asyncio.to_thread(save_corrected_document, path, result.output_path, '\n\n'.join(corrected), corrected)
+    if manifest is not None:
+        # Written only once the output exists, so the manifest never describes an output that was not saved
+        await asyncio.to_thread(manifest.save)
+        result.reused = manifest.reused
+    if journal is not None:
+        await asyncio.to_thread(journal.remove)
+    result.elapsed = time.perf_counter() - start
+    logger.info(f"Corrected {path} -> {result.output_path} in {result.elapsed:.1f}s")
+    return result
+
+
+async def correct_documents_async(paths, options, jobs=DEFAULT_DOCUMENT_JOBS):
+    """
+    Corrects several documents concurrently over one shared API client, so they share its rate limiter
+    and its warm connection pool.
+
+    Up to ``jobs`` documents run at once, smallest first, so short documents are not held up behind
+    long ones. Their requests go through one JobScheduler with ``options.concurrency * jobs`` request
+    slots, shared evenly between the running documents. Progress and ETA of each document are
+    logged every DEFAULT_SCHEDULER_REPORT_INTERVAL seconds.
+
+    A failure in one document is recorded in its DocumentResult and does not stop the others.
+
+    :param paths: Paths of the input documents.
+    :param options: CorrectionOptions for the run.
+    :param jobs: Number of documents processed at the same time.
+    :return: List of DocumentResult in the order of ``paths``.
+    """
+    jobs = max(1, min(jobs, len(paths)))
+    waiting = sorted(paths, key=_document_size)
+
+    async with create_api_client(options) as api_client:
+        scheduler = JobScheduler(api_client, max_in_flight=options.concurrency * jobs)
+        results = {}
+
+        async def run():
+            while waiting:
+                path = waiting.pop(0)
+                try:
+                    results[path] = await correct_document_async(path, options, api_client, scheduler=scheduler)
+                except Exception as e:
+                    logger.error(f"Failed to correct {path}: {e}")
+                    results[path] = DocumentResult(input_path=path, output_path=None, error=str(e))
+
+        async def report():
+            while True:
+                await asyncio.sleep(DEFAULT_SCHEDULER_REPORT_INTERVAL)
+                scheduler.log_status()
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(*(run() for _ in range(jobs)))
+        finally:
+            reporter.cancel()
+        return [results[path] for path in paths]
+
+
+def _document_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def load_checkpoint(journal_path, api_key=None):
+    """
+    Reads the settings of an interrupted run from its checkpoint journal, so it can be resumed with
+    ``correct_document(input_path, options)``.
+
+    :param journal_path: The run's ``<output>.journal.jsonl``.
+    :param api_key: API key for the resumed run, which is not stored in the journal. Also used by the
+                    backends that had an ``api_key`` of their own.
+    :return: Tuple of (input_path, CorrectionOptions)
+    """
+    settings, _ = CorrectionJournal.read(journal_path)
+    options = CorrectionOptions(**settings["options"])
+    options.api_key = api_key
+    return settings["input_path"], options
+
+
+def flush_checkpoint(journal_path, output_path=None):
+    """
+    Writes the output of an interrupted or still running run from its checkpoint journal. Checkpointed
+    paragraphs are written corrected and the rest keep their original text.
+
+    The journal is only read, so this can be called while the run is still going; it then sees the
+    paragraphs synced so far.
+
+    :param journal_path: The run's ``<output>.journal.jsonl``.
+    :param output_path: Where to write the document. Defaults to the run's output path.
+    :return: Tuple of (output_path, corrected paragraphs written, total paragraphs)
+    """
+    settings, entries = CorrectionJournal.read(journal_path)
+    input_path = settings["input_path"]
+    options = CorrectionOptions(**settings["options"])
+    output_path = output_path or options.output_path
+
+    paragraphs = split_into_paragraphs(extract_text(input_path))
+    fingerprints = RunManifest(None).fingerprints(create_api_client(options), paragraphs, range(len(paragraphs)),
+                                                  options.doc_type, options.language_variant, options.custom_prompt,
+                                                  options.context_window_size)
+    corrected = [entries.get(fingerprints[i], paragraph) for i, paragraph in enumerate(paragraphs)]
+    written = sum(fingerprints[i] in entries for i in range(len(paragraphs)))
+    save_corrected_document(input_path, output_path, '\n\n'.join(corrected), corrected)
+    logger.info(f"Flushed {written} of {len(paragraphs)} corrected paragraph(s) from {journal_path} to {output_path}")
+    return output_path, written, len(paragraphs)
+
+
+def correct_document(path, options):
+    """
+    Synchronous entry point: corrects one document and returns its DocumentResult.
+    """
+    return asyncio.run(correct_document_async(path, options))
+
+
+def correct_documents(paths, options, jobs=DEFAULT_DOCUMENT_JOBS):
+    return asyncio.run(correct_documents_async(paths, options, jobs))
@@ -0,0 +1,148 @@
+# prefilter.py
+
+import re
+from src.config import DEFAULT_PREFILTER_MAX_LABEL_WORDS
+
+PREFILTER_RULES = ("numeric", "label", "duplicate")
+
+_WORD = re.compile(r"[^\W\d_]+")
+_DIGIT = re.compile(r"\d")
+_ROMAN_NUMERAL = re.compile(r"M{0,3}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})")
+# Enumerators such as the "(b)" of "4.2(b)" or "(iv)", removed before the words are checked
+_ENUMERATOR = re.compile(r"\((?:[a-z]|[ivxlcdm]+|\d+)\)", re.IGNORECASE)
+# Numbering before a label, such as "1.", "2.3", "(a)", "b)" or "IV."
+_LEADING_NUMBER = re.compile(r"^(?:\(?(?:\d+(?:\.\d+)*|[a-z]|[ivxlcdm]+)[.)]|\d+(?:\.\d+)*)\s", re.IGNORECASE)
+# Numbering after a label, such as "Schedule 2", "Clause 4.1a" or "Part IV"
+_TRAILING_NUMBER = re.compile(r"\s(?:\d+(?:\.\d+)*[a-z]?|[IVXLCDM]+|[A-Z])[.:]?$")
+_MONTHS = {
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+# Words that may appear in figures and references without making them prose
+_REFERENCE_WORDS = {
+    "art", "arts", "cl", "ch", "fig", "figs", "ibid", "id", "nos", "p", "pp", "para", "paras", "ss",
+    "sec", "secs", "seq", "et", "vol", "page",
+}
+# Words that are only part of a figure when written against a number, as in "10am", "1st" or "1990s"
+_NUMBER_AFFIXES = {"to", "and", "of", "am", "pm", "no", "s", "st", "nd", "rd", "th"}
+# Headings and form labels, single words or fixed phrases. Only these exact spellings pass, so a
+# misspelt label is still sent
+_LABELS = {
+    "article", "articles", "section", "sections", "clause", "clauses", "schedule", "schedules", "annex",
+    "appendix", "exhibit", "part", "chapter", "recitals", "definitions", "interpretation", "contents", "table",
+    "figure", "introduction", "background", "conclusion", "summary", "notes", "references", "parties",
+    "signed", "signature", "date", "dated", "name", "title", "position", "address", "witness",
+    "signed by", "table of contents", "for and on behalf of", "in the presence of",
+}
+_LONGEST_LABEL = max(len(label.split()) for label in _LABELS)
+
+
+def is_reference_word(word):
+    """
+    Tells whether a word can appear in a date, figure or reference. Month names count only when
+    capitalised, roman numerals and single letters only in capitals, so "may", "mix" or "a" do not.
+    "I" and "A" are words in their own right and do not count either.
+    """
+    if word.lower() in _MONTHS:
+        return word[0].isupper()
+    if word.isupper() and (len(word) == 1 or _ROMAN_NUMERAL.fullmatch(word)):
+        return word not in ("I", "A")
+    return word.lower() in _REFERENCE_WORDS
+
+
+def _is_reference_token(text, match):
+    """
+    Tells whether the word ``match`` of ``text`` is a reference word, or an affix touching a digit.
+    """
+    if is_reference_word(match.group()):
+        return True
+    return match.group().lower() in _NUMBER_AFFIXES and (
+        (match.start() > 0 and text[match.start() - 1].isdigit()) or
+        (match.end() < len(text) and text[match.end()].isdigit()))
+
+
+class ParagraphFilter:
+    """
+    Picks out paragraphs that cannot need correction, so they are passed through without a request.
+
+    The rules, in the order they are tried:
+
+    - ``numeric``: nothing but numbers, punctuation, dates and references such as "§ 4.2(b)",
+      "12 March 2024" or "pp. 10-12", or a signature line of underscores.
+    - ``label``: at most ``max_label_words`` words shaped like a heading or a form label, with
+      numbering before or after them or a colon at the end, such as "Schedule 2", "Signed:" or
+      "1. Definitions". It must start with a capitalised known label, such as "Section" or
+      "For and on behalf of", followed only by numbers and references, so "Teh Agreemnt", "The by:"
+      and "Section 5 and 6" are sent.
+    - ``duplicate``: the exact text of a paragraph corrected earlier in the run, which takes the same
+      correction.
+
+    Use one filter per run, so repeats are found across the correct_paragraphs calls of a document.
+    """
+    def __init__(self, max_label_words=DEFAULT_PREFILTER_MAX_LABEL_WORDS):
+        self.max_label_words = max_label_words
+        self.corrections = {}
+
+    def classify(self, text):
+        """
+        Returns the rule under which a paragraph is passed through unchanged, "numeric" or "label", or None.
+        """
+        text = text.strip()
+        stripped = _ENUMERATOR.sub(" ", text)
+        words = list(_WORD.finditer(stripped))
+        if not words or (_DIGIT.search(text) and all(_is_reference_token(stripped, word) for word in words)):
+            return "numeric"
+        if len(words) <= self.max_label_words and self._is_label(text):
+            return "label"
+        return None
+
+    @staticmethod
+    def _is_label(text):
+        leading = _LEADING_NUMBER.match(text)
+        trailing = _TRAILING_NUMBER.search(text)
+        if not (leading or trailing or text.endswith(":")):
+            return False
+        # The numbering itself is not checked as words
+        text = text[leading.end() if leading else 0:trailing.start() if trailing else len(text)]
+        words = list(_WORD.finditer(text))
+        if not words or not words[0].group()[0].isupper():
+            return False
+        names = [word.group().lower() for word in words]
+        for length in range(min(len(words), _LONGEST_LABEL), 0, -1):
+            if " ".join(names[:length]) in _LABELS:
+                return all(_is_reference_token(text, word) for word in words[length:])
+        return False
+
+    def split(self, paragraphs, indices):
+        """
+        Sorts paragraphs into those to send and those passed through.
+
+        :param paragraphs: All paragraph texts.
+        :param indices: Indices about to be corrected, in document order.
+        :return: Tuple of (indices to send, {index: (rule, corrected_text)} for paragraphs that are done,
+                 {index: index of the earlier paragraph with the same text} for repeats of a paragraph
+                 that is itself still to be sent).
+        """
+        to_send = []
+        skipped = {}
+        duplicates = {}
+        leaders = {}
+        for i in indices:
+            text = paragraphs[i]
+            rule = self.classify(text)
+            if rule is not None:
+                skipped[i] = (rule, text)
+            elif text in self.corrections:
+                skipped[i] = ("duplicate", self.corrections[text])
+            elif text in leaders:
+                duplicates[i] = leaders[text]
+            else:
+                leaders[text] = i
+                to_send.append(i)
+        return to_send, skipped, duplicates
+
+    def remember(self, text, corrected_text):
+        """
+        Records a correction, so later repeats of ``text`` take it instead of being sent.
+        """
+        self.corrections[text] = corrected_text
@@ -1,5 +1,13 @@
 # prompts.py
+import hashlib
+import json
+from functools import lru_cache
+from string import Formatter
 from loguru import logger
+from src.utils import count_tokens
+from src.config import PROMPT_CACHE_MIN_TOKENS
+
+SYSTEM_PROMPT = "You are a helpful assistant."
 
 COMMON_PROMPT_START = """You are an expert proofreader and editor, highly skilled in {language_variant} grammar, spelling, and style. Your task is to correct the following {doc_type} document, ensuring it adheres to {language_variant} conventions. Please follow these guidelines:"""
 
@@ -21,6 +29,15 @@ Original Text:
 Corrected Text:
 """
 
+PACKED_PROMPT_END = """
+The original text below is a JSON array of {count} paragraphs. Correct each paragraph separately and return only a JSON array of exactly {count} strings holding the corrected paragraphs in the same order. Do not merge, split, add or remove paragraphs.
+
+Original Text:
+{text}
+
+Corrected Text:
+"""
+
 DOCUMENT_PROMPTS = {
     "Legal": """
 1. Correct any grammatical errors and spelling mistakes. Ensure proper punctuation and capitalization.
@@ -144,36 +161,131 @@ DOCUMENT_PROMPTS = {
 """
 }
 
-def get_doc_prompt(doc_type, context, text, language_variant, custom_prompt=None):
+def get_specific_prompt(doc_type, custom_prompt=None):
+    """
+    Returns the guidelines used for a document type, or the custom prompt if one is given.
+    """
+    if custom_prompt:
+        return custom_prompt
+    return DOCUMENT_PROMPTS.get(doc_type, DOCUMENT_PROMPTS["Other"])
+
+def _escape(text):
+    """
+    Escapes braces so user supplied text is taken literally when a template is compiled.
+    """
+    return text.replace("{", "{{").replace("}", "}}")
+
+def _compile(parts, **values):
+    """
+    Joins prompt parts and splits the result into literal chunks around its slots.
+
+    Fields named in ``values`` are filled in now; every other field becomes a slot filled in by
+    PromptTemplate._render.
+
+    :return: Tuple of (chunks, slots), with one more chunk than slots.
+    """
+    chunks, slots = [""], []
+    for literal, field, _, _ in Formatter().parse("\n\n".join(filter(bool, parts))):
+        chunks[-1] += literal
+        if field is None:
+            continue
+        if field in values:
+            chunks[-1] += str(values[field])
+        else:
+            slots.append(field)
+            chunks.append("")
+    return tuple(chunks), tuple(slots)
+
+class PromptTemplate:
+    """
+    The prompts for one document type, language variant, custom prompt and layout, compiled once.
+
+    Everything static is resolved at construction, so rendering a paragraph only joins the
+    precompiled chunks with the context and text. The guidelines or custom prompt are inserted
+    literally, so braces in them are safe, and the context and text are never parsed as a template.
+
+    :param doc_type: The type of the document.
+    :param language_variant: The language variant (e.g., "British English").
+    :param custom_prompt: Optional custom prompt to use instead of predefined prompts.
+    :param layout: Prompt layout, one of config.PROMPT_LAYOUTS. "prefix" moves the instructions into
+                   the system prompt, which is then byte-for-byte the same for every request.
+    """
+    def __init__(self, doc_type, language_variant, custom_prompt=None, layout="combined"):
+        self.doc_type = doc_type
+        self.language_variant = language_variant
+        self.custom_prompt = custom_prompt
+        self.layout = layout
+
+        instructions = [COMMON_PROMPT_START, _escape(get_specific_prompt(doc_type, custom_prompt))]
+        static = {"doc_type": doc_type, "language_variant": language_variant}
+        if layout == "prefix":
+            self.system_prompt = _compile(instructions, **static)[0][0]
+            instructions = []
+            prefix_tokens = count_tokens(self.system_prompt)
+            if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+                logger.info(f"The {doc_type} instructions are {prefix_tokens} tokens, below the {PROMPT_CACHE_MIN_TOKENS} "
+                            f"tokens providers need to cache a prefix, so the prefix layout saves nothing here")
+        else:
+            self.system_prompt = SYSTEM_PROMPT
+
+        self._single = _compile(instructions + [COMMON_PROMPT_END], **static)
+        self._single_with_context = _compile(instructions + [CONTEXT_PROMPT, COMMON_PROMPT_END], **static)
+        self._packed = _compile(instructions + [PACKED_PROMPT_END], **static)
+        self._packed_with_context = _compile(instructions + [CONTEXT_PROMPT, PACKED_PROMPT_END], **static)
+
+        compiled = [self.system_prompt, layout]
+        for chunks, slots in (self._single, self._single_with_context, self._packed, self._packed_with_context):
+            compiled += list(chunks) + list(slots)
+        self.version = hashlib.sha256("\x00".join(compiled).encode("utf-8")).hexdigest()[:16]
+        logger.info(f"Compiled prompt template for {doc_type} ({language_variant}, {layout} layout), version {self.version}")
+
+    @staticmethod
+    def _render(compiled, values):
+        chunks, slots = compiled
+        parts = [chunks[0]]
+        for slot, chunk in zip(slots, chunks[1:]):
+            parts.append(values[slot])
+            parts.append(chunk)
+        return "".join(parts)
+
+    def render(self, context, text):
+        """
+        Returns the user prompt for one paragraph.
+        """
+        compiled = self._single_with_context if context else self._single
+        return self._render(compiled, {"context": context, "text": text})
+
+    def render_packed(self, context, texts):
+        """
+        Returns the user prompt for several consecutive paragraphs, sent as a JSON array.
+
+        The answer is expected in the same form, so it can be split back with
+        packing.parse_packed_response.
+        """
+        compiled = self._packed_with_context if context else self._packed
+        values = {"context": context, "count": str(len(texts)), "text": json.dumps(texts, ensure_ascii=False, indent=0)}
+        return self._render(compiled, values)
+
+@lru_cache(maxsize=128)
+def get_prompt_template(doc_type, language_variant, custom_prompt=None, layout="combined"):
+    """
+    Returns the compiled PromptTemplate for a combination, compiling it on first use.
+    """
+    return PromptTemplate(doc_type, language_variant, custom_prompt, layout)
+
+def get_doc_prompt(doc_type, context, text, language_variant, custom_prompt=None, layout="combined"):
     """
     Retrieves and formats the prompt for a given document type.
 
+    In the "prefix" layout the instructions are left out, as they are sent as the template's system
+    prompt, and only the context and text are returned.
+
     :param doc_type: The type of the document.
     :param context: The context (corrected versions of previous paragraphs) as a string.
     :param text: The original text of the document.
     :param language_variant: The language variant (e.g., "British English").
     :param custom_prompt: Optional custom prompt to use instead of predefined prompts.
+    :param layout: Prompt layout, one of config.PROMPT_LAYOUTS.
     :return: Formatted prompt string.
     """
-    if custom_prompt:
-        specific_prompt = custom_prompt
-    else:
-        specific_prompt = DOCUMENT_PROMPTS.get(doc_type, DOCUMENT_PROMPTS["Other"])
-    
-    prompt_parts = [
-        COMMON_PROMPT_START,
-        specific_prompt,
-        CONTEXT_PROMPT if context else "",
-        COMMON_PROMPT_END
-    ]
-    
-    full_prompt = "\n\n".join(filter(bool, prompt_parts))
-    
-    full_prompt = full_prompt.format(
-        doc_type=doc_type,
-        language_variant=language_variant,
-        context=context,
-        text=text
-    )
-    logger.info(f"Generated custom prompt of length: {len(full_prompt)} characters")
-    return full_prompt
\ No newline at end of file
+    return get_prompt_template(doc_type, language_variant, custom_prompt, layout).render(context, text)
@@ -0,0 +1,184 @@
+# retry.py
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import aiohttp
+from loguru import logger
+from src.config import (DEFAULT_MAX_RETRIES, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY,
+                        DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RESET_TIMEOUT)
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class APIError(Exception):
+    """
+    Error response from the API that should not be retried.
+    """
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RetryableError(APIError):
+    """
+    Error response that may succeed if the request is sent again.
+
+    :param retry_after: Seconds the server asked us to wait, if it said so.
+    """
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+def parse_retry_after(headers):
+    """
+    Returns the wait requested by ``retry-after-ms`` or ``Retry-After`` (seconds or HTTP date), or None.
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_exception(error):
+    """
+    True for errors worth retrying: retryable API responses, timeouts and dropped connections.
+    """
+    return isinstance(error, (RetryableError, asyncio.TimeoutError, ConnectionError,
+                              aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+
+def counts_against_circuit(error):
+    """
+    True for errors that suggest the upstream is unhealthy. Rate limiting (429) does not count.
+    """
+    if isinstance(error, RetryableError):
+        return error.status is None or error.status >= 500
+    return is_retryable_exception(error)
+
+
+class RetryPolicy:
+    """
+    Decorrelated jitter backoff: each delay is drawn between the base delay and three times the
+    previous delay, capped at ``max_delay``.
+    """
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_RETRY_BASE_DELAY, max_delay=DEFAULT_RETRY_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, previous_delay=None):
+        previous_delay = previous_delay or self.base_delay
+        return min(self.max_delay, random.uniform(self.base_delay, previous_delay * 3))
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after ``failure_threshold`` consecutive upstream failures.
+
+    After ``reset_timeout`` seconds one trial request is let through; success closes the circuit
+    again, failure keeps it open for another ``reset_timeout``.
+    """
+    def __init__(self, failure_threshold=DEFAULT_CIRCUIT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    @property
+    def available(self):
+        """
+        True if ``before_call`` would let a request through.
+        """
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self._trial_in_flight)
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError("Upstream API is unhealthy. Not sending request.")
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit breaker closed.")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.error(f"Circuit breaker opened after {self.failures} consecutive failures.")
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Ends a call that neither proved nor disproved upstream health, such as a rate limited one.
+        """
+        self._trial_in_flight = False
+
+
+async def call_with_retries(request, policy):
+    """
+    Calls ``request()`` until it succeeds, retrying retryable errors with jittered backoff.
+
+    The wait between attempts happens outside ``request``, so anything it holds (rate budget,
+    concurrency slots, connections) is released while waiting. A server supplied Retry-After
+    is honoured when it is longer than the backoff delay. Circuit breakers are checked by the
+    request itself, as each attempt may go to a different backend.
+
+    :param request: Coroutine function performing one attempt.
+    :param policy: RetryPolicy.
+    :return: The result of ``request()``.
+    """
+    delay = None
+    attempt = 0
+    while True:
+        try:
+            return await request()
+        except Exception as e:
+            if not is_retryable_exception(e) or attempt >= policy.max_retries:
+                raise
+            delay = policy.next_delay(delay)
+            retry_after = getattr(e, "retry_after", None)
+            wait_time = max(delay, retry_after or 0)
+            attempt += 1
+            logger.warning(f"Request failed ({type(e).__name__}: {e}). Retry {attempt}/{policy.max_retries} in {wait_time:.1f} seconds...")
+            await asyncio.sleep(wait_time)
@@ -0,0 +1,211 @@
+# scheduler.py
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from loguru import logger
+from src.utils import count_tokens_batch
+from src.config import DEFAULT_CONCURRENCY, DEFAULT_JOB_PRIORITY
+
+_sequence = itertools.count()
+
+
+class ScheduledJob:
+    """
+    One document's place in a JobScheduler: its priority, its share of the request slots and its progress.
+
+    Progress is counted in tokens, so the ETA is not thrown off by paragraphs of very different lengths.
+    """
+    def __init__(self, name, priority=DEFAULT_JOB_PRIORITY):
+        self.name = name
+        self.priority = priority
+        self.sequence = next(_sequence)
+        self.total_tokens = 0
+        self.done_tokens = 0
+        self.in_flight = 0
+        self.granted = 0
+        self.started_at = None
+        self.finished_at = None
+        self.waiters = deque()
+
+    @property
+    def rate(self):
+        """
+        Measured throughput in tokens per second, or None before anything has finished.
+        """
+        if not self.done_tokens or self.started_at is None:
+            return None
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.done_tokens / elapsed if elapsed > 0 else None
+
+    def eta(self, fallback_rate=None):
+        """
+        Seconds until the job is done at its measured throughput, or at ``fallback_rate`` until it has one.
+
+        :return: Seconds, or None if there is no rate to go by.
+        """
+        if self.finished_at is not None:
+            return 0.0
+        if not self.total_tokens:
+            return None
+        rate = self.rate or fallback_rate
+        if not rate:
+            return None
+        return max(0, self.total_tokens - self.done_tokens) / rate
+
+    def to_dict(self, fallback_rate=None):
+        eta = self.eta(fallback_rate)
+        return {
+            "name": self.name,
+            "priority": self.priority,
+            "total_tokens": self.total_tokens,
+            "done_tokens": self.done_tokens,
+            "in_flight": self.in_flight,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+
+class _JobSlot:
+    """
+    Request slot of one job. Passed to correct_paragraphs in place of its own semaphore.
+    """
+    def __init__(self, scheduler, job):
+        self.scheduler = scheduler
+        self.job = job
+
+    async def __aenter__(self):
+        await self.scheduler._acquire(self.job)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler._release(self.job)
+
+
+class JobScheduler:
+    """
+    Corrects the paragraphs of many documents over one API client and one budget of request slots.
+
+    Each document is added as a ScheduledJob and corrected with ``correct_paragraphs``, which splits it
+    into paragraph requests as usual. A request needs one of ``max_in_flight`` slots before it can
+    take rate budget from the client's rate limiter and be sent. When a slot frees up it goes to the
+    waiting job with the highest priority. Between jobs of equal priority it goes to the job with the
+    fewest requests in flight, then to the one that has had the fewest slots so far. A small document
+    therefore gets an even share next to a large one instead of waiting behind it.
+    """
+    def __init__(self, api_client, max_in_flight=DEFAULT_CONCURRENCY):
+        self.api_client = api_client
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.jobs = []
+        self.done_tokens = 0
+        self.started_at = None
+
+    def add_job(self, name, priority=DEFAULT_JOB_PRIORITY):
+        job = ScheduledJob(name, priority)
+        self.jobs.append(job)
+        return job
+
+    def remove_job(self, job):
+        """
+        Marks a job as finished and stops scheduling it.
+        """
+        job.finished_at = time.monotonic()
+        if job in self.jobs:
+            self.jobs.remove(job)
+
+    def slot(self, job):
+        return _JobSlot(self, job)
+
+    @property
+    def rate(self):
+        """
+        Measured throughput of all jobs together in tokens per second, or None before anything has finished.
+        """
+        if not self.done_tokens or self.started_at is None:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return self.done_tokens / elapsed if elapsed > 0 else None
+
+    def _fallback_rate(self):
+        # A job that has not finished a paragraph yet is estimated from its share of the overall throughput
+        return self.rate / len(self.jobs) if self.rate and self.jobs else None
+
+    def eta(self, job):
+        """
+        Seconds until ``job`` is done, or None if there is nothing to estimate from yet.
+        """
+        return job.eta(self._fallback_rate())
+
+    def status(self):
+        """
+        Progress and ETA of every job still running.
+        """
+        fallback_rate = self._fallback_rate()
+        return [job.to_dict(fallback_rate) for job in self.jobs]
+
+    def log_status(self):
+        for job in self.status():
+            eta = f"{job['eta_seconds']:.0f}s" if job["eta_seconds"] is not None else "unknown"
+            logger.info(f"{job['name']}: {job['done_tokens']}/{job['total_tokens']} tokens, "
+                        f"{job['in_flight']} in flight, ETA {eta}")
+
+    async def correct_paragraphs(self, job, all_paragraphs, selected_indices, total_token_limit, progress_callback,
+                                 *args, **kwargs):
+        """
+        Corrects paragraphs of ``job``. Takes the same arguments as GrammarCorrectorAPI.correct_paragraphs
+        after the job, and returns the same.
+        """
+        selected = [all_paragraphs[i] for i in selected_indices]
+        job.total_tokens += sum(count_tokens_batch(selected, self.api_client.model))
+
+        def progress(tokens, usage=None):
+            job.done_tokens += tokens
+            self.done_tokens += tokens
+            if progress_callback:
+                progress_callback(tokens, usage)
+
+        return await self.api_client.correct_paragraphs(all_paragraphs, selected_indices, total_token_limit, progress,
+                                                        *args, request_slot=self.slot(job), **kwargs)
+
+    def _grant(self, job):
+        now = time.monotonic()
+        self.started_at = self.started_at or now
+        job.started_at = job.started_at or now
+        self.in_flight += 1
+        job.in_flight += 1
+        job.granted += 1
+
+    async def _acquire(self, job):
+        if self.in_flight < self.max_in_flight and not any(waiting.waiters for waiting in self.jobs):
+            self._grant(job)
+            return
+        future = asyncio.get_running_loop().create_future()
+        job.waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the request was cancelled
+                self._release(job)
+            elif future in job.waiters:
+                job.waiters.remove(future)
+            raise
+
+    def _release(self, job):
+        self.in_flight -= 1
+        job.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.max_in_flight:
+            for job in self.jobs:
+                # A waiter cancelled before its task has run again is still queued, but done
+                while job.waiters and job.waiters[0].done():
+                    job.waiters.popleft()
+            waiting = [job for job in self.jobs if job.waiters]
+            if not waiting:
+                return
+            job = min(waiting, key=lambda job: (-job.priority, job.in_flight, job.granted, job.sequence))
+            future = job.waiters.popleft()
+            self._grant(job)
+            future.set_result(None)
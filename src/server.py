@@ -0,0 +1,363 @@
+# server.py
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from loguru import logger
+
+from src.api_client import GrammarCorrectorAPI, load_backends
+from src.file_handlers import extract_text
+from src.text_processing import split_into_paragraphs
+from src.output_manager import save_corrected_document
+from src.document_types import DOCUMENT_TYPES
+from src.usage import UsageReport
+from src.scheduler import JobScheduler
+from src.config import (DEFAULT_CONTEXT_WINDOW_SIZE, DEFAULT_TEMPERATURE, DEFAULT_DOCUMENT_TYPE, DEFAULT_MODEL,
+                        DEFAULT_LANGUAGE_VARIANT, DEFAULT_CONCURRENCY, DEFAULT_CONTEXT_MODE,
+                        DEFAULT_SERVICE_QUEUE_SIZE, DEFAULT_SERVICE_WORKERS, DEFAULT_SERVICE_MAX_JOBS,
+                        DEFAULT_SERVICE_MAX_UPLOAD_BYTES, DEFAULT_SERVICE_MAX_PARAGRAPHS,
+                        DEFAULT_SERVICE_MAX_PARAGRAPH_CHARS, DEFAULT_JOB_PRIORITY, DEFAULT_API_BASE_URL)
+
+OUTPUT_FORMATS = ("docx", "pdf", "txt")
+FINISHED_STATUSES = ("done", "failed")
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+class ParagraphsRequest(BaseModel):
+    paragraphs: List[str]
+    selected_indices: Optional[List[int]] = None
+    doc_type: str = DEFAULT_DOCUMENT_TYPE
+    language_variant: str = DEFAULT_LANGUAGE_VARIANT
+    custom_prompt: Optional[str] = None
+    context_window_size: int = DEFAULT_CONTEXT_WINDOW_SIZE
+    token_limit: Optional[int] = None
+    priority: int = DEFAULT_JOB_PRIORITY
+
+
+class Job:
+    """
+    A document or paragraph list waiting for, or going through, correction.
+    """
+    def __init__(self, paragraphs, selected_indices=None, doc_type=DEFAULT_DOCUMENT_TYPE,
+                 language_variant=DEFAULT_LANGUAGE_VARIANT, custom_prompt=None,
+                 context_window_size=DEFAULT_CONTEXT_WINDOW_SIZE, token_limit=None, source_format="txt",
+                 priority=DEFAULT_JOB_PRIORITY):
+        self.id = uuid.uuid4().hex
+        self.paragraphs = paragraphs
+        self.selected_indices = list(range(len(paragraphs))) if selected_indices is None else selected_indices
+        self.doc_type = doc_type
+        self.language_variant = language_variant
+        self.custom_prompt = custom_prompt
+        self.context_window_size = context_window_size
+        self.token_limit = token_limit
+        self.source_format = source_format
+        self.priority = priority
+        self.status = "queued"
+        self.completed = 0
+        self.corrected = None
+        self.unprocessed = []
+        self.usage = UsageReport()
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.eta = None  # Set by the JobManager while the job runs
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        """
+        Wakes up everyone streaming this job's events.
+        """
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self):
+        eta = self.eta() if self.eta else None
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "paragraphs": len(self.paragraphs),
+            "selected": len(self.selected_indices),
+            "completed": self.completed,
+            "unprocessed": len(self.unprocessed),
+            "usage": self.usage.summary(),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs from a bounded queue on a fixed number of workers.
+
+    Every job goes through one GrammarCorrectorAPI and its pooled HTTP session, so all requests share
+    a rate limiter, a connection pool and the correction cache. When the queue is full new submissions
+    are rejected instead of buffered.
+
+    Queued jobs start in order of priority, and the requests of running jobs share one JobScheduler,
+    so an urgent or small job gets request slots ahead of, or next to, a large one that is already running.
+    """
+    def __init__(self, api_client, queue_size=DEFAULT_SERVICE_QUEUE_SIZE, workers=DEFAULT_SERVICE_WORKERS,
+                 max_jobs=DEFAULT_SERVICE_MAX_JOBS):
+        self.api_client = api_client
+        self.queue = asyncio.PriorityQueue(maxsize=queue_size)
+        self.scheduler = JobScheduler(api_client, max_in_flight=api_client.concurrency * workers)
+        self._sequence = itertools.count()
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._tasks = []
+
+    async def start(self):
+        await self.api_client.get_session()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} correction workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.api_client.close()
+
+    def submit(self, job):
+        self._prune()
+        if len(self.jobs) >= self.max_jobs:
+            raise HTTPException(status_code=503, detail="Too many jobs. Try again later.", headers={"Retry-After": "30"})
+        try:
+            # Higher priority first, then first come, first served
+            self.queue.put_nowait((-job.priority, next(self._sequence), job))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Job queue is full. Try again later.", headers={"Retry-After": "10"})
+        self.jobs[job.id] = job
+        logger.info(f"Queued job {job.id} with {len(job.selected_indices)} paragraph(s)")
+        return job
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return job
+
+    def _prune(self):
+        # Forget the oldest finished jobs once the store is full
+        for job_id in list(self.jobs):
+            if len(self.jobs) < self.max_jobs:
+                break
+            if self.jobs[job_id].status in FINISHED_STATUSES:
+                del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job):
+        job.status = "running"
+        job.notify()
+
+        def progress(tokens, usage=None):
+            if usage is None:
+                # Streamed tokens of a paragraph still in flight
+                return
+            job.completed += 1
+            job.notify()
+
+        token_limit = job.token_limit if job.token_limit is not None else float("inf")
+        scheduled = self.scheduler.add_job(job.id, job.priority)
+        job.eta = lambda: self.scheduler.eta(scheduled)
+        try:
+            job.corrected, job.unprocessed = await self.scheduler.correct_paragraphs(
+                scheduled, job.paragraphs, job.selected_indices, token_limit, progress, job.doc_type,
+                job.language_variant, job.custom_prompt, job.context_window_size, usage_report=job.usage)
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self.scheduler.remove_job(scheduled)
+        job.finished_at = time.time()
+        job.notify()
+
+
+def _validate_options(doc_type, context_window_size):
+    if doc_type not in DOCUMENT_TYPES:
+        raise HTTPException(status_code=422, detail=f"Unknown document type: {doc_type}")
+    if context_window_size < 0:
+        raise HTTPException(status_code=422, detail="context_window_size must not be negative.")
+
+
+def _validate_paragraphs(paragraphs, max_paragraphs, max_paragraph_chars):
+    if len(paragraphs) > max_paragraphs:
+        raise HTTPException(status_code=413, detail=f"Too many paragraphs: at most {max_paragraphs} per job.")
+    if any(len(paragraph) > max_paragraph_chars for paragraph in paragraphs):
+        raise HTTPException(status_code=413, detail=f"Paragraph too long: at most {max_paragraph_chars} characters.")
+
+
+async def _read_upload(upload, max_bytes):
+    _, ext = os.path.splitext(upload.filename or "")
+    ext = ext.lower()
+    if ext.lstrip(".") not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=415, detail="Only .docx, .pdf and .txt files are supported.")
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+    return data, ext
+
+
+def _extract_paragraphs(data, ext):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"upload{ext}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return split_into_paragraphs(extract_text(path))
+
+
+def create_app(api_key=None, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, concurrency=DEFAULT_CONCURRENCY,
+               context_mode=DEFAULT_CONTEXT_MODE, queue_size=DEFAULT_SERVICE_QUEUE_SIZE, workers=DEFAULT_SERVICE_WORKERS,
+               max_jobs=DEFAULT_SERVICE_MAX_JOBS, max_upload_bytes=DEFAULT_SERVICE_MAX_UPLOAD_BYTES, base_url=None,
+               backends=None, max_paragraphs=DEFAULT_SERVICE_MAX_PARAGRAPHS,
+               max_paragraph_chars=DEFAULT_SERVICE_MAX_PARAGRAPH_CHARS):
+    """
+    Builds the ASGI application.
+
+    :param api_key: OpenAI API key. Defaults to the OPENAI_API_KEY environment variable.
+    :param base_url: OpenAI-compatible endpoint. Defaults to the OPENAI_BASE_URL environment variable, then the OpenAI API.
+    :param backends: Backend pool settings (see api_client.load_backends). Defaults to the file named by the
+                     GRAMMAR_CORRECTOR_BACKENDS environment variable, if set.
+    :param max_paragraphs: Most paragraphs a job may have, or select. Larger jobs are rejected with 413.
+    :param max_paragraph_chars: Longest paragraph a job may have, in characters.
+    :return: FastAPI application.
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        backends_path = os.environ.get("GRAMMAR_CORRECTOR_BACKENDS")
+        api_client = GrammarCorrectorAPI(api_key or os.environ.get("OPENAI_API_KEY"), model=model,
+                                         temperature=temperature, concurrency=concurrency, context_mode=context_mode,
+                                         base_url=base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_API_BASE_URL,
+                                         backends=backends or (load_backends(backends_path) if backends_path else None))
+        app.state.jobs = JobManager(api_client, queue_size=queue_size, workers=workers, max_jobs=max_jobs)
+        await app.state.jobs.start()
+        try:
+            yield
+        finally:
+            await app.state.jobs.stop()
+
+    app = FastAPI(title="Grammar Corrector", lifespan=lifespan)
+
+    @app.post("/jobs/paragraphs", status_code=202)
+    async def submit_paragraphs(request: ParagraphsRequest):
+        _validate_options(request.doc_type, request.context_window_size)
+        _validate_paragraphs(request.paragraphs, max_paragraphs, max_paragraph_chars)
+        if request.selected_indices is not None and len(request.selected_indices) > max_paragraphs:
+            raise HTTPException(status_code=413, detail=f"Too many paragraphs: at most {max_paragraphs} per job.")
+        if request.selected_indices is not None and any(not 0 <= i < len(request.paragraphs) for i in request.selected_indices):
+            raise HTTPException(status_code=422, detail="selected_indices out of range.")
+        job = Job(request.paragraphs, request.selected_indices, request.doc_type, request.language_variant,
+                  request.custom_prompt, request.context_window_size, request.token_limit, priority=request.priority)
+        return app.state.jobs.submit(job).to_dict()
+
+    @app.post("/jobs/document", status_code=202)
+    async def submit_document(file: UploadFile = File(...), doc_type: str = Form(DEFAULT_DOCUMENT_TYPE),
+                              language_variant: str = Form(DEFAULT_LANGUAGE_VARIANT),
+                              custom_prompt: Optional[str] = Form(None),
+                              context_window_size: int = Form(DEFAULT_CONTEXT_WINDOW_SIZE),
+                              token_limit: Optional[int] = Form(None),
+                              priority: int = Form(DEFAULT_JOB_PRIORITY)):
+        _validate_options(doc_type, context_window_size)
+        if app.state.jobs.queue.full():
+            raise HTTPException(status_code=503, detail="Job queue is full. Try again later.", headers={"Retry-After": "10"})
+        data, ext = await _read_upload(file, max_upload_bytes)
+        try:
+            paragraphs = await asyncio.to_thread(_extract_paragraphs, data, ext)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Failed to extract text: {e}")
+        _validate_paragraphs(paragraphs, max_paragraphs, max_paragraph_chars)
+        job = Job(paragraphs, None, doc_type, language_variant, custom_prompt, context_window_size, token_limit,
+                  source_format=ext.lstrip("."), priority=priority)
+        return app.state.jobs.submit(job).to_dict()
+
+    @app.get("/backends")
+    async def get_backends():
+        return [backend.to_dict() for backend in app.state.jobs.api_client.backends]
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str):
+        return app.state.jobs.get(job_id).to_dict()
+
+    @app.get("/jobs/{job_id}/events")
+    async def stream_job(job_id: str):
+        job = app.state.jobs.get(job_id)
+
+        async def events():
+            while True:
+                changed = job._changed
+                yield f"data: {json.dumps(job.to_dict())}\n\n"
+                if job.status in FINISHED_STATUSES:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/jobs/{job_id}/result")
+    async def get_result(job_id: str, format: Optional[str] = None):
+        job = app.state.jobs.get(job_id)
+        if job.status != "done":
+            raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+        format = (format or job.source_format).lower()
+        if format == "json":
+            return {"id": job.id, "paragraphs": job.corrected, "unprocessed": job.unprocessed}
+        if format not in OUTPUT_FORMATS:
+            raise HTTPException(status_code=422, detail=f"Unsupported format: {format}")
+
+        directory = tempfile.mkdtemp()
+        output_path = os.path.join(directory, f"{job.id}_corrected.{format}")
+        await asyncio.to_thread(save_corrected_document, None, output_path, '\n\n'.join(job.corrected))
+        return FileResponse(output_path, filename=os.path.basename(output_path),
+                            background=BackgroundTask(shutil.rmtree, directory, ignore_errors=True))
+
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="grammar-correct-server", description="Serve grammar correction over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backends", metavar="FILE", help="JSON list of backends to spread requests over")
+    args = parser.parse_args(argv)
+    if args.backends:
+        # The app is created on import by uvicorn, so the file is passed on through the environment
+        os.environ["GRAMMAR_CORRECTOR_BACKENDS"] = os.path.abspath(args.backends)
+    uvicorn.run("src.server:app", host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,40 @@
 
 import re
 
+PARAGRAPH_BREAK = re.compile(r'\n{2,}')
+
 def split_into_paragraphs(text):
-    paragraphs = re.split(r'\n{2,}', text)
+    paragraphs = PARAGRAPH_BREAK.split(text)
     # Remove any leading/trailing whitespace
     paragraphs = [para.strip() for para in paragraphs if para.strip()]
     return paragraphs
 
+def iter_paragraphs(pieces, separator='\n'):
+    """
+    Splits text into paragraphs as it arrives, like split_into_paragraphs on ``separator.join(pieces)``.
+
+    A paragraph is yielded as soon as the blank line that ends it has been read, so consumers can
+    start before the whole document is extracted.
+    """
+    buffer = None
+    for piece in pieces:
+        if buffer is None:
+            buffer, scan_from = piece, 0
+        else:
+            # The buffer holds no paragraph break yet, so only the join can complete one
+            scan_from = max(0, len(buffer) - 1)
+            buffer = buffer + separator + piece
+        if not PARAGRAPH_BREAK.search(buffer, scan_from):
+            continue
+        parts = PARAGRAPH_BREAK.split(buffer)
+        # The last part may still continue in the next piece
+        buffer = parts.pop()
+        for para in parts:
+            if para.strip():
+                yield para.strip()
+    if buffer and buffer.strip():
+        yield buffer.strip()
+
 def split_paragraph_into_sentences(paragraph):
     # Simple sentence splitter using regex
     sentences = re.split(r'(?<=[.!?]) +', paragraph)
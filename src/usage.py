@@ -0,0 +1,120 @@
+# usage.py
+
+from loguru import logger
+
+
+def make_usage(prompt_tokens=0, completion_tokens=0, total_tokens=None, cached=False, failed=False, cached_tokens=0):
+    """
+    Builds a usage record in the shape of the OpenAI ``usage`` block.
+
+    :param prompt_tokens: Tokens in the prompt.
+    :param completion_tokens: Tokens in the completion.
+    :param total_tokens: Total tokens, defaults to prompt + completion.
+    :param cached: Whether the result was served from the correction cache.
+    :param failed: Whether the paragraph could not be corrected.
+    :param cached_tokens: Prompt tokens the provider served from its prompt cache.
+    :return: Usage dictionary.
+    """
+    if total_tokens is None:
+        total_tokens = prompt_tokens + completion_tokens
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total_tokens,
+        "cached_tokens": cached_tokens,
+        "cached": cached,
+        "failed": failed,
+    }
+
+
+def usage_from_response(result):
+    """
+    Extracts the usage block from a chat completion response, or None if the server did not send one.
+    """
+    usage = result.get("usage")
+    if not usage:
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    return make_usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), usage.get("total_tokens"),
+                      cached_tokens=details.get("cached_tokens") or 0)
+
+
+def split_usage(usage, weights):
+    """
+    Divides the usage of one request between the paragraphs it corrected, in proportion to ``weights``.
+
+    The shares add up to the original usage exactly. Each share records its position in the request
+    as ``pack_index``, so a UsageReport counts the request once.
+    """
+    if not sum(weights):
+        weights = [1] * len(weights)
+    total_weight = sum(weights)
+    shares = [dict(make_usage(cached=usage.get("cached", False), failed=usage.get("failed", False)), pack_index=position)
+              for position in range(len(weights))]
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens"):
+        remaining = usage.get(key, 0)
+        for share, weight in zip(shares[:-1], weights[:-1]):
+            share[key] = usage.get(key, 0) * weight // total_weight
+            remaining -= share[key]
+        shares[-1][key] = remaining
+    return shares
+
+
+class UsageReport:
+    """
+    Collects per-paragraph token usage for one correction run.
+
+    Cache hits are counted separately and do not add to the billed token totals. ``cached_tokens``
+    counts the prompt tokens the provider served from its own prompt cache, which are billed at a
+    discount and processed faster. ``skipped`` counts the paragraphs passed through without a request
+    by each rule of prefilter.ParagraphFilter.
+    """
+    def __init__(self):
+        self.paragraphs = {}
+        self.api_calls = 0
+        self.cache_hits = 0
+        self.skipped = {}
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, index, usage):
+        self.paragraphs[index] = usage
+        if usage.get("skipped"):
+            self.skipped[usage["skipped"]] = self.skipped.get(usage["skipped"], 0) + 1
+            return
+        if usage.get("failed"):
+            self.failures += 1
+        elif usage.get("cached"):
+            self.cache_hits += 1
+            return
+        elif not usage.get("pack_index"):
+            self.api_calls += 1
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        self.total_tokens += usage.get("total_tokens", 0)
+        self.cached_tokens += usage.get("cached_tokens", 0)
+
+    def summary(self):
+        return {
+            "paragraphs": len(self.paragraphs),
+            "api_calls": self.api_calls,
+            "cache_hits": self.cache_hits,
+            "skipped": dict(self.skipped),
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cached_tokens": self.cached_tokens,
+        }
+
+    def log(self):
+        logger.info(f"Usage report: {self.summary()}")
+
+    def __str__(self):
+        return (f"{len(self.paragraphs)} paragraph(s): {self.api_calls} API call(s), {self.cache_hits} cache hit(s), "
+                f"{sum(self.skipped.values())} skipped, {self.failures} failure(s). Tokens used: {self.total_tokens} "
+                f"(prompt {self.prompt_tokens}, of which {self.cached_tokens} from the prompt cache, "
+                f"completion {self.completion_tokens}).")
@@ -1,10 +1,55 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 import tiktoken
 from loguru import logger
+from src.config import DEFAULT_TOKEN_COUNT_CACHE_SIZE, DEFAULT_TOKENIZER_THREADS
+
+FALLBACK_ENCODING = "cl100k_base"
+
+_token_counts = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model="gpt-4o-mini"):
+    """
+    Returns the tiktoken encoding for a model, resolving it only once per model.
+
+    Parameters:
+        model (str): The model name to determine the encoding.
+
+    Returns:
+        tiktoken.Encoding: The encoding used by the model, or cl100k_base if the model is unknown.
+    """
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+        logger.info(f"Successfully loaded encoding for model: {model}")
+    except KeyError:
+        encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+        logger.warning(f"Model '{model}' not found. Falling back to encoding: {FALLBACK_ENCODING}")
+    return encoding
+
+
+def _token_count_key(text, encoding):
+    return encoding.name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _remember_token_count(key, count):
+    with _token_counts_lock:
+        _token_counts[key] = count
+        _token_counts.move_to_end(key)
+        while len(_token_counts) > DEFAULT_TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+
 
 def count_tokens(text, model="gpt-4o-mini"):
     """
     Counts the number of tokens in the given text using the specified model's encoding.
 
+    Counts are memoized per (encoding, text hash), so repeated calls for the same paragraph are free.
+
     Parameters:
         text (str): The text to be tokenized.
         model (str): The model name to determine the encoding. Defaults to "gpt-4o-mini".
@@ -12,15 +57,38 @@ def count_tokens(text, model="gpt-4o-mini"):
     Returns:
         int: The number of tokens in the text.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        logger.info(f"Successfully loaded encoding for model: {model}")
-    except KeyError:
-        fallback_model = "gpt-3.5-turbo"
-        encoding = tiktoken.get_encoding(fallback_model)
-        logger.warning(f"Model '{model}' not found. Falling back to encoding for model: {fallback_model}")
-    
-    tokens = encoding.encode(text)
-    token_count = len(tokens)
-    logger.debug(f"Text tokenized into {token_count} tokens.")
+    encoding = get_encoding(model)
+    key = _token_count_key(text, encoding)
+    with _token_counts_lock:
+        token_count = _token_counts.get(key)
+    if token_count is None:
+        token_count = len(encoding.encode_ordinary(text))
+        _remember_token_count(key, token_count)
     return token_count
+
+
+def count_tokens_batch(texts, model="gpt-4o-mini", num_threads=DEFAULT_TOKENIZER_THREADS):
+    """
+    Counts the tokens of many texts at once, tokenizing uncached texts in a single threaded batch.
+
+    Parameters:
+        texts (list of str): The texts to be tokenized.
+        model (str): The model name to determine the encoding. Defaults to "gpt-4o-mini".
+        num_threads (int): Number of threads tiktoken uses for the batch.
+
+    Returns:
+        list of int: The number of tokens in each text, in the same order.
+    """
+    encoding = get_encoding(model)
+    keys = [_token_count_key(text, encoding) for text in texts]
+    with _token_counts_lock:
+        counts = [_token_counts.get(key) for key in keys]
+
+    missing = [i for i, count in enumerate(counts) if count is None]
+    if missing:
+        encoded = encoding.encode_ordinary_batch([texts[i] for i in missing], num_threads=num_threads)
+        for i, tokens in zip(missing, encoded):
+            counts[i] = len(tokens)
+            _remember_token_count(keys[i], counts[i])
+        logger.debug(f"Tokenized {len(missing)} of {len(texts)} texts.")
+    return counts
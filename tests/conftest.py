@@ -0,0 +1,45 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import cache_manager, utils
+from tests.stub_server import StubServer
+
+
+class WordEncoding:
+    """
+    Counts one token per word. tiktoken downloads its encodings on first use, which the tests must not rely on.
+    """
+    name = "test-words"
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [text.split() for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(utils, "get_encoding", lambda model="gpt-4o-mini": WordEncoding())
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path):
+    """
+    Gives every test an empty correction cache of its own.
+    """
+    backend = cache_manager.create_cache_backend(str(tmp_path / "cache.sqlite3"))
+    cache_manager.set_cache_backend(backend)
+    yield backend
+    cache_manager.set_cache_backend(None)
+
+
+@pytest.fixture
+def stub():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
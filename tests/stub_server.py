@@ -0,0 +1,165 @@
+"""
+A local OpenAI-compatible server for the tests, serving chat completions and the Files and Batches APIs.
+
+Completions upper-case the original text of the prompt, so a corrected paragraph is easy to tell
+apart from an uncorrected one. Every chat request body is kept in ``requests``. Requests with
+``"stream": true`` are answered with server-sent events, one chunk per word.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from aiohttp import web
+
+
+def extract_text(prompt):
+    return prompt.split("Original Text:\n")[-1].split("\n\nCorrected Text:")[0]
+
+
+def complete(body):
+    """
+    Answers a chat completion request body: the original text upper-cased, or every paragraph of a
+    packed request upper-cased.
+    """
+    text = extract_text(body["messages"][-1]["content"])
+    try:
+        paragraphs = json.loads(text)
+    except ValueError:
+        paragraphs = None
+    if isinstance(paragraphs, list):
+        content = json.dumps([paragraph.upper() for paragraph in paragraphs])
+    else:
+        content = text.upper()
+    return {"choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}}
+
+
+class StubServer:
+    """
+    Runs the stub in a background thread, so it can serve synchronous code as well as other event loops.
+
+    ``handler`` may be replaced with a function taking (path, body) and returning (status, body) to
+    make a route fail; it returns None to fall back to the normal answer. ``delay`` holds every chat
+    request for that many seconds, and ``max_in_flight`` records how many were held at once. The
+    Authorization header of every file upload and batch submission is kept in ``authorizations``.
+    The next ``truncate`` streamed answers are cut off halfway, before their finish reason and ``[DONE]``.
+    """
+    def __init__(self):
+        self.requests = []
+        self.paths = []
+        self.handler = None
+        self.delay = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.truncate = 0
+        self.files = {}
+        self.batches = {}
+        self.batch_polls = {}
+        self.authorizations = []
+        self._ids = itertools.count()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner = None
+        self.port = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def url(self, prefix):
+        return f"http://127.0.0.1:{self.port}/{prefix}"
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/{prefix}/chat/completions", self._chat)
+        app.router.add_post("/{prefix}/files", self._upload)
+        app.router.add_get("/{prefix}/files/{id}/content", self._content)
+        app.router.add_post("/{prefix}/batches", self._create_batch)
+        app.router.add_get("/{prefix}/batches/{id}", self._get_batch)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def _chat(self, request):
+        body = await request.json()
+        self.requests.append(body)
+        self.paths.append(request.match_info["prefix"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.handler is not None:
+            response = self.handler(request.match_info["prefix"], body)
+            if response is not None:
+                status, result = response
+                return web.json_response(result, status=status)
+        if body.get("stream"):
+            return await self._stream(request, complete(body))
+        return web.json_response(complete(body))
+
+    async def _stream(self, request, result):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = result["choices"][0]["message"]["content"].split(" ")
+        chunks = [{"choices": [{"delta": {"content": word if i == 0 else " " + word}}]} for i, word in enumerate(words)]
+        finished = not self.truncate
+        if not finished:
+            self.truncate -= 1
+            chunks = chunks[:len(chunks) // 2]
+        else:
+            chunks.append({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+            chunks.append({"choices": [], "usage": result["usage"]})
+        for chunk in chunks:
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        if finished:
+            await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _upload(self, request):
+        self.authorizations.append(request.headers.get("Authorization"))
+        data = await request.post()
+        file_id = f"file-{next(self._ids)}"
+        self.files[file_id] = data["file"].file.read().decode("utf-8")
+        return web.json_response({"id": file_id})
+
+    async def _content(self, request):
+        return web.Response(text=self.files[request.match_info["id"]])
+
+    async def _create_batch(self, request):
+        self.authorizations.append(request.headers.get("Authorization"))
+        body = await request.json()
+        batch_id = f"batch-{next(self._ids)}"
+        self.batches[batch_id] = {"id": batch_id, "status": "in_progress", "input_file_id": body["input_file_id"]}
+        self.batch_polls[batch_id] = 0
+        return web.json_response(self.batches[batch_id])
+
+    async def _get_batch(self, request):
+        batch = self.batches[request.match_info["id"]]
+        self.batch_polls[batch["id"]] += 1
+        # Finishes on the second poll, so callers have to wait at least once
+        if self.batch_polls[batch["id"]] >= 2 and batch["status"] != "completed":
+            results = []
+            for line in self.files[batch["input_file_id"]].splitlines():
+                item = json.loads(line)
+                results.append({"custom_id": item["custom_id"],
+                                "response": {"status_code": 200, "body": complete(item["body"])}})
+            output_id = f"file-{next(self._ids)}"
+            self.files[output_id] = "\n".join(json.dumps(result) for result in results)
+            batch.update(status="completed", output_file_id=output_id)
+        return web.json_response(batch)
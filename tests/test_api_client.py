@@ -0,0 +1,132 @@
+import asyncio
+from src.api_client import GrammarCorrectorAPI
+from src.cache_manager import make_cache_key, get_correction_from_cache
+from src.config import DEFAULT_CONTEXT_MODE
+from src.prompts import get_prompt_template
+from src.retry import RetryPolicy
+from src.utils import count_tokens
+
+PARAGRAPHS = [f"Paragraph number {i} has a few words in it." for i in range(6)]
+
+
+def correct(api_client, paragraphs, indices=None, context_window_size=2, progress_callback=None):
+    async def run():
+        async with api_client:
+            return await api_client.correct_paragraphs(paragraphs, list(indices if indices is not None else range(len(paragraphs))),
+                                                       float("inf"), progress_callback, "Legal", "British English", None,
+                                                       context_window_size)
+    return asyncio.run(run())
+
+
+def test_default_mode_runs_a_contiguous_selection_concurrently(stub):
+    stub.delay = 0.05
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url, pack_token_budget=0, prefilter=False)
+    assert api_client.context_mode == DEFAULT_CONTEXT_MODE == "original"
+
+    corrected, unprocessed = correct(api_client, PARAGRAPHS)
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert unprocessed == []
+    assert stub.max_in_flight == len(PARAGRAPHS)
+
+
+def test_corrected_mode_waits_for_context(stub):
+    stub.delay = 0.01
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url, context_mode="corrected", pack_token_budget=0,
+                                     prefilter=False)
+
+    corrected, _ = correct(api_client, PARAGRAPHS)
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert stub.max_in_flight == 1
+    # The context of each request is the corrected text of the paragraphs before it
+    assert PARAGRAPHS[0].upper() in stub.requests[1]["messages"][-1]["content"]
+
+
+def test_packed_paragraphs_are_cached_under_the_context_that_was_sent(stub):
+    paragraphs = ["First short one.", "Second short one.", "Third short one."]
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url, context_mode="corrected", prefilter=False)
+
+    corrected, _ = correct(api_client, paragraphs)
+
+    assert corrected == [paragraph.upper() for paragraph in paragraphs]
+    assert len(stub.requests) == 1
+    template = get_prompt_template("Legal", "British English", None, api_client.prompt_layout)
+    # The second paragraph was sent next to the original first one, not its correction
+    key = make_cache_key(paragraphs[1], api_client.model, api_client.temperature, "British English", "Legal",
+                         template.version, paragraphs[0])
+    assert get_correction_from_cache(key)[0] == paragraphs[1].upper()
+
+    # A second run finds every paragraph in the cache
+    corrected_again, _ = correct(GrammarCorrectorAPI("key", base_url=stub.base_url, context_mode="corrected",
+                                                     prefilter=False), paragraphs)
+    assert corrected_again == corrected
+    assert len(stub.requests) == 1
+
+
+def test_fails_over_to_a_healthy_backend(stub):
+    stub.handler = lambda prefix, body: (500, {"error": {"message": "Down"}}) if prefix == "down" else None
+    api_client = GrammarCorrectorAPI("key", backends=[{"base_url": stub.url("down")}, {"base_url": stub.url("up")}],
+                                     pack_token_budget=0, prefilter=False, max_retries=0)
+
+    corrected, _ = correct(api_client, PARAGRAPHS)
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert stub.paths.count("up") == len(PARAGRAPHS)
+    assert "down" in stub.paths
+    down, up = api_client.backends
+    assert down.failures == stub.paths.count("down")
+    assert up.failures == 0
+
+
+def streaming_client(stub, **kwargs):
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url, stream=True, pack_token_budget=0, prefilter=False, **kwargs)
+    api_client.retry_policy = RetryPolicy(max_retries=2, base_delay=0.01, max_delay=0.01)
+    return api_client
+
+
+def test_streamed_response_is_assembled(stub):
+    progress = []
+    corrected, _ = correct(streaming_client(stub), PARAGRAPHS[:1], progress_callback=lambda tokens, usage: progress.append(tokens))
+
+    assert corrected == [PARAGRAPHS[0].upper()]
+    assert stub.requests[0]["stream"] is True
+    assert sum(progress) == count_tokens(PARAGRAPHS[0].upper())
+
+
+def test_truncated_stream_is_retried_without_over_reporting(stub):
+    stub.truncate = 1
+    progress = []
+    corrected, _ = correct(streaming_client(stub), PARAGRAPHS[:1], progress_callback=lambda tokens, usage: progress.append(tokens))
+
+    assert corrected == [PARAGRAPHS[0].upper()]
+    assert len(stub.requests) == 2
+    # The tokens streamed by the cut off attempt are not counted again when the retry streams them
+    assert sum(progress) == count_tokens(PARAGRAPHS[0].upper())
+
+
+def test_ordered_iteration_holds_back_early_finishers(stub):
+    api_client = streaming_client(stub)
+    request_correction = api_client._request_correction
+    finished = []
+
+    async def first_is_slowest(session, text, *args):
+        if text == PARAGRAPHS[0]:
+            await asyncio.sleep(0.1)
+        result = await request_correction(session, text, *args)
+        finished.append(PARAGRAPHS.index(text))
+        return result
+
+    api_client._request_correction = first_is_slowest
+
+    async def run():
+        async with api_client:
+            return [item async for item in api_client.iter_corrected_paragraphs(
+                PARAGRAPHS, list(range(len(PARAGRAPHS))), float("inf"), None, "Legal", "British English", None, 0,
+                ordered=True)]
+
+    results = asyncio.run(run())
+
+    assert finished[-1] == 0
+    assert [index for index, _, _ in results] == list(range(len(PARAGRAPHS)))
+    assert [text for _, text, _ in results] == [paragraph.upper() for paragraph in PARAGRAPHS]
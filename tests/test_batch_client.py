@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import pytest
+from src.api_client import GrammarCorrectorAPI
+from src.batch_client import BatchCorrector
+
+PARAGRAPHS = ["The first paragraph needs some correcting.", "The second paragraph needs some too."]
+
+
+def correct(api_client, state_path, corrector=None, paragraphs=PARAGRAPHS, token_limit=float("inf")):
+    corrector = corrector or BatchCorrector(api_client, poll_interval=0.01)
+
+    async def run():
+        async with api_client:
+            return await corrector.correct_paragraphs(paragraphs, list(range(len(paragraphs))), token_limit, None, "Legal",
+                                                      "British English", None, 1, state_path=state_path)
+    return asyncio.run(run())
+
+
+def test_submits_polls_and_collects(stub, tmp_path):
+    state_path = str(tmp_path / "batch.json")
+    corrected, unprocessed = correct(GrammarCorrectorAPI("key", base_url=stub.base_url), state_path)
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert unprocessed == []
+    assert len(stub.batches) == 1
+    assert list(stub.batch_polls.values()) == [2]
+    assert stub.authorizations == ["Bearer key", "Bearer key"]
+    # The state is only needed until the results are in
+    assert not os.path.exists(state_path)
+
+
+def test_sends_no_authorization_without_a_key(stub, tmp_path):
+    corrected, _ = correct(GrammarCorrectorAPI(None, base_url=stub.base_url), str(tmp_path / "batch.json"))
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert stub.authorizations == [None, None]
+
+
+def test_resumes_submitted_batches(stub, tmp_path):
+    state_path = str(tmp_path / "batch.json")
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url)
+    interrupted = BatchCorrector(api_client, poll_interval=0.01)
+
+    async def interrupt(*args):
+        raise KeyboardInterrupt
+
+    interrupted._collect = interrupt
+    with pytest.raises(KeyboardInterrupt):
+        correct(api_client, state_path, interrupted)
+    assert len(stub.batches) == 1
+    with open(state_path, encoding="utf-8") as f:
+        assert len(json.load(f)["batches"]) == 1
+
+    corrected, _ = correct(GrammarCorrectorAPI("key", base_url=stub.base_url), state_path)
+
+    assert corrected == [paragraph.upper() for paragraph in PARAGRAPHS]
+    assert len(stub.batches) == 1
+
+
+def test_duplicate_beyond_token_limit_stays_unprocessed(stub, tmp_path):
+    # Both distinct paragraphs fit the limit, the repeat of the first one does not
+    paragraphs = PARAGRAPHS + [PARAGRAPHS[0]]
+    api_client = GrammarCorrectorAPI("key", base_url=stub.base_url, prefilter=True)
+    corrected, unprocessed = correct(api_client, str(tmp_path / "batch.json"), paragraphs=paragraphs,
+                                     token_limit=len(" ".join(PARAGRAPHS).split()))
+
+    assert corrected == [PARAGRAPHS[0].upper(), PARAGRAPHS[1].upper(), PARAGRAPHS[0]]
+    assert unprocessed == [PARAGRAPHS[0]]
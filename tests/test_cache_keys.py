@@ -0,0 +1,28 @@
+from src.cache_manager import make_cache_key
+
+BASE = dict(text="Some text.", model="gpt-4o-mini", temperature=0.3, language_variant="British English",
+            doc_type="Legal", template_version="v1", context="Earlier text.")
+
+
+def key(**changes):
+    return make_cache_key(**dict(BASE, **changes))
+
+
+def test_same_inputs_give_the_same_key():
+    assert key() == key()
+    assert len(key()) == 64
+
+
+def test_every_input_changes_the_key():
+    changed = [key(text="Other text."), key(model="gpt-4o"), key(temperature=0.7),
+               key(language_variant="American English"), key(doc_type="Academic"),
+               key(template_version="v2"), key(context="")]
+    assert len({key(), *changed}) == len(changed) + 1
+
+
+def test_equal_temperatures_give_the_same_key():
+    assert key(temperature=0.3) == key(temperature="0.3") == key(temperature=0.30000000001)
+
+
+def test_fields_cannot_run_into_each_other():
+    assert key(text="ab", context="c") != key(text="a", context="bc")
@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+import time
+import pytest
+from src.cache_manager import (CacheBackend, CacheWriter, MemoryCache, SQLiteCacheBackend, TieredCacheBackend,
+                               create_cache_backend, set_cache_backend, get_from_cache, save_to_cache, flush_cache,
+                               clear_cache)
+
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_concurrent_writers_and_readers(cache, tmp_path):
+    def work(n):
+        for i in range(200):
+            save_to_cache(f"{n}-{i}", f"value {n} {i}")
+            assert get_from_cache(f"{n}-{i}") == f"value {n} {i}"
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    flush_cache()
+
+    store = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+    try:
+        assert all(store.get(f"{n}-{i}") == f"value {n} {i}" for n in range(8) for i in range(200))
+    finally:
+        store.close()
+
+
+def test_instances_share_one_file(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    first, second = create_cache_backend(path), create_cache_backend(path)
+    try:
+        first.set("a", "from first")
+        second.set("b", "from second")
+        first.flush()
+        second.flush()
+        assert first.get("b") == "from second"
+        assert second.get("a") == "from first"
+    finally:
+        first.close()
+        second.close()
+
+
+def test_saving_does_not_wait_for_a_locked_database(tmp_path):
+    path = str(tmp_path / "locked.sqlite3")
+    set_cache_backend(create_cache_backend(path))
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        save_to_cache("key", "value")
+        assert time.monotonic() - started < 0.5
+        assert get_from_cache("key") == "value"
+    finally:
+        other.execute("COMMIT")
+        other.close()
+
+    flush_cache()
+    store = SQLiteCacheBackend(path)
+    try:
+        assert store.get("key") == "value"
+    finally:
+        store.close()
+
+
+def test_clear_drops_queued_writes(cache):
+    save_to_cache("key", "value")
+    clear_cache()
+    flush_cache()
+    assert get_from_cache("key") is None
+
+
+class FailingOnceBackend(CacheBackend):
+    def __init__(self):
+        self.values = {}
+        self.failed = False
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set_many(self, items):
+        if not self.failed:
+            self.failed = True
+            raise TypeError("unsupported value")
+        self.values.update(items)
+
+    def clear(self):
+        self.values.clear()
+
+
+def test_writer_survives_a_failing_batch():
+    backend = FailingOnceBackend()
+    writer = CacheWriter(backend)
+    try:
+        writer.set("bad", "value")
+        writer.flush()
+        writer.set("good", "value")
+        writer.flush()
+        assert backend.failed
+        assert backend.values == {"good": "value"}
+        assert writer.get("bad") is None
+    finally:
+        writer.close()
+
+
+def test_memory_cache_evicts_least_recently_used_by_count():
+    memory = MemoryCache(max_entries=2, max_bytes=1000, ttl=None)
+    memory.set("a", "1")
+    memory.set("b", "2")
+    assert memory.get("a") == "1"
+    memory.set("c", "3")
+
+    assert memory.get("b") is None
+    assert memory.get("a") == "1" and memory.get("c") == "3"
+    assert memory.stats()["evictions"] == 1
+
+
+def test_memory_cache_evicts_by_bytes():
+    memory = MemoryCache(max_entries=100, max_bytes=10, ttl=None)
+    memory.set("a", "1234")
+    memory.set("b", "1234")
+    assert memory.stats()["bytes"] == 10
+    memory.set("c", "1234")
+
+    assert memory.get("a") is None
+    assert memory.stats()["bytes"] == 10
+    # A value larger than the whole cache is not kept at all
+    memory.set("big", "x" * 20)
+    assert memory.get("big") is None
+    assert memory.get("c") == "1234"
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    memory = MemoryCache(max_entries=10, max_bytes=1000, ttl=5)
+    memory.set("a", "1")
+    now[0] += 4
+    assert memory.get("a") == "1"
+    now[0] += 2
+
+    assert memory.get("a") is None
+    stats = memory.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["entries"]) == (1, 1, 1, 0)
+
+
+def test_tiered_cache_promotes_persistent_hits(tmp_path):
+    store = SQLiteCacheBackend(str(tmp_path / "tiered.sqlite3"))
+    store.set("key", "value")
+    tiered = TieredCacheBackend(store, MemoryCache(max_entries=10, max_bytes=1000, ttl=None))
+    try:
+        assert tiered.get("key") == "value"
+        assert tiered.memory.stats()["entries"] == 1
+        store.clear()
+        # Served from memory now, without touching the store
+        assert tiered.get("key") == "value"
+        assert tiered.memory.stats()["hits"] == 1
+        assert tiered.get("missing") is None
+        assert tiered.memory.stats()["entries"] == 1
+    finally:
+        tiered.close()
@@ -0,0 +1,79 @@
+from docx import Document
+from PIL import Image
+from src.docx_document import DocxDocument
+from src.output_manager import save_docx_in_place
+from src.text_processing import split_into_paragraphs
+
+
+def build_document(path):
+    document = Document()
+    paragraph = document.add_paragraph()
+    paragraph.add_run("Teh ")
+    paragraph.add_run("bold").bold = True
+    paragraph.add_run(" word is here.")
+    soft_break = document.add_paragraph("Dear Sir,")
+    soft_break.runs[0].add_break()
+    soft_break.runs[0].add_break()
+    soft_break.add_run("I writes to you.")
+    document.add_paragraph("")
+    document.add_table(rows=1, cols=1).cell(0, 0).text = "A cel in a table."
+    document.sections[0].header.paragraphs[0].text = "Teh header"
+    document.save(path)
+
+
+def test_lists_paragraphs_that_split_back(tmp_path):
+    path = str(tmp_path / "input.docx")
+    build_document(path)
+    document = DocxDocument(path)
+
+    assert document.paragraphs == ["Teh bold word is here.", "Dear Sir,\nI writes to you.", "A cel in a table.",
+                                   "Teh header"]
+    assert split_into_paragraphs(document.get_text()) == document.paragraphs
+
+
+def test_edits_stay_with_their_runs(tmp_path):
+    path, output_path = str(tmp_path / "input.docx"), str(tmp_path / "output.docx")
+    build_document(path)
+    document = DocxDocument(path)
+
+    assert document.apply(["The bold words are here.", "Dear Sir,\nI writes to you.", "A cel in a table.",
+                           "Teh header"]) == 1
+    document.save(output_path)
+
+    runs = Document(output_path).paragraphs[0].runs
+    assert [run.text for run in runs] == ["The ", "bold", " words are here."]
+    assert [bool(run.bold) for run in runs] == [False, True, False]
+
+
+def test_soft_break_paragraph_round_trip(tmp_path):
+    path, output_path = str(tmp_path / "input.docx"), str(tmp_path / "output.docx")
+    build_document(path)
+    corrected = ["The bold word is here.", "Dear Sir,\nI write to you.", "A cell in a table.", "The header"]
+
+    save_docx_in_place(path, output_path, corrected, "\n\n".join(corrected))
+
+    output = Document(output_path)
+    # Patched in place rather than rebuilt, so the blank line, the table and the header survive
+    assert output.paragraphs[1].text == "Dear Sir,\n\nI write to you."
+    assert output.tables[0].cell(0, 0).text == "A cell in a table."
+    assert output.sections[0].header.paragraphs[0].text == "The header"
+    assert DocxDocument(output_path).paragraphs == corrected
+
+
+def test_insertion_before_an_inline_picture_keeps_it(tmp_path):
+    path, output_path, image_path = str(tmp_path / "input.docx"), str(tmp_path / "output.docx"), str(tmp_path / "dot.png")
+    Image.new("RGB", (4, 4), "red").save(image_path)
+    document = Document()
+    paragraph = document.add_paragraph()
+    paragraph.add_run().add_picture(image_path)
+    paragraph.add_run("eror is here.")
+    document.save(path)
+
+    document = DocxDocument(path)
+    assert document.apply(["An error is here."]) == 1
+    document.save(output_path)
+
+    runs = Document(output_path).paragraphs[0].runs
+    assert runs[0].text == ""
+    assert runs[0]._r.xpath(".//pic:pic")
+    assert runs[1].text == "An error is here."
@@ -0,0 +1,28 @@
+from fpdf import FPDF
+from src.config import DEFAULT_PDF_PARALLEL_MIN_PAGES
+from src.file_handlers import extract_text, iter_pdf_pages, iter_text
+
+
+def make_pdf(path, page_count):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for i in range(page_count):
+        pdf.add_page()
+        # Leave some pages blank, they are skipped
+        if i % 5 != 4:
+            pdf.cell(0, 10, txt=f"Text of page {i}.")
+    pdf.output(path)
+    return [f"Text of page {i}." for i in range(page_count) if i % 5 != 4]
+
+
+def test_parallel_extraction_matches_a_single_process(tmp_path):
+    path = str(tmp_path / "long.pdf")
+    expected = make_pdf(path, DEFAULT_PDF_PARALLEL_MIN_PAGES + 5)
+
+    # Small runs, so several are in flight at once and have to be put back in order
+    parallel = list(iter_pdf_pages(path, workers=3, pages_per_task=2))
+    serial = list(iter_pdf_pages(path, workers=1))
+
+    assert parallel == serial == expected
+    assert extract_text(path) == "\n".join(expected)
+    assert "\n".join(iter_text(path)) == extract_text(path)
@@ -0,0 +1,21 @@
+import asyncio
+from src.http_transport import create_http_session
+
+
+def test_httpx_session_keeps_the_whole_pool_alive(stub):
+    async def run():
+        session = create_http_session("httpx", pool_size=8, per_host=2)
+        try:
+            pool = session._client._transport._pool
+            async with session.post(f"{stub.base_url}/chat/completions", json={"messages": [
+                    {"role": "user", "content": "Original Text:\nhello\n\nCorrected Text:\n"}]}) as response:
+                body = await response.json()
+            return pool._max_keepalive_connections, pool._max_connections, response.status, body
+        finally:
+            await session.close()
+
+    keepalive, connections, status, body = asyncio.run(run())
+
+    assert keepalive == connections == 8
+    assert status == 200
+    assert body["choices"][0]["message"]["content"] == "HELLO"
@@ -0,0 +1,88 @@
+import os
+import time
+from src import journal as journal_module
+from src.journal import CorrectionJournal
+
+SETTINGS = {"input_path": "/documents/input.docx", "options": {"model": "gpt-4o-mini"}}
+
+
+def test_appended_paragraphs_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS)
+    journal.append("a", "First.")
+    journal.append("b", "Second.")
+    journal.close()
+
+    assert CorrectionJournal.read(path) == (SETTINGS, {"a": "First.", "b": "Second."})
+    reopened = CorrectionJournal.open(path, SETTINGS)
+    reopened.append("c", "Third.")
+    reopened.close()
+    assert CorrectionJournal.read(path)[1] == {"a": "First.", "b": "Second.", "c": "Third."}
+
+
+def test_a_journal_of_another_input_starts_over(tmp_path):
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS)
+    journal.append("a", "First.")
+    journal.close()
+
+    other = CorrectionJournal.open(path, dict(SETTINGS, input_path="/documents/other.docx"))
+    other.close()
+    assert other.entries == {}
+    assert CorrectionJournal.read(path)[1] == {}
+
+
+def test_a_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS)
+    journal.append("a", "First.")
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"fingerprint": "b", "te')
+
+    assert CorrectionJournal.read(path)[1] == {"a": "First."}
+
+
+def test_append_does_not_wait_for_the_disk(tmp_path, monkeypatch):
+    synced = []
+
+    def slow_fsync(fd):
+        time.sleep(0.2)
+        synced.append(fd)
+
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS, sync_interval=0)
+    monkeypatch.setattr(journal_module.os, "fsync", slow_fsync)
+
+    started = time.monotonic()
+    for i in range(5):
+        journal.append(str(i), f"Paragraph {i}.")
+    assert time.monotonic() - started < 0.1
+
+    journal.close()
+    assert synced
+    assert len(CorrectionJournal.read(path)[1]) == 5
+
+
+def test_lines_are_synced_without_further_appends(tmp_path, monkeypatch):
+    synced = []
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS, sync_interval=0.05)
+    monkeypatch.setattr(journal_module.os, "fsync", lambda fd: synced.append(fd))
+
+    journal.append("a", "First.")
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        assert synced
+    finally:
+        journal.close()
+
+
+def test_remove_deletes_the_file(tmp_path):
+    path = str(tmp_path / "output.docx.journal.jsonl")
+    journal = CorrectionJournal.open(path, SETTINGS)
+    journal.append("a", "First.")
+    journal.remove()
+    assert not os.path.exists(path)
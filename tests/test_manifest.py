@@ -0,0 +1,83 @@
+from src.api_client import GrammarCorrectorAPI
+from src.manifest import RunManifest
+from src.usage import UsageReport, make_usage
+
+PARAGRAPHS = ["First paragraph.", "Second paragraph.", "Third paragraph.", "Fourth paragraph."]
+
+
+def fingerprint(manifest, paragraphs, indices=None):
+    return manifest.fingerprints(GrammarCorrectorAPI("key"), paragraphs, indices or range(len(paragraphs)),
+                                 "Legal", "British English", None, 1)
+
+
+def usage_for(indices, failed=()):
+    usage_report = UsageReport()
+    for i in indices:
+        usage_report.record(i, make_usage(failed=i in failed))
+    return usage_report
+
+
+def test_an_edit_changes_the_paragraph_and_the_ones_it_is_context_for():
+    before = fingerprint(RunManifest(None), PARAGRAPHS)
+    edited = list(PARAGRAPHS)
+    edited[1] = "Second paragraph, edited."
+    after = fingerprint(RunManifest(None), edited)
+
+    assert [before[i] != after[i] for i in range(4)] == [False, True, True, False]
+
+
+def test_reuses_stored_corrections(tmp_path):
+    path = str(tmp_path / "output.txt.manifest.json")
+    first = RunManifest(path)
+    fingerprints = fingerprint(first, PARAGRAPHS)
+    corrected = [paragraph.upper() for paragraph in PARAGRAPHS]
+    first.record(fingerprints, corrected, range(4), usage_for(range(4), failed={3}))
+    first.save()
+
+    second = RunManifest.load(path)
+    fingerprints = fingerprint(second, PARAGRAPHS)
+    source, to_send, reused = second.reuse(PARAGRAPHS, list(range(4)), fingerprints, "corrected")
+
+    # The failed paragraph was not stored, so it is sent again
+    assert to_send == [3]
+    assert reused == {i: corrected[i] for i in range(3)}
+    assert source == corrected[:3] + PARAGRAPHS[3:]
+    assert second.reused == 3
+
+    _, _, reused_original_mode = RunManifest.load(path).reuse(PARAGRAPHS, list(range(4)), fingerprints, "original")
+    assert reused_original_mode == reused
+
+
+def test_original_mode_keeps_the_original_text_as_context(tmp_path):
+    manifest = RunManifest(None, {})
+    fingerprints = fingerprint(manifest, PARAGRAPHS)
+    manifest.entries[fingerprints[0]] = "FIRST PARAGRAPH."
+
+    source, to_send, _ = manifest.reuse(PARAGRAPHS, list(range(4)), fingerprints, "original")
+
+    assert source == PARAGRAPHS
+    assert to_send == [1, 2, 3]
+
+
+def test_deleted_paragraphs_drop_out(tmp_path):
+    path = str(tmp_path / "output.txt.manifest.json")
+    first = RunManifest(path)
+    fingerprints = fingerprint(first, PARAGRAPHS)
+    first.record(fingerprints, PARAGRAPHS, range(4), usage_for(range(4)))
+    first.save()
+
+    second = RunManifest.load(path)
+    fingerprint(second, PARAGRAPHS[:2])
+    second.save()
+
+    assert len(RunManifest.load(path).entries) == 2
+
+
+def test_unreadable_or_foreign_manifests_are_ignored(tmp_path):
+    broken, foreign = tmp_path / "broken.json", tmp_path / "foreign.json"
+    broken.write_text("{", encoding="utf-8")
+    foreign.write_text('{"version": 999, "entries": {"a": "b"}}', encoding="utf-8")
+
+    assert RunManifest.load(str(broken)).entries == {}
+    assert RunManifest.load(str(foreign)).entries == {}
+    assert RunManifest.load(str(tmp_path / "missing.json")).entries == {}
@@ -0,0 +1,43 @@
+import pytest
+from src.packing import PackMismatchError, pack_paragraphs, parse_packed_response
+
+
+def test_packs_adjacent_short_paragraphs():
+    assert pack_paragraphs([0, 1, 2, 3], [10, 10, 10, 10], token_budget=30, max_paragraphs=8,
+                           max_paragraph_tokens=50) == [[0, 1, 2], [3]]
+
+
+def test_never_packs_across_a_gap():
+    assert pack_paragraphs([0, 1, 3, 4], [5, 5, 5, 5], token_budget=100, max_paragraphs=8,
+                           max_paragraph_tokens=50) == [[0, 1], [3, 4]]
+
+
+def test_long_paragraphs_get_a_group_of_their_own():
+    assert pack_paragraphs([0, 1, 2, 3], [5, 80, 5, 5], token_budget=100, max_paragraphs=8,
+                           max_paragraph_tokens=50) == [[0], [1], [2, 3]]
+
+
+def test_respects_the_paragraph_cap_and_a_zero_budget():
+    assert pack_paragraphs([0, 1, 2], [1, 1, 1], token_budget=100, max_paragraphs=2,
+                           max_paragraph_tokens=50) == [[0, 1], [2]]
+    assert pack_paragraphs([0, 1], [1, 1], token_budget=0) == [[0], [1]]
+
+
+def test_parses_a_json_array():
+    assert parse_packed_response('[" One. ", "Two."]', 2) == ["One.", "Two."]
+
+
+def test_parses_a_fenced_array():
+    assert parse_packed_response('```json\n["One.", "Two."]\n```', 2) == ["One.", "Two."]
+
+
+@pytest.mark.parametrize("content, count", [
+    ("One.\n\nTwo.", 2),
+    ('{"paragraphs": ["One."]}', 1),
+    ('["One.", 2]', 2),
+    ('["One."]', 2),
+    ('["One.", " "]', 2),
+])
+def test_rejects_responses_that_do_not_split_back(content, count):
+    with pytest.raises(PackMismatchError):
+        parse_packed_response(content, count)
@@ -0,0 +1,57 @@
+import asyncio
+from src.api_client import GrammarCorrectorAPI
+from src.journal import CorrectionJournal
+from src.manifest import fingerprint_paragraphs
+from src.pipeline import CorrectionOptions, correct_document_async, get_journal_settings, _correct_while_extracting
+from src.scheduler import JobScheduler
+from src.usage import UsageReport
+
+TEXT = "The first paragraph of the document is here.\n\nThe second paragraph of the document follows it."
+
+
+def write_document(tmp_path, text=TEXT):
+    path = tmp_path / "document.txt"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_document_without_a_client_keeps_the_scheduler(stub, tmp_path):
+    path = write_document(tmp_path)
+    options = CorrectionOptions(api_key="key", base_url=stub.base_url)
+
+    async def run():
+        async with GrammarCorrectorAPI("key", base_url=stub.base_url) as api_client:
+            scheduler = JobScheduler(api_client)
+            result = await correct_document_async(path, options, scheduler=scheduler)
+            return scheduler, result
+
+    scheduler, result = asyncio.run(run())
+
+    assert result.error is None
+    assert scheduler.done_tokens > 0
+    with open(result.output_path, encoding="utf-8") as f:
+        assert f.read().strip() == TEXT.upper()
+
+
+def test_checkpoints_without_a_manifest(stub, tmp_path):
+    path = write_document(tmp_path)
+    options = CorrectionOptions(api_key="key", base_url=stub.base_url)
+    journal_path = str(tmp_path / "document_corrected.txt.journal.jsonl")
+
+    async def run():
+        async with GrammarCorrectorAPI("key", base_url=stub.base_url) as api_client:
+            journal = CorrectionJournal.open(journal_path, get_journal_settings(path, journal_path, options))
+            try:
+                paragraphs, corrected, _ = await _correct_while_extracting(path, options, api_client, float("inf"),
+                                                                           None, UsageReport(), journal=journal)
+            finally:
+                journal.close()
+            fingerprints = fingerprint_paragraphs(api_client, paragraphs, range(len(paragraphs)), options.doc_type,
+                                                  options.language_variant, options.custom_prompt,
+                                                  options.context_window_size)
+            return corrected, fingerprints
+
+    corrected, fingerprints = asyncio.run(run())
+
+    _, entries = CorrectionJournal.read(journal_path)
+    assert entries == {fingerprints[i]: corrected[i] for i in range(len(corrected))}
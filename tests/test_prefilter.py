@@ -0,0 +1,57 @@
+import pytest
+from src.prefilter import ParagraphFilter, is_reference_word
+
+
+@pytest.mark.parametrize("text", ["§ 4.2(b)", "12 March 2024", "pp. 10-12", "Art. 5(1)(iv)", "Vol. XII, p. 4",
+                                  "3.5%", "______________________", "(a)", "10am-4pm", "1st March 2024", "1990s"])
+def test_numeric_paragraphs_pass_through(text):
+    assert ParagraphFilter().classify(text) == "numeric"
+
+
+@pytest.mark.parametrize("text", ["mix", "dim 4", "may 2024", "It is 4 May.", "I am.", "a 5", "He saw 4 men.",
+                                  "I to 5", "No. 5 of 2024", "May 5 and 6"])
+def test_words_that_only_look_like_references_are_sent(text):
+    assert ParagraphFilter().classify(text) is None
+
+
+def test_reference_words():
+    assert is_reference_word("March") and not is_reference_word("march")
+    assert is_reference_word("IV") and not is_reference_word("iv") and not is_reference_word("mix")
+    assert is_reference_word("B") and not is_reference_word("a")
+    assert not is_reference_word("I") and not is_reference_word("A")
+    assert not is_reference_word("to") and not is_reference_word("pm")
+    assert is_reference_word("pp")
+
+
+@pytest.mark.parametrize("text", ["Schedule 2", "Signed:", "1. Definitions", "Part IV", "(b) Interpretation",
+                                  "Clause 4.1a", "For and on behalf of:", "Name:", "Signed by:"])
+def test_labels_pass_through(text):
+    assert ParagraphFilter().classify(text) == "label"
+
+
+@pytest.mark.parametrize("text", ["He go home.", "Teh Agreemnt", "1. Defintions", "Dear Sir:", "Thank you!",
+                                  "Shedule 2", "Why not?", "Section 5 and 6 to 7", "The by:", "For the Date:",
+                                  "schedule 2"])
+def test_short_prose_and_misspelt_labels_are_sent(text):
+    assert ParagraphFilter().classify(text) is None
+
+
+def test_label_length_limit():
+    assert ParagraphFilter(max_label_words=1).classify("Signed by:") is None
+    assert ParagraphFilter(max_label_words=0).classify("Signed:") is None
+
+
+def test_split_finds_repeats():
+    paragraph_filter = ParagraphFilter()
+    paragraphs = ["Schedule 2", "The parties agree.", "Teh parties agreed.", "The parties agree.", "12 May 2024"]
+
+    to_send, skipped, duplicates = paragraph_filter.split(paragraphs, range(5))
+
+    assert to_send == [1, 2]
+    assert skipped == {0: ("label", "Schedule 2"), 4: ("numeric", "12 May 2024")}
+    assert duplicates == {3: 1}
+
+    # Once corrected, a repeat in a later call takes the correction
+    paragraph_filter.remember("The parties agree.", "The parties agree.")
+    _, skipped, _ = paragraph_filter.split(["The parties agree."], [0])
+    assert skipped == {0: ("duplicate", "The parties agree.")}
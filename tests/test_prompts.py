@@ -0,0 +1,58 @@
+import json
+from loguru import logger
+from src import prompts
+from src.config import DEFAULT_PROMPT_LAYOUT
+from src.prompts import PromptTemplate, SYSTEM_PROMPT
+
+
+def compile_logged(*args, **kwargs):
+    messages = []
+    sink = logger.add(messages.append, level="INFO", format="{message}")
+    try:
+        template = PromptTemplate(*args, **kwargs)
+    finally:
+        logger.remove(sink)
+    return template, [message for message in messages if "prefix layout saves nothing" in message]
+
+
+def test_default_layout_sends_one_message():
+    template = PromptTemplate("Legal", "British English", layout=DEFAULT_PROMPT_LAYOUT)
+    assert template.system_prompt == SYSTEM_PROMPT
+    assert "British English" in template.render("", "Some text.")
+
+
+def test_short_prefix_is_reported():
+    template, warnings = compile_logged("Legal", "British English", layout="prefix")
+    assert "British English" in template.system_prompt
+    assert "British English" not in template.render("", "Some text.")
+    assert len(warnings) == 1
+
+
+def test_long_custom_prompt_is_worth_a_prefix():
+    _, warnings = compile_logged("Legal", "British English", "Keep every defined term. " * 300, layout="prefix")
+    assert warnings == []
+
+
+def test_braces_are_taken_literally():
+    template = PromptTemplate("Legal", "British English", "Keep {placeholders} and {{doubled}} braces {")
+    prompt = template.render("Context with {context} in it.", "Replace {text} and {0} here }")
+    assert "Keep {placeholders} and {{doubled}} braces {" in prompt
+    assert "Context with {context} in it." in prompt
+    assert "Replace {text} and {0} here }" in prompt
+
+    packed = template.render_packed("", ["First {text}", "Second }{"])
+    assert json.dumps(["First {text}", "Second }{"], ensure_ascii=False, indent=0) in packed
+
+
+def test_version_follows_the_guidelines(monkeypatch):
+    template = PromptTemplate("Legal", "British English")
+    version = template.version
+    template.render("Some context.", "Some text.")
+    assert template.version == version
+    assert PromptTemplate("Legal", "British English").version == version
+    assert PromptTemplate("Legal", "American English").version != version
+    assert PromptTemplate("Legal", "British English", layout="prefix").version != version
+
+    monkeypatch.setitem(prompts.DOCUMENT_PROMPTS, "Legal", prompts.DOCUMENT_PROMPTS["Legal"] + "9. Use Oxford commas.\n")
+    assert PromptTemplate("Legal", "British English").version != version
+    assert PromptTemplate("Legal", "British English", "Custom guidelines.").version != version
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from src.api_client import TokenRateLimiter
+
+
+def timed(coroutine_function):
+    async def run():
+        started = time.monotonic()
+        result = await coroutine_function()
+        return result, time.monotonic() - started
+    return asyncio.run(run())
+
+
+def test_request_budget_blocks_until_refilled():
+    limiter = TokenRateLimiter(request_limit=2, token_limit=1000, period=0.2)
+
+    async def acquire_three():
+        return [await limiter.acquire(1) for _ in range(3)]
+
+    _, elapsed = timed(acquire_three)
+    # The third request waits for half a period, the time one request takes to refill
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_token_budget_blocks_until_refilled():
+    limiter = TokenRateLimiter(request_limit=100, token_limit=100, period=0.2)
+
+    async def acquire_two():
+        return [await limiter.acquire(80), await limiter.acquire(80)]
+
+    reserved, elapsed = timed(acquire_two)
+    assert reserved == [80, 80]
+    assert elapsed >= 0.1
+
+
+def test_reconcile_refunds_unused_tokens():
+    limiter = TokenRateLimiter(request_limit=100, token_limit=100, period=10)
+
+    async def acquire_reconciled():
+        reserved = await limiter.acquire(80)
+        limiter.reconcile(reserved, 10)
+        return await limiter.acquire(80)
+
+    reserved, elapsed = timed(acquire_reconciled)
+    assert reserved == 80
+    assert elapsed < 0.05
+
+
+def test_oversized_request_takes_the_whole_budget():
+    limiter = TokenRateLimiter(request_limit=100, token_limit=100, period=10)
+    reserved, _ = timed(lambda: limiter.acquire(500))
+    assert reserved == 100
+    assert limiter.tokens_available < 1
+
+
+def test_headers_replace_limits_and_cap_the_budget():
+    limiter = TokenRateLimiter(request_limit=100, token_limit=1000, period=60)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "50", "x-ratelimit-limit-tokens": "2000",
+                                 "x-ratelimit-remaining-requests": "5", "x-ratelimit-remaining-tokens": "300"})
+
+    assert limiter.request_limit == 50
+    assert limiter.token_limit == 2000
+    assert limiter.requests_available <= 5
+    assert limiter.tokens_available <= 300
+    assert limiter.headroom() <= 0.15
+
+
+def test_malformed_headers_are_ignored():
+    limiter = TokenRateLimiter(request_limit=100, token_limit=1000, period=60)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "many"})
+    assert limiter.request_limit == 100
+    assert limiter.headroom() > 0.99
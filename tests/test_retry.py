@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import pytest
+from src import retry
+from src.retry import (APIError, CircuitBreaker, CircuitOpenError, RetryableError, RetryPolicy,
+                       call_with_retries, parse_retry_after)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Records the waits of call_with_retries instead of sleeping.
+    """
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    return waits
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def failing(errors, result="ok"):
+    """
+    Returns a request raising ``errors`` in turn, then returning ``result``, and its call list.
+    """
+    calls = []
+
+    async def request():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return request, calls
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after({"retry-after": "7"}) == 7.0
+    assert parse_retry_after({"retry-after": "-3"}) == 0.0
+
+
+def test_parse_retry_after_milliseconds_take_precedence():
+    assert parse_retry_after({"retry-after-ms": "1500", "retry-after": "30"}) == 1.5
+
+
+def test_parse_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    wait = parse_retry_after({"retry-after": format_datetime(when, usegmt=True)})
+    assert 25 <= wait <= 30
+    past = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert parse_retry_after({"retry-after": format_datetime(past, usegmt=True)}) == 0.0
+
+
+def test_parse_retry_after_garbage():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after({"retry-after-ms": "soon"}) is None
+
+
+def test_retry_after_is_honoured_over_backoff(sleeps):
+    request, calls = failing([RetryableError("slow down", 429, retry_after=5)])
+    policy = RetryPolicy(max_retries=3, base_delay=0.01, max_delay=0.1)
+    assert asyncio.run(call_with_retries(request, policy)) == "ok"
+    assert len(calls) == 2
+    assert sleeps == [5]
+
+
+def test_backoff_is_used_when_longer_than_retry_after(sleeps):
+    request, _ = failing([RetryableError("busy", 503, retry_after=0.001)])
+    policy = RetryPolicy(max_retries=3, base_delay=0.5, max_delay=1)
+    asyncio.run(call_with_retries(request, policy))
+    assert 0.5 <= sleeps[0] <= 1
+
+
+def test_non_retryable_error_raises_immediately(sleeps):
+    request, calls = failing([APIError("bad request", 400)])
+    with pytest.raises(APIError):
+        asyncio.run(call_with_retries(request, RetryPolicy(max_retries=3)))
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_max_retries_is_respected(sleeps):
+    request, calls = failing([RetryableError("busy", 503)] * 10)
+    policy = RetryPolicy(max_retries=2, base_delay=0.01, max_delay=0.1)
+    with pytest.raises(RetryableError):
+        asyncio.run(call_with_retries(request, policy))
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_circuit_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.available
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_exactly_one_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.state == "half-open"
+    assert breaker.available
+    breaker.before_call()
+    assert not breaker.available
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 9
+    assert breaker.state == "open"
+    clock[0] += 1
+    assert breaker.state == "half-open"
+    assert breaker.available
@@ -0,0 +1,110 @@
+import asyncio
+from src.scheduler import JobScheduler
+
+
+def run_requests(scheduler, requests):
+    """
+    Starts every (job, label) request at once and returns the labels in the order they got a slot.
+    """
+    order = []
+
+    async def request(job, label):
+        async with scheduler.slot(job):
+            order.append(label)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        await asyncio.gather(*(request(job, label) for job, label in requests))
+
+    asyncio.run(run())
+    return order
+
+
+def test_equal_jobs_share_the_slots():
+    scheduler = JobScheduler(None, max_in_flight=1)
+    large, small = scheduler.add_job("large"), scheduler.add_job("small")
+    order = run_requests(scheduler, [(large, f"large-{i}") for i in range(6)] + [(small, f"small-{i}") for i in range(2)])
+
+    # The small job is served alternately with the large one instead of after all of it
+    assert order.index("small-1") < order.index("large-3")
+    assert order == ["large-0", "small-0", "large-1", "small-1", "large-2", "large-3", "large-4", "large-5"]
+
+
+def test_higher_priority_goes_first():
+    scheduler = JobScheduler(None, max_in_flight=1)
+    low, urgent = scheduler.add_job("low", priority=0), scheduler.add_job("urgent", priority=10)
+    order = run_requests(scheduler, [(low, f"low-{i}") for i in range(3)] + [(urgent, f"urgent-{i}") for i in range(3)])
+
+    # The first request took the free slot; after that the urgent job is served first
+    assert order == ["low-0", "urgent-0", "urgent-1", "urgent-2", "low-1", "low-2"]
+
+
+def test_in_flight_never_exceeds_the_limit():
+    scheduler = JobScheduler(None, max_in_flight=3)
+    jobs = [scheduler.add_job(f"job-{n}") for n in range(4)]
+    peak = 0
+
+    async def request(job):
+        nonlocal peak
+        async with scheduler.slot(job):
+            peak = max(peak, scheduler.in_flight)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        await asyncio.gather(*(request(job) for job in jobs for _ in range(5)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert scheduler.in_flight == 0
+    assert [job.granted for job in jobs] == [5, 5, 5, 5]
+
+
+def test_a_cancelled_request_gives_its_place_up():
+    scheduler = JobScheduler(None, max_in_flight=1)
+    first, second = scheduler.add_job("first"), scheduler.add_job("second")
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(first):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.slot(second).__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+
+    asyncio.run(run())
+    assert scheduler.in_flight == 0
+    assert not second.waiters
+
+
+def test_cancelling_a_holder_and_a_waiter_together_frees_the_slot():
+    scheduler = JobScheduler(None, max_in_flight=1)
+    first, second = scheduler.add_job("first"), scheduler.add_job("second")
+
+    async def run():
+        async def hold():
+            async with scheduler.slot(first):
+                await asyncio.Event().wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.slot(second).__aenter__())
+        await asyncio.sleep(0)
+        # The holder runs first and releases its slot while the cancelled waiter is still queued
+        holder.cancel()
+        waiter.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        assert scheduler.in_flight == 0
+
+        await asyncio.wait_for(scheduler.slot(first).__aenter__(), 1)
+        assert scheduler.in_flight == 1
+
+    asyncio.run(run())
+    assert not second.waiters
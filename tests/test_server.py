@@ -0,0 +1,46 @@
+import time
+from fastapi.testclient import TestClient
+from src.server import create_app
+
+
+def make_client(stub, **kwargs):
+    app = create_app(api_key="key", base_url=stub.base_url, max_paragraphs=5, max_paragraph_chars=200, **kwargs)
+    return TestClient(app)
+
+
+def wait_for(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_rejects_jobs_over_the_limits(stub):
+    with make_client(stub) as client:
+        too_many = client.post("/jobs/paragraphs", json={"paragraphs": [f"Paragraph {i} is here." for i in range(6)]})
+        too_long = client.post("/jobs/paragraphs", json={"paragraphs": ["word " * 100]})
+        too_many_selected = client.post("/jobs/paragraphs", json={"paragraphs": ["One paragraph is here."],
+                                                                  "selected_indices": [0] * 6})
+        upload = client.post("/jobs/document", files={"file": ("many.txt", "\n\n".join(["Some words in a row."] * 6))})
+
+    assert too_many.status_code == too_long.status_code == too_many_selected.status_code == upload.status_code == 413
+    assert stub.requests == []
+
+
+def test_concurrent_jobs_keep_their_own_usage(stub):
+    stub.delay = 0.05
+    first = [f"The first job has paragraph number {i} in it." for i in range(2)]
+    second = [f"The second job has paragraph number {i} in it." for i in range(5)]
+    with make_client(stub) as client:
+        first_id = client.post("/jobs/paragraphs", json={"paragraphs": first}).json()["id"]
+        second_id = client.post("/jobs/paragraphs", json={"paragraphs": second}).json()["id"]
+        first_job, second_job = wait_for(client, first_id), wait_for(client, second_id)
+        result = client.get(f"/jobs/{second_id}/result", params={"format": "json"}).json()
+
+    assert first_job["usage"]["paragraphs"] == 2
+    assert second_job["usage"]["paragraphs"] == 5
+    assert first_job["usage"]["api_calls"] + second_job["usage"]["api_calls"] == len(stub.requests)
+    assert result["paragraphs"] == [paragraph.upper() for paragraph in second]
@@ -0,0 +1,27 @@
+import random
+from src.text_processing import iter_paragraphs, split_into_paragraphs
+
+TEXT = "First paragraph\nwith a line break.\n\nSecond one.\n\n\n\nThird,\nafter several blank lines.\n\n  \n\nLast one."
+
+
+def chunkings(text, count):
+    """
+    Yields ways of cutting ``text`` into pieces, including empty ones and cuts inside paragraph breaks.
+    """
+    for cut in range(len(text) + 1):
+        yield [text[:cut], text[cut:]]
+    rng = random.Random(0)
+    for _ in range(count):
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(1, 8)))
+        yield [text[start:stop] for start, stop in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_iter_paragraphs_matches_split_into_paragraphs():
+    for pieces in chunkings(TEXT, 200):
+        assert list(iter_paragraphs(pieces)) == split_into_paragraphs("\n".join(pieces)), pieces
+
+
+def test_paragraph_spanning_pieces_is_yielded_whole():
+    pieces = ["Intro.\n\nPage one ends mid", "sentence and page two", "finishes it.\n\nNext paragraph."]
+    assert list(iter_paragraphs(pieces)) == ["Intro.", "Page one ends mid\nsentence and page two\nfinishes it.",
+                                             "Next paragraph."]
@@ -0,0 +1,54 @@
+from src.usage import UsageReport, make_usage, split_usage, usage_from_response
+
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens")
+
+
+def test_reads_cached_tokens_from_prompt_details():
+    usage = usage_from_response({"usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120,
+                                           "prompt_tokens_details": {"cached_tokens": 64}}})
+    assert usage == make_usage(100, 20, 120, cached_tokens=64)
+    assert usage_from_response({"usage": {"prompt_tokens": 5, "completion_tokens": 1}})["total_tokens"] == 6
+    assert usage_from_response({"choices": []}) is None
+
+
+def test_split_usage_preserves_totals():
+    usage = make_usage(101, 37, cached_tokens=50)
+    shares = split_usage(usage, [3, 1, 2])
+
+    assert [share["pack_index"] for share in shares] == [0, 1, 2]
+    for key in TOKEN_KEYS:
+        assert sum(share[key] for share in shares) == usage[key]
+    assert shares[0]["prompt_tokens"] > shares[1]["prompt_tokens"]
+    assert sum(share["total_tokens"] for share in split_usage(make_usage(7, 2), [0, 0])) == 9
+
+
+def test_packed_request_counts_as_one_call():
+    report = UsageReport()
+    for i, share in enumerate(split_usage(make_usage(90, 30), [1, 1, 1])):
+        report.record(i, share)
+
+    assert report.api_calls == 1
+    assert (report.prompt_tokens, report.completion_tokens, report.total_tokens) == (90, 30, 120)
+
+
+def test_report_accounts_for_cache_hits_failures_and_skips():
+    report = UsageReport()
+    report.record(0, make_usage(10, 5, cached_tokens=4))
+    report.record(1, make_usage(10, 5, cached=True))
+    report.record(2, make_usage(8, 0, failed=True))
+    report.record(3, dict(make_usage(), skipped="label"))
+    report.record(4, dict(make_usage(), skipped="label"))
+    report.record(5, dict(make_usage(), skipped="duplicate"))
+
+    assert report.summary() == {
+        "paragraphs": 6,
+        "api_calls": 1,
+        "cache_hits": 1,
+        "skipped": {"label": 2, "duplicate": 1},
+        "failures": 1,
+        # Cache hits are not billed, a failed request is
+        "prompt_tokens": 18,
+        "completion_tokens": 5,
+        "total_tokens": 23,
+        "cached_tokens": 4,
+    }
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+import pytest
+from src import utils
+from src.utils import FALLBACK_ENCODING, count_tokens, count_tokens_batch, get_encoding
+from tests.conftest import WordEncoding
+
+
+class CountingEncoding(WordEncoding):
+    name = "test-counting"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_ordinary(self, text):
+        self.encoded.append(text)
+        return super().encode_ordinary(text)
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        self.encoded.extend(texts)
+        return super().encode_ordinary_batch(texts, num_threads)
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    encoding = CountingEncoding()
+    monkeypatch.setattr(utils, "get_encoding", lambda model="gpt-4o-mini": encoding)
+    monkeypatch.setattr(utils, "_token_counts", OrderedDict())
+    return encoding
+
+
+def test_counts_are_memoized(encoding):
+    assert count_tokens("one two three") == 3
+    assert count_tokens("one two three") == 3
+    assert encoding.encoded == ["one two three"]
+
+
+def test_batch_matches_single_counts_and_only_tokenizes_misses(encoding):
+    texts = ["one", "one two", "", "one two three four"]
+    count_tokens("one two")
+    encoding.encoded.clear()
+
+    assert count_tokens_batch(texts) == [count_tokens(text) for text in texts] == [1, 2, 0, 4]
+    assert encoding.encoded == ["one", "", "one two three four"]
+
+
+def test_memo_is_bounded(encoding, monkeypatch):
+    monkeypatch.setattr(utils, "DEFAULT_TOKEN_COUNT_CACHE_SIZE", 2)
+    count_tokens_batch(["a", "b c", "d e f"])
+    assert len(utils._token_counts) == 2
+    encoding.encoded.clear()
+    count_tokens("a")
+    assert encoding.encoded == ["a"]
+
+
+def test_unknown_models_fall_back(monkeypatch):
+    def unknown(model):
+        raise KeyError(model)
+
+    fallback = WordEncoding()
+    monkeypatch.setattr(utils.tiktoken, "encoding_for_model", unknown)
+    monkeypatch.setattr(utils.tiktoken, "get_encoding", lambda name: fallback if name == FALLBACK_ENCODING else None)
+
+    # Undecorated, so the memoized encodings of other tests are not touched
+    assert get_encoding.__wrapped__("some-local-model") is fallback